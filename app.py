@@ -12,6 +12,8 @@ load_dotenv()
 region = os.getenv("REGION")
 account = os.getenv("ACCOUNT")
 is_prod = os.getenv("PROD") == 'True'  # Convert string to boolean if needed
+use_router = os.getenv("USE_ROUTER") == 'True'  # Deploy one router Lambda behind a proxy resource
+capture_bucket_name = os.getenv("CAPTURE_BUCKET")  # Existing bucket captures are uploaded to, if any
 
 
 app = cdk.App()
@@ -32,6 +34,10 @@ AwsChangeObserverStack(app, "AwsChangeObserverStack",
 
     is_prod=is_prod,
 
+    use_router=use_router,
+
+    capture_bucket_name=capture_bucket_name,
+
     # For more information, see https://docs.aws.amazon.com/cdk/latest/guide/environments.html
     )
 
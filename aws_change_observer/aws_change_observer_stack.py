@@ -1,9 +1,12 @@
 from aws_cdk import (
+    Duration,
     Stack,
     RemovalPolicy,
     aws_lambda,
+    aws_lambda_event_sources as lambda_event_sources,
     aws_apigateway as apigateway,
     aws_dynamodb as dynamodb,
+    aws_s3 as s3,
     aws_iam as iam,
     aws_certificatemanager as acm,
     aws_route53 as route53,
@@ -14,18 +17,43 @@ from constructs import Construct
 
 class AwsChangeObserverStack(Stack):
 
-    def __init__(self, scope: Construct, construct_id: str, is_prod: bool = False, **kwargs) -> None:
+    def __init__(self, scope: Construct, construct_id: str, is_prod: bool = False, use_router: bool = False,
+                 capture_bucket_name: str = None, **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
         # Constants
         DOMAIN_NAME = 'change-observer.com'
         SUBDOMAIN = 'api'
         TABLE_NAME = 'LocationMarkers'        
+        GEOHASH_INDEX_NAME = 'GeohashIndex'
+        SYNC_INDEX_NAME = 'SyncIndex'
+        HISTORY_TABLE_NAME = 'MarkerHistory'
+        DETECTION_INDEX_TABLE_NAME = 'DetectionIndex'
+        DETECTION_EVENTS_TABLE_NAME = 'DetectionEvents'
+        MARKERS_SNAPSHOT_KEY = 'snapshots/markers.json.gz'
         GET_MARKERS_REQUEST_LAMBDA_CODE_PATH = 'lambdas/get_markers_request'
         GET_MARKER_REQUEST_LAMBDA_CODE_PATH = 'lambdas/get_marker_request'
+        GET_NEAREST_MARKERS_REQUEST_LAMBDA_CODE_PATH = 'lambdas/get_nearest_markers_request'
+        GET_MARKER_CHANGES_REQUEST_LAMBDA_CODE_PATH = 'lambdas/get_marker_changes_request'
         ADD_MARKER_REQUEST_LAMBDA_CODE_PATH = 'lambdas/add_marker_request'
         DELETE_MARKER_REQUEST_LAMBDA_CODE_PATH = 'lambdas/delete_marker_request'
         UPDATE_MARKER_REQUEST_LAMBDA_CODE_PATH = 'lambdas/update_marker_request'
+        GET_HISTORICAL_IMAGES_OF_MARKER_LAMBDA_CODE_PATH = 'lambdas/get_historical_images_of_marker'
+        BATCH_GET_MARKERS_REQUEST_LAMBDA_CODE_PATH = 'lambdas/batch_get_markers_request'
+        BATCH_ADD_MARKERS_REQUEST_LAMBDA_CODE_PATH = 'lambdas/batch_add_markers_request'
+        BATCH_DELETE_MARKERS_REQUEST_LAMBDA_CODE_PATH = 'lambdas/batch_delete_markers_request'
+        MARKERS_SNAPSHOT_STREAM_LAMBDA_CODE_PATH = 'lambdas/markers_snapshot_stream'
+        CHANGE_DETECTION_STREAM_LAMBDA_CODE_PATH = 'lambdas/change_detection_stream'
+        GET_IMAGE_TILE_REQUEST_LAMBDA_CODE_PATH = 'lambdas/get_image_tile_request'
+        ADD_CAPTURE_REQUEST_LAMBDA_CODE_PATH = 'lambdas/add_capture_request'
+        GET_DETECTIONS_REQUEST_LAMBDA_CODE_PATH = 'lambdas/get_detections_request'
+        GET_DETECTION_EVENTS_REQUEST_LAMBDA_CODE_PATH = 'lambdas/get_detection_events_request'
+        # AWS-managed layer providing NumPy for change detection; the version available in each
+        # region is listed at https://aws-sdk-pandas.readthedocs.io/en/stable/layers.html
+        NUMPY_LAYER_ACCOUNT = '336392948345'
+        NUMPY_LAYER_NAME = 'AWSSDKPandas-Python38'
+        NUMPY_LAYER_VERSION = 13
+        LAMBDAS_CODE_PATH = 'lambdas'
 
         # Create the DynamoDB table
         table = dynamodb.Table(
@@ -35,9 +63,118 @@ class AwsChangeObserverStack(Stack):
                 name='markerId',
                 type=dynamodb.AttributeType.STRING
             ),
+            stream=dynamodb.StreamViewType.NEW_AND_OLD_IMAGES,  # Feeds the snapshot and detection index, and change detection and pyramids
+            time_to_live_attribute='expiresAt',  # Expires the tombstones of deleted markers
             removal_policy=RemovalPolicy.DESTROY,  # Use RETAIN in production
         )
 
+        # Geohash index for bounding-box queries; projects only the map summary attributes
+        table.add_global_secondary_index(
+            index_name=GEOHASH_INDEX_NAME,
+            partition_key=dynamodb.Attribute(
+                name='geohashPrefix',
+                type=dynamodb.AttributeType.STRING
+            ),
+            sort_key=dynamodb.Attribute(
+                name='geohash',
+                type=dynamodb.AttributeType.STRING
+            ),
+            projection_type=dynamodb.ProjectionType.INCLUDE,
+            non_key_attributes=['name', 'coordinate', 'status', 'currentImage'],
+        )
+
+        # Sync index for delta reads of the markers changed since a point in time;
+        # projects the map summary attributes plus what clients need to apply a change
+        table.add_global_secondary_index(
+            index_name=SYNC_INDEX_NAME,
+            partition_key=dynamodb.Attribute(
+                name='syncPartition',
+                type=dynamodb.AttributeType.STRING
+            ),
+            sort_key=dynamodb.Attribute(
+                name='updatedAt',
+                type=dynamodb.AttributeType.STRING
+            ),
+            projection_type=dynamodb.ProjectionType.INCLUDE,
+            non_key_attributes=['name', 'coordinate', 'status', 'currentImage', 'version', 'deleted'],
+        )
+
+        # Create the DynamoDB table holding each marker's historical images as separate items
+        history_table = dynamodb.Table(
+            self, 'MarkerHistoryTable',
+            table_name=HISTORY_TABLE_NAME,
+            partition_key=dynamodb.Attribute(
+                name='markerId',
+                type=dynamodb.AttributeType.STRING
+            ),
+            sort_key=dynamodb.Attribute(
+                name='dateTaken',
+                type=dynamodb.AttributeType.STRING
+            ),
+            removal_policy=RemovalPolicy.DESTROY,  # Use RETAIN in production
+        )
+
+        # Create the DynamoDB table mapping detected labels to the markers and dates they were
+        # detected at, maintained from the markers table's stream (see detection_index)
+        detection_index_table = dynamodb.Table(
+            self, 'DetectionIndexTable',
+            table_name=DETECTION_INDEX_TABLE_NAME,
+            partition_key=dynamodb.Attribute(
+                name='labelShard',
+                type=dynamodb.AttributeType.STRING
+            ),
+            sort_key=dynamodb.Attribute(
+                name='detectionKey',
+                type=dynamodb.AttributeType.STRING
+            ),
+            removal_policy=RemovalPolicy.DESTROY,  # Use RETAIN in production
+        )
+
+        # Create the DynamoDB table of the labels that appeared and disappeared between
+        # consecutive detections of each marker (see detection_events)
+        detection_events_table = dynamodb.Table(
+            self, 'DetectionEventsTable',
+            table_name=DETECTION_EVENTS_TABLE_NAME,
+            partition_key=dynamodb.Attribute(
+                name='markerId',
+                type=dynamodb.AttributeType.STRING
+            ),
+            sort_key=dynamodb.Attribute(
+                name='dateDetected',
+                type=dynamodb.AttributeType.STRING
+            ),
+            removal_policy=RemovalPolicy.DESTROY,  # Use RETAIN in production
+        )
+
+        # Create the S3 bucket holding the markers snapshot served by GET /markers?view=summary
+        snapshot_bucket = s3.Bucket(
+            self, 'MarkersSnapshotBucket',
+            block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
+            cors=[s3.CorsRule(
+                allowed_methods=[s3.HttpMethods.GET],
+                allowed_origins=['*'],  # Snapshot redirects are followed by the browser
+            )],
+            removal_policy=RemovalPolicy.DESTROY,  # Use RETAIN in production
+        )
+
+        # Create the S3 bucket holding the tile pack (pyramid and thumbnail) of each image
+        pyramid_bucket = s3.Bucket(
+            self, 'ImagePyramidBucket',
+            block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
+            removal_policy=RemovalPolicy.DESTROY,  # Use RETAIN in production
+        )
+
+        # The bucket captures are uploaded to, which the functions decoding images read from: an
+        # existing bucket when one is configured, otherwise one created with the stack
+        if capture_bucket_name:
+            capture_bucket = s3.Bucket.from_bucket_name(self, 'CaptureBucket', capture_bucket_name)
+        else:
+            capture_bucket = s3.Bucket(
+                self, 'CaptureBucket',
+                block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
+                removal_policy=RemovalPolicy.DESTROY,  # Use RETAIN in production
+            )
+
         # Define the Lambda Layer for shared classes
         shared_classes_layer = aws_lambda.LayerVersion(
             self, 'SharedClassesLayer',
@@ -46,7 +183,8 @@ class AwsChangeObserverStack(Stack):
             description="A layer containing the shared classes module"
         )
 
-        # Role for all lambdas
+        # Role for all lambdas that do not read captures; those get a role of their own so the
+        # capture bucket is only readable by them
         lambda_role = iam.Role(
             self, 'LambdaRole',
             assumed_by=iam.ServicePrincipal('lambda.amazonaws.com'),
@@ -55,125 +193,511 @@ class AwsChangeObserverStack(Stack):
             ]
         )
 
-        # Lambda function for adding a markers
-        add_marker_request_lambda = aws_lambda.Function(
-            self, 'AddMarkerRequestFunction',
-            function_name='addMarkerRequest',
+        # Lambda function keeping the markers snapshot, the detection index and the detection
+        # events up to date from the table's stream
+        markers_snapshot_stream_lambda = aws_lambda.Function(
+            self, 'MarkersSnapshotStreamFunction',
+            function_name='markersSnapshotStream',
             runtime=aws_lambda.Runtime.PYTHON_3_8,
-            handler="add_marker_request_lambda_function.lambda_handler",
-            code=aws_lambda.Code.from_asset(ADD_MARKER_REQUEST_LAMBDA_CODE_PATH),
+            handler="markers_snapshot_stream_lambda_function.lambda_handler",
+            code=aws_lambda.Code.from_asset(MARKERS_SNAPSHOT_STREAM_LAMBDA_CODE_PATH),
             layers=[shared_classes_layer],
             role=lambda_role,
+            # The runtime's boto3 predates S3 conditional writes, so batches of different shards
+            # must not write the snapshot concurrently (see S3SnapshotStore)
+            reserved_concurrent_executions=1,
             environment={
                 'TABLE_NAME': table.table_name,
+                'SNAPSHOT_BUCKET': snapshot_bucket.bucket_name,
+                'SNAPSHOT_KEY': MARKERS_SNAPSHOT_KEY,
+                'DETECTION_INDEX_TABLE_NAME': detection_index_table.table_name,
+                'DETECTION_EVENTS_TABLE_NAME': detection_events_table.table_name,
             },
         )
+        markers_snapshot_stream_lambda.add_event_source(lambda_event_sources.DynamoEventSource(
+            table,
+            starting_position=aws_lambda.StartingPosition.LATEST,
+            batch_size=100,
+            max_batching_window=Duration.seconds(5),
+            retry_attempts=10,
+        ))
+        table.grant_read_data(markers_snapshot_stream_lambda)
+        snapshot_bucket.grant_read_write(markers_snapshot_stream_lambda)
+        detection_index_table.grant_write_data(markers_snapshot_stream_lambda)
+        detection_events_table.grant_read_write_data(markers_snapshot_stream_lambda)
 
-        # Lambda function for getting all markers
-        get_markers_request_lambda = aws_lambda.Function(
-            self, 'GetMarkersRequestFunction',
-            function_name='getMarkersRequest',
-            runtime=aws_lambda.Runtime.PYTHON_3_8,
-            handler="get_markers_request_lambda_function.lambda_handler",
-            code=aws_lambda.Code.from_asset(GET_MARKERS_REQUEST_LAMBDA_CODE_PATH),
-            layers=[shared_classes_layer],
-            role=lambda_role,
-            environment={
-                'TABLE_NAME': table.table_name,
-            },
+        # Layer with NumPy, needed by the functions that decode images
+        numpy_layer = aws_lambda.LayerVersion.from_layer_version_arn(
+            self, 'NumpyLayer',
+            f'arn:aws:lambda:{self.region}:{NUMPY_LAYER_ACCOUNT}:layer:{NUMPY_LAYER_NAME}:{NUMPY_LAYER_VERSION}',
         )
 
-        # Lambda function for getting a marker by markerId
-        get_marker_request_lambda = aws_lambda.Function(
-            self, 'GetMarkerRequestFunction',
-            function_name='getMarkerRequest',
+        # Lambda function comparing each new current image of a marker with the previous one, and
+        # building its tile pyramid and thumbnail
+        change_detection_stream_lambda = aws_lambda.Function(
+            self, 'ChangeDetectionStreamFunction',
+            function_name='changeDetectionStream',
             runtime=aws_lambda.Runtime.PYTHON_3_8,
-            handler="get_marker_request_lambda_function.lambda_handler",
-            code=aws_lambda.Code.from_asset(GET_MARKER_REQUEST_LAMBDA_CODE_PATH),
-            layers=[shared_classes_layer],
-            role=lambda_role,
+            handler="change_detection_stream_lambda_function.lambda_handler",
+            code=aws_lambda.Code.from_asset(CHANGE_DETECTION_STREAM_LAMBDA_CODE_PATH),
+            layers=[shared_classes_layer, numpy_layer],
+            memory_size=1024,  # Two decoded captures plus FFT buffers, or one plus its encoded tiles
+            timeout=Duration.seconds(120),
             environment={
                 'TABLE_NAME': table.table_name,
+                'HISTORY_TABLE_NAME': history_table.table_name,
+                'PYRAMID_BUCKET': pyramid_bucket.bucket_name,
             },
         )
-
-        # Lambda function for updating a marker
-        update_marker_request_lambda = aws_lambda.Function(
-            self, 'UpdateMarkerRequestFunction',
-            function_name='updateMarkerRequest',
-            runtime=aws_lambda.Runtime.PYTHON_3_8,
-            handler="update_marker_request_lambda_function.lambda_handler",
-            code=aws_lambda.Code.from_asset(UPDATE_MARKER_REQUEST_LAMBDA_CODE_PATH),
-            layers=[shared_classes_layer],
-            role=lambda_role,
-            environment={
-                'TABLE_NAME': table.table_name
-            },
-        )
-
-        # Lambda function for deleting a marker
-        delete_marker_request_lambda = aws_lambda.Function(
-            self, 'DeleteMarkerRequestFunction',
-            function_name='deleteMarkerRequest',
-            runtime=aws_lambda.Runtime.PYTHON_3_8,
-            handler="delete_marker_request_lambda_function.lambda_handler",
-            code=aws_lambda.Code.from_asset(DELETE_MARKER_REQUEST_LAMBDA_CODE_PATH),
-            layers=[shared_classes_layer],
-            role=lambda_role,
-            environment={
-                'TABLE_NAME': table.table_name
-            },
-        )
-
-        # Grant access to the DynamoDB table
-        table.grant_read_data(get_markers_request_lambda)
-        table.grant_read_data(get_marker_request_lambda)
-        table.grant_read_data(update_marker_request_lambda)
-        table.grant_write_data(add_marker_request_lambda)
-        table.grant_write_data(update_marker_request_lambda)
-        table.grant_write_data(delete_marker_request_lambda)
+        change_detection_stream_lambda.add_event_source(lambda_event_sources.DynamoEventSource(
+            table,
+            starting_position=aws_lambda.StartingPosition.LATEST,
+            batch_size=10,
+            retry_attempts=3,
+        ))
+        table.grant_read_write_data(change_detection_stream_lambda)
+        history_table.grant_read_write_data(change_detection_stream_lambda)
+        pyramid_bucket.grant_write(change_detection_stream_lambda)
+        capture_bucket.grant_read(change_detection_stream_lambda)
 
         # API Gateway
         api = apigateway.RestApi(
             self, 'ChangeObserverAPI',
             rest_api_name='ChangeObserverAPI',
+            # Responses API Gateway decodes from base64: tiles, and compressed bodies for clients
+            # that accept application/octet-stream (see http_response.BINARY_MEDIA_TYPES). JSON
+            # requests and the CORS preflight mock integrations stay text
+            binary_media_types=['image/png', 'image/*', 'application/octet-stream'],
         )
 
-        # Add a specific resource
-        markers_resource = api.root.add_resource("markers")
+        if use_router:
+            # Single Lambda function serving every route, dispatching on httpMethod and path.
+            # Its code asset is the whole lambdas directory so it can import each handler module.
+            router_request_lambda = aws_lambda.Function(
+                self, 'RouterRequestFunction',
+                function_name='routerRequest',
+                runtime=aws_lambda.Runtime.PYTHON_3_8,
+                handler="router_request.router_request_lambda_function.lambda_handler",
+                code=aws_lambda.Code.from_asset(LAMBDAS_CODE_PATH),
+                layers=[shared_classes_layer, numpy_layer],  # NumPy is only imported by POST /marker/capture
+                environment={
+                    'TABLE_NAME': table.table_name,
+                    'HISTORY_TABLE_NAME': history_table.table_name,
+                    'SNAPSHOT_BUCKET': snapshot_bucket.bucket_name,
+                    'SNAPSHOT_KEY': MARKERS_SNAPSHOT_KEY,
+                    'PYRAMID_BUCKET': pyramid_bucket.bucket_name,
+                    'DETECTION_INDEX_TABLE_NAME': detection_index_table.table_name,
+                    'DETECTION_EVENTS_TABLE_NAME': detection_events_table.table_name,
+                },
+            )
+
+            # Grant access to the DynamoDB tables, the markers snapshot and the image pyramids
+            table.grant_read_write_data(router_request_lambda)
+            history_table.grant_read_write_data(router_request_lambda)
+            detection_index_table.grant_read_data(router_request_lambda)
+            detection_events_table.grant_read_data(router_request_lambda)
+            snapshot_bucket.grant_read(router_request_lambda)
+            pyramid_bucket.grant_read(router_request_lambda)
+            capture_bucket.grant_read(router_request_lambda)
 
-        # Add GET method for getting markers
-        get_markers_integration = apigateway.LambdaIntegration(get_markers_request_lambda)
-        markers_resource.add_method("GET", get_markers_integration)
+            # Send every path and method to the router
+            api.root.add_proxy(
+                default_integration=apigateway.LambdaIntegration(router_request_lambda),
+                any_method=True,
+                default_cors_preflight_options=apigateway.CorsOptions(
+                    allow_origins=apigateway.Cors.ALL_ORIGINS,
+                    allow_methods=apigateway.Cors.ALL_METHODS,
+                ),
+            )
+        else:
+            # Lambda function for adding a markers
+            add_marker_request_lambda = aws_lambda.Function(
+                self, 'AddMarkerRequestFunction',
+                function_name='addMarkerRequest',
+                runtime=aws_lambda.Runtime.PYTHON_3_8,
+                handler="add_marker_request_lambda_function.lambda_handler",
+                code=aws_lambda.Code.from_asset(ADD_MARKER_REQUEST_LAMBDA_CODE_PATH),
+                layers=[shared_classes_layer],
+                role=lambda_role,
+                environment={
+                    'TABLE_NAME': table.table_name,
+                    'HISTORY_TABLE_NAME': history_table.table_name,
+                },
+            )
 
-        markers_resource.add_cors_preflight(
-             allow_origins=apigateway.Cors.ALL_ORIGINS,
-             allow_methods=["GET", "OPTIONS"],
-        )
+            # Lambda function for getting all markers
+            get_markers_request_lambda = aws_lambda.Function(
+                self, 'GetMarkersRequestFunction',
+                function_name='getMarkersRequest',
+                runtime=aws_lambda.Runtime.PYTHON_3_8,
+                handler="get_markers_request_lambda_function.lambda_handler",
+                code=aws_lambda.Code.from_asset(GET_MARKERS_REQUEST_LAMBDA_CODE_PATH),
+                layers=[shared_classes_layer],
+                role=lambda_role,
+                environment={
+                    'TABLE_NAME': table.table_name,
+                    'SNAPSHOT_BUCKET': snapshot_bucket.bucket_name,
+                    'SNAPSHOT_KEY': MARKERS_SNAPSHOT_KEY,
+                },
+            )
+
+            # Lambda function for getting a marker by markerId
+            get_marker_request_lambda = aws_lambda.Function(
+                self, 'GetMarkerRequestFunction',
+                function_name='getMarkerRequest',
+                runtime=aws_lambda.Runtime.PYTHON_3_8,
+                handler="get_marker_request_lambda_function.lambda_handler",
+                code=aws_lambda.Code.from_asset(GET_MARKER_REQUEST_LAMBDA_CODE_PATH),
+                layers=[shared_classes_layer],
+                role=lambda_role,
+                environment={
+                    'TABLE_NAME': table.table_name,
+                },
+            )
+
+            # Lambda function for finding the markers nearest to a point
+            get_nearest_markers_request_lambda = aws_lambda.Function(
+                self, 'GetNearestMarkersRequestFunction',
+                function_name='getNearestMarkersRequest',
+                runtime=aws_lambda.Runtime.PYTHON_3_8,
+                handler="get_nearest_markers_request_lambda_function.lambda_handler",
+                code=aws_lambda.Code.from_asset(GET_NEAREST_MARKERS_REQUEST_LAMBDA_CODE_PATH),
+                layers=[shared_classes_layer],
+                role=lambda_role,
+                environment={
+                    'TABLE_NAME': table.table_name,
+                },
+            )
+
+            # Lambda function for getting the markers changed since a sync token
+            get_marker_changes_request_lambda = aws_lambda.Function(
+                self, 'GetMarkerChangesRequestFunction',
+                function_name='getMarkerChangesRequest',
+                runtime=aws_lambda.Runtime.PYTHON_3_8,
+                handler="get_marker_changes_request_lambda_function.lambda_handler",
+                code=aws_lambda.Code.from_asset(GET_MARKER_CHANGES_REQUEST_LAMBDA_CODE_PATH),
+                layers=[shared_classes_layer],
+                role=lambda_role,
+                environment={
+                    'TABLE_NAME': table.table_name,
+                },
+            )
+
+            # Lambda function for updating a marker
+            update_marker_request_lambda = aws_lambda.Function(
+                self, 'UpdateMarkerRequestFunction',
+                function_name='updateMarkerRequest',
+                runtime=aws_lambda.Runtime.PYTHON_3_8,
+                handler="update_marker_request_lambda_function.lambda_handler",
+                code=aws_lambda.Code.from_asset(UPDATE_MARKER_REQUEST_LAMBDA_CODE_PATH),
+                layers=[shared_classes_layer],
+                role=lambda_role,
+                environment={
+                    'TABLE_NAME': table.table_name,
+                    'HISTORY_TABLE_NAME': history_table.table_name,
+                },
+            )
+
+            # Lambda function for deleting a marker
+            delete_marker_request_lambda = aws_lambda.Function(
+                self, 'DeleteMarkerRequestFunction',
+                function_name='deleteMarkerRequest',
+                runtime=aws_lambda.Runtime.PYTHON_3_8,
+                handler="delete_marker_request_lambda_function.lambda_handler",
+                code=aws_lambda.Code.from_asset(DELETE_MARKER_REQUEST_LAMBDA_CODE_PATH),
+                layers=[shared_classes_layer],
+                role=lambda_role,
+                environment={
+                    'TABLE_NAME': table.table_name,
+                    'HISTORY_TABLE_NAME': history_table.table_name,
+                },
+            )
+
+            # Lambda function for getting the historical images of a marker
+            get_historical_images_of_marker_lambda = aws_lambda.Function(
+                self, 'GetHistoricalImagesOfMarkerFunction',
+                function_name='getHistoricalImagesOfMarker',
+                runtime=aws_lambda.Runtime.PYTHON_3_8,
+                handler="get_historical_images_of_marker.lambda_handler",
+                code=aws_lambda.Code.from_asset(GET_HISTORICAL_IMAGES_OF_MARKER_LAMBDA_CODE_PATH),
+                layers=[shared_classes_layer],
+                role=lambda_role,
+                environment={
+                    'TABLE_NAME': table.table_name,
+                    'HISTORY_TABLE_NAME': history_table.table_name,
+                },
+            )
+
+            # Lambda function for getting a tile or the thumbnail of an image
+            get_image_tile_request_lambda = aws_lambda.Function(
+                self, 'GetImageTileRequestFunction',
+                function_name='getImageTileRequest',
+                runtime=aws_lambda.Runtime.PYTHON_3_8,
+                handler="get_image_tile_request_lambda_function.lambda_handler",
+                code=aws_lambda.Code.from_asset(GET_IMAGE_TILE_REQUEST_LAMBDA_CODE_PATH),
+                layers=[shared_classes_layer],
+                role=lambda_role,
+                environment={
+                    'PYRAMID_BUCKET': pyramid_bucket.bucket_name,
+                },
+            )
+
+            # Lambda function for recording a new capture of a marker, skipping near-duplicates
+            add_capture_request_lambda = aws_lambda.Function(
+                self, 'AddCaptureRequestFunction',
+                function_name='addCaptureRequest',
+                runtime=aws_lambda.Runtime.PYTHON_3_8,
+                handler="add_capture_request_lambda_function.lambda_handler",
+                code=aws_lambda.Code.from_asset(ADD_CAPTURE_REQUEST_LAMBDA_CODE_PATH),
+                layers=[shared_classes_layer, numpy_layer],
+                memory_size=1024,  # A decoded capture
+                timeout=Duration.seconds(30),
+                environment={
+                    'TABLE_NAME': table.table_name,
+                    'HISTORY_TABLE_NAME': history_table.table_name,
+                },
+            )
+
+            # Lambda function for finding the markers a label was detected at
+            get_detections_request_lambda = aws_lambda.Function(
+                self, 'GetDetectionsRequestFunction',
+                function_name='getDetectionsRequest',
+                runtime=aws_lambda.Runtime.PYTHON_3_8,
+                handler="get_detections_request_lambda_function.lambda_handler",
+                code=aws_lambda.Code.from_asset(GET_DETECTIONS_REQUEST_LAMBDA_CODE_PATH),
+                layers=[shared_classes_layer],
+                role=lambda_role,
+                environment={
+                    'TABLE_NAME': table.table_name,
+                    'DETECTION_INDEX_TABLE_NAME': detection_index_table.table_name,
+                },
+            )
+
+            # Lambda function for paging through the detection events of a marker
+            get_detection_events_request_lambda = aws_lambda.Function(
+                self, 'GetDetectionEventsRequestFunction',
+                function_name='getDetectionEventsRequest',
+                runtime=aws_lambda.Runtime.PYTHON_3_8,
+                handler="get_detection_events_request_lambda_function.lambda_handler",
+                code=aws_lambda.Code.from_asset(GET_DETECTION_EVENTS_REQUEST_LAMBDA_CODE_PATH),
+                layers=[shared_classes_layer],
+                role=lambda_role,
+                environment={
+                    'TABLE_NAME': table.table_name,
+                    'DETECTION_EVENTS_TABLE_NAME': detection_events_table.table_name,
+                },
+            )
+
+            # Lambda function for getting many markers at once
+            batch_get_markers_request_lambda = aws_lambda.Function(
+                self, 'BatchGetMarkersRequestFunction',
+                function_name='batchGetMarkersRequest',
+                runtime=aws_lambda.Runtime.PYTHON_3_8,
+                handler="batch_get_markers_request_lambda_function.lambda_handler",
+                code=aws_lambda.Code.from_asset(BATCH_GET_MARKERS_REQUEST_LAMBDA_CODE_PATH),
+                layers=[shared_classes_layer],
+                role=lambda_role,
+                environment={
+                    'TABLE_NAME': table.table_name,
+                },
+            )
+
+            # Lambda function for adding many markers at once
+            batch_add_markers_request_lambda = aws_lambda.Function(
+                self, 'BatchAddMarkersRequestFunction',
+                function_name='batchAddMarkersRequest',
+                runtime=aws_lambda.Runtime.PYTHON_3_8,
+                handler="batch_add_markers_request_lambda_function.lambda_handler",
+                code=aws_lambda.Code.from_asset(BATCH_ADD_MARKERS_REQUEST_LAMBDA_CODE_PATH),
+                layers=[shared_classes_layer],
+                role=lambda_role,
+                environment={
+                    'TABLE_NAME': table.table_name,
+                    'HISTORY_TABLE_NAME': history_table.table_name,
+                },
+            )
+
+            # Lambda function for deleting many markers at once
+            batch_delete_markers_request_lambda = aws_lambda.Function(
+                self, 'BatchDeleteMarkersRequestFunction',
+                function_name='batchDeleteMarkersRequest',
+                runtime=aws_lambda.Runtime.PYTHON_3_8,
+                handler="batch_delete_markers_request_lambda_function.lambda_handler",
+                code=aws_lambda.Code.from_asset(BATCH_DELETE_MARKERS_REQUEST_LAMBDA_CODE_PATH),
+                layers=[shared_classes_layer],
+                role=lambda_role,
+                environment={
+                    'TABLE_NAME': table.table_name,
+                    'HISTORY_TABLE_NAME': history_table.table_name,
+                },
+            )
+
+            # Grant access to the DynamoDB table
+            table.grant_read_data(get_markers_request_lambda)
+            snapshot_bucket.grant_read(get_markers_request_lambda)
+            table.grant_read_data(get_marker_request_lambda)
+            table.grant_read_data(get_nearest_markers_request_lambda)
+            table.grant_read_data(get_marker_changes_request_lambda)
+            table.grant_read_data(update_marker_request_lambda)
+            table.grant_write_data(add_marker_request_lambda)
+            table.grant_write_data(update_marker_request_lambda)
+            table.grant_write_data(delete_marker_request_lambda)
+            table.grant_read_data(get_historical_images_of_marker_lambda)
+            history_table.grant_read_data(get_historical_images_of_marker_lambda)
+            pyramid_bucket.grant_read(get_image_tile_request_lambda)
+            table.grant_read_write_data(add_capture_request_lambda)
+            history_table.grant_write_data(add_capture_request_lambda)
+            capture_bucket.grant_read(add_capture_request_lambda)
+            detection_index_table.grant_read_data(get_detections_request_lambda)
+            table.grant_read_data(get_detection_events_request_lambda)
+            detection_events_table.grant_read_data(get_detection_events_request_lambda)
+            history_table.grant_write_data(add_marker_request_lambda)
+            history_table.grant_write_data(update_marker_request_lambda)
+            history_table.grant_read_write_data(delete_marker_request_lambda)
+            table.grant_read_data(batch_get_markers_request_lambda)
+            table.grant_write_data(batch_add_markers_request_lambda)
+            history_table.grant_write_data(batch_add_markers_request_lambda)
+            table.grant_write_data(batch_delete_markers_request_lambda)
+            history_table.grant_read_write_data(batch_delete_markers_request_lambda)
+
+            # Add a specific resource
+            markers_resource = api.root.add_resource("markers")
+
+            # Add GET method for getting markers
+            get_markers_integration = apigateway.LambdaIntegration(get_markers_request_lambda)
+            markers_resource.add_method("GET", get_markers_integration)
+
+            markers_resource.add_cors_preflight(
+                 allow_origins=apigateway.Cors.ALL_ORIGINS,
+                 allow_methods=["GET", "OPTIONS"],
+            )
 
-        # Add a specific resource
-        marker_resource = api.root.add_resource("marker")
+            # Add a nested resource for nearest-marker searches
+            nearest_markers_resource = markers_resource.add_resource("nearest")
+
+            # Add GET method for finding the nearest markers
+            get_nearest_markers_integration = apigateway.LambdaIntegration(get_nearest_markers_request_lambda)
+            nearest_markers_resource.add_method("GET", get_nearest_markers_integration)
+
+            nearest_markers_resource.add_cors_preflight(
+                 allow_origins=apigateway.Cors.ALL_ORIGINS,
+                 allow_methods=["GET", "OPTIONS"],
+            )
+
+            # Add a nested resource for delta sync
+            marker_changes_resource = markers_resource.add_resource("changes")
+
+            # Add GET method for getting the markers changed since a sync token
+            get_marker_changes_integration = apigateway.LambdaIntegration(get_marker_changes_request_lambda)
+            marker_changes_resource.add_method("GET", get_marker_changes_integration)
+
+            marker_changes_resource.add_cors_preflight(
+                 allow_origins=apigateway.Cors.ALL_ORIGINS,
+                 allow_methods=["GET", "OPTIONS"],
+            )
+
+            # Add a nested resource for batch operations
+            markers_batch_resource = markers_resource.add_resource("batch")
+
+            # Add GET, POST and DELETE methods for batch operations
+            batch_get_markers_integration = apigateway.LambdaIntegration(batch_get_markers_request_lambda)
+            markers_batch_resource.add_method("GET", batch_get_markers_integration)
+
+            batch_add_markers_integration = apigateway.LambdaIntegration(batch_add_markers_request_lambda)
+            markers_batch_resource.add_method("POST", batch_add_markers_integration)
+
+            batch_delete_markers_integration = apigateway.LambdaIntegration(batch_delete_markers_request_lambda)
+            markers_batch_resource.add_method("DELETE", batch_delete_markers_integration)
+
+            markers_batch_resource.add_cors_preflight(
+                 allow_origins=apigateway.Cors.ALL_ORIGINS,
+                 allow_methods=["GET", "POST", "DELETE", "OPTIONS"],
+            )
+
+            # Add a specific resource
+            marker_resource = api.root.add_resource("marker")
                 
-        # Add GET method for getting a marker by markerId
-        get_marker_integration = apigateway.LambdaIntegration(get_marker_request_lambda)
-        marker_resource.add_method("GET", get_marker_integration)
+            # Add GET method for getting a marker by markerId
+            get_marker_integration = apigateway.LambdaIntegration(get_marker_request_lambda)
+            marker_resource.add_method("GET", get_marker_integration)
 
-        # Add POST method for adding a marker
-        add_marker_integration = apigateway.LambdaIntegration(add_marker_request_lambda)
-        marker_resource.add_method("POST", add_marker_integration)
+            # Add POST method for adding a marker
+            add_marker_integration = apigateway.LambdaIntegration(add_marker_request_lambda)
+            marker_resource.add_method("POST", add_marker_integration)
 
-        # Add PUT method for updating a marker
-        update_marker_integration = apigateway.LambdaIntegration(update_marker_request_lambda)
-        marker_resource.add_method("PUT", update_marker_integration)
+            # Add PUT method for updating a marker
+            update_marker_integration = apigateway.LambdaIntegration(update_marker_request_lambda)
+            marker_resource.add_method("PUT", update_marker_integration)
+            marker_resource.add_method("PATCH", update_marker_integration)
 
-        # Add DELETE method for deleting a marker
-        delete_marker_integration = apigateway.LambdaIntegration(delete_marker_request_lambda)
-        marker_resource.add_method("DELETE", delete_marker_integration)
+            # Add DELETE method for deleting a marker
+            delete_marker_integration = apigateway.LambdaIntegration(delete_marker_request_lambda)
+            marker_resource.add_method("DELETE", delete_marker_integration)
         
-        marker_resource.add_cors_preflight(
-            allow_origins=apigateway.Cors.ALL_ORIGINS,
-            allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        )
+            marker_resource.add_cors_preflight(
+                allow_origins=apigateway.Cors.ALL_ORIGINS,
+                allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
+            )
+
+            # Add a nested resource for a marker's historical images
+            marker_history_resource = marker_resource.add_resource("history")
+
+            # Add GET method for getting the historical images of a marker
+            get_historical_images_of_marker_integration = apigateway.LambdaIntegration(get_historical_images_of_marker_lambda)
+            marker_history_resource.add_method("GET", get_historical_images_of_marker_integration)
+
+            marker_history_resource.add_cors_preflight(
+                allow_origins=apigateway.Cors.ALL_ORIGINS,
+                allow_methods=["GET", "OPTIONS"],
+            )
+
+            # Add a nested resource for the tiles and thumbnails of a marker's images
+            marker_tile_resource = marker_resource.add_resource("tile")
+
+            # Add GET method for getting a tile or thumbnail
+            get_image_tile_integration = apigateway.LambdaIntegration(get_image_tile_request_lambda)
+            marker_tile_resource.add_method("GET", get_image_tile_integration)
+
+            marker_tile_resource.add_cors_preflight(
+                allow_origins=apigateway.Cors.ALL_ORIGINS,
+                allow_methods=["GET", "OPTIONS"],
+            )
+
+            # Add a nested resource for the detection events of a marker
+            marker_events_resource = marker_resource.add_resource("events")
+
+            # Add GET method for paging through the events
+            get_detection_events_integration = apigateway.LambdaIntegration(get_detection_events_request_lambda)
+            marker_events_resource.add_method("GET", get_detection_events_integration)
+
+            marker_events_resource.add_cors_preflight(
+                allow_origins=apigateway.Cors.ALL_ORIGINS,
+                allow_methods=["GET", "OPTIONS"],
+            )
+
+            # Add a nested resource for new captures of a marker
+            marker_capture_resource = marker_resource.add_resource("capture")
+
+            # Add POST method for recording a capture
+            add_capture_integration = apigateway.LambdaIntegration(add_capture_request_lambda)
+            marker_capture_resource.add_method("POST", add_capture_integration)
+
+            marker_capture_resource.add_cors_preflight(
+                allow_origins=apigateway.Cors.ALL_ORIGINS,
+                allow_methods=["POST", "OPTIONS"],
+            )
+
+            # Add a resource for finding detections by label
+            detections_resource = api.root.add_resource("detections")
+
+            # Add GET method for finding detections
+            get_detections_integration = apigateway.LambdaIntegration(get_detections_request_lambda)
+            detections_resource.add_method("GET", get_detections_integration)
+
+            detections_resource.add_cors_preflight(
+                allow_origins=apigateway.Cors.ALL_ORIGINS,
+                allow_methods=["GET", "OPTIONS"],
+            )
 
         if is_prod:
             # Route 53 Hosted Zone
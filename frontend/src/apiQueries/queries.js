@@ -1,9 +1,13 @@
 import axios from "axios";
 import { toast } from "sonner";
-import { useMutation, useQuery } from "react-query";
+import { useMutation, useQuery, useQueryClient } from "react-query";
 
 const API_URL = "https://api.change-observer.com";
 
+// API Gateway only passes compressed (binary) responses through to requests that accept a
+// binary media type; without it the API answers uncompressed
+axios.defaults.headers.common.Accept = "application/json, application/octet-stream";
+
 export const useAddMarker = () => {
   const addMarkerRequest = async (markerData) => {
     const response = await axios.post(`${API_URL}/marker`, markerData);
@@ -75,12 +79,70 @@ export const useGetMarker = (markerId) => {
   return { marker, isLoading, isError, isSuccess };
 };
 
+// URL of an image's thumbnail, or of one tile of its pyramid when level, x and y are given
+export const imageTileUrl = (markerId, image, level, x = 0, y = 0) => {
+  const params = new URLSearchParams({ markerId, dateTaken: image.dateTaken });
+  if (level !== undefined) {
+    params.set("level", level);
+    params.set("x", x);
+    params.set("y", y);
+  }
+  return `${API_URL}/marker/tile?${params}`;
+};
+
+// Markers kept between refetches, updated with the changes since syncToken
+const syncedMarkers = new Map();
+let syncToken = null;
+
+// Seed syncedMarkers from the summary snapshot, one request for every marker, and take the
+// token it carries to sync on from; false if the API answered without one (no snapshot yet)
+const loadSnapshot = async () => {
+  const response = await axios.get(`${API_URL}/markers`, {
+    params: { view: "summary" },
+  });
+  if (!response.data.syncToken) {
+    return false;
+  }
+  syncedMarkers.clear();
+  for (const marker of response.data.markers) {
+    syncedMarkers.set(marker.markerId, marker);
+  }
+  syncToken = response.data.syncToken;
+  return true;
+};
+
 export const useGetAllMarkers = () => {
   const getAllMarkersRequest = async () => {
-    const response = await axios.get(`${API_URL}/markers`);
-    console.log("Full response:", response);
-    console.log("Response data:", response.data);
-    return response.data;
+    let fromSnapshot = !syncToken && (await loadSnapshot());
+    let complete = false;
+    while (!complete) {
+      let response;
+      try {
+        response = await axios.get(`${API_URL}/markers/changes`, {
+          params: syncToken ? { since: syncToken } : {},
+        });
+      } catch (error) {
+        // The token is older than the deletions the server still remembers: start over, from
+        // the snapshot, or from every change if the snapshot's own token is that old
+        if (error.response?.status === 410 && syncToken) {
+          syncedMarkers.clear();
+          syncToken = null;
+          fromSnapshot = !fromSnapshot && (await loadSnapshot());
+          continue;
+        }
+        throw error;
+      }
+      for (const change of response.data.changes) {
+        if (change.deleted) {
+          syncedMarkers.delete(change.markerId);
+        } else {
+          syncedMarkers.set(change.markerId, change);
+        }
+      }
+      syncToken = response.data.token;
+      complete = response.data.complete;
+    }
+    return Array.from(syncedMarkers.values());
   };
 
   const {
@@ -99,12 +161,16 @@ export const useGetAllMarkers = () => {
   return { markers, isLoading, isError, isSuccess };
 };
 
+// version is the marker's version when it was read: the API refuses the edit with a 409
+// if the marker has been written since
 export const useEditMarker = () => {
-  const editMarkerRequest = async ({ markerId, markerData }) => {
-    const response = await axios.put(
-      `${API_URL}/markers/${markerId}`,
-      markerData
-    );
+  const queryClient = useQueryClient();
+  const editMarkerRequest = async ({ markerId, version, changes }) => {
+    const response = await axios.patch(`${API_URL}/marker`, {
+      ...changes,
+      markerId,
+      version,
+    });
     return response.data;
   };
 
@@ -114,11 +180,19 @@ export const useEditMarker = () => {
     isError,
     isSuccess,
   } = useMutation(editMarkerRequest, {
-    onSuccess: () => {
+    onSuccess: (data, { markerId }) => {
       toast.success("Marker edited successfully");
+      queryClient.invalidateQueries(["marker", markerId]);
     },
-    onError: (error) => {
-      toast.error(error.response?.data?.message || "Error editing marker");
+    onError: (error, { markerId }) => {
+      if (error.response?.status === 409) {
+        queryClient.invalidateQueries(["marker", markerId]);
+      }
+      toast.error(
+        error.response?.status === 409
+          ? "Marker was changed elsewhere, reload and try again"
+          : error.response?.data?.message || "Error editing marker"
+      );
       console.log(error);
     },
   });
@@ -1,5 +1,5 @@
 import { useParams } from "react-router-dom";
-import { useGetMarker } from "@/apiQueries/queries";
+import { useGetMarker, useEditMarker, imageTileUrl } from "@/apiQueries/queries";
 import { ArrowLeft } from "lucide-react";
 import { Link } from "react-router-dom";
 import { formatDistanceToNow } from "date-fns";
@@ -18,10 +18,18 @@ console.log("MAP_API_KEY", MAP_API_KEY);
 const MarkerInfo = () => {
   const { markerId } = useParams();
   const { marker, isLoading, isError } = useGetMarker(markerId);
+  const { editMarker } = useEditMarker();
 
   if (isLoading) return <div>Loading...</div>;
   if (isError) return <div>Error: {isError.message}</div>;
 
+  const renameMarker = async () => {
+    const name = window.prompt("Marker name", marker.name);
+    if (!name || name === marker.name) return;
+    // Sent with the version this page shows, so a rename over a newer write is refused
+    await editMarker({ markerId, version: marker.version, changes: { name } }).catch(() => {});
+  };
+
   const mapImageUrl = `https://maps.googleapis.com/maps/api/staticmap?center=${marker.coordinate.latitude},${marker.coordinate.latitude}&zoom=16&scale=2&size=600x600&key=${MAP_API_KEY}&style=feature:poi|visibility:off`;
 
   return (
@@ -46,7 +54,11 @@ const MarkerInfo = () => {
               </TooltipContent>
             </Tooltip>
           </TooltipProvider>
-          <h1 className="text-4xl font-bold">
+          <h1
+            className="text-4xl font-bold cursor-pointer"
+            title="Rename"
+            onClick={renameMarker}
+          >
             {marker?.name || "Untitled Location"}
           </h1>
         </div>
@@ -64,6 +76,15 @@ const MarkerInfo = () => {
         alt="Map"
         className="rounded-lg h-96 w-full object-cover"
       />
+
+      {marker.currentImage?.pyramidKey && (
+        <img
+          src={imageTileUrl(marker.markerId, marker.currentImage)}
+          alt="Latest capture"
+          loading="lazy"
+          className="rounded-lg w-64 object-cover"
+        />
+      )}
     </div>
   );
 };
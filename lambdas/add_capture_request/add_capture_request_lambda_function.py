@@ -0,0 +1,109 @@
+import json
+import os
+import logging
+from data_service import DataService, MarkerNotFoundError
+from image import Image
+import capture_dedup
+import http_response
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Dedup settings; the hash method must not change once a table holds hashes
+MAX_DISTANCE = int(os.environ.get('CAPTURE_MAX_DISTANCE', capture_dedup.DEFAULT_MAX_DISTANCE))
+HASH_METHOD = os.environ.get('CAPTURE_HASH_METHOD', capture_dedup.DEFAULT_METHOD)
+
+def lambda_handler(event, context):
+    """
+    AWS Lambda handler function recording a new capture of a location marker. The image is
+    read from S3 and hashed; a capture that looks like one of the marker's recent images is
+    only counted, anything else becomes the marker's current image and joins its history.
+
+    :param event: AWS Lambda event object, with a body of {"markerId": ..., "image": {...}},
+                  the image naming the uploaded object (s3_bucket_name, s3_key) and its dateTaken.
+    :param context: AWS Lambda context object.
+    :return: HTTP response with status code and body: 201 if the capture was stored, 200 if
+             it was collapsed into the marker's unchangedCaptures.
+    """
+    table_name = os.environ.get('TABLE_NAME')
+    if not table_name:
+        logger.error("TABLE_NAME environment variable is not set.")
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'POST,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Server configuration error.'})
+        }
+
+    try:
+        body = json.loads(http_response.request_body(event) or '{}')
+        marker_id = body['markerId']
+        image = Image.from_json(body['image'])
+    except (json.JSONDecodeError, KeyError, TypeError, AttributeError) as e:
+        logger.error(f"Invalid or missing body in the request: {e}")
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'POST,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Invalid request body.'})
+        }
+
+    data_service = DataService(table_name=table_name,
+                               history_table_name=os.environ.get('HISTORY_TABLE_NAME'))
+
+    try:
+        result = capture_dedup.record_capture(data_service, marker_id, image, max_distance=MAX_DISTANCE,
+                                              method=HASH_METHOD)
+        logger.info(f"Capture of marker {marker_id} {'stored' if result.stored else 'unchanged'} "
+                    f"(distance {result.distance}). Dedup: {capture_dedup.stats.stats()}")
+    except MarkerNotFoundError as e:
+        logger.info(f"Marker not found: {e}")
+        return {
+            'statusCode': 404,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'POST,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Marker not found.'})
+        }
+    except ValueError as e:
+        logger.error(f"Invalid capture: {e}")
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'POST,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': str(e)})
+        }
+    except Exception as e:
+        logger.error(f"Failed to record capture: {e}")
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'POST,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Failed to record capture.'})
+        }
+
+    return {
+        'statusCode': 201 if result.stored else 200,
+        'headers': {
+            'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+            'Access-Control-Allow-Methods': 'POST,OPTIONS',  # Allowed methods
+            'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+        },
+        'body': json.dumps({'stored': result.stored, 'perceptualHash': result.perceptual_hash,
+                            'distance': result.distance, 'unchangedCaptures': result.unchanged_captures})
+    }
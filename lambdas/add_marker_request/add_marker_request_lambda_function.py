@@ -1,17 +1,14 @@
 import json
 import os
 import logging
-import boto3
 from data_service import DataService
+import http_response
 from location_marker import LocationMarker
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize outside the handler for connection reuse
-dynamodb_resource = boto3.resource('dynamodb')
-
 def lambda_handler(event, context):
     """
     AWS Lambda handler function to add a new location marker.
@@ -34,7 +31,7 @@ def lambda_handler(event, context):
         }
 
     try:
-        body = json.loads(event.get('body', '{}'))
+        body = json.loads(http_response.request_body(event) or '{}')
         marker = LocationMarker.from_json(body)
     except (json.JSONDecodeError, KeyError) as e:
         logger.error(f"Invalid or missing body in the request: {e}")
@@ -59,7 +56,8 @@ def lambda_handler(event, context):
             'body': json.dumps({'error': 'Invalid marker data format.'})
         }
 
-    data_service = DataService(table_name=table_name, dynamodb_resource=dynamodb_resource)
+    data_service = DataService(table_name=table_name,
+                               history_table_name=os.environ.get('HISTORY_TABLE_NAME'))
 
     try:
         marker_id = data_service.add_marker(marker)
@@ -0,0 +1,78 @@
+import json
+import os
+import logging
+from data_service import DataService
+import http_response
+from location_marker import LocationMarker
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Maximum number of markers accepted by POST /markers/batch
+MAX_BATCH_MARKERS = 1000
+
+def lambda_handler(event, context):
+    """
+    AWS Lambda handler function to add many location markers at once.
+
+    :param event: AWS Lambda event object, expected to contain {"markers": [...]} in the body.
+    :param context: AWS Lambda context object.
+    :return: HTTP response with status code and body.
+    """
+    table_name = os.environ.get('TABLE_NAME')
+    if not table_name:
+        logger.error("TABLE_NAME environment variable is not set.")
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Server configuration error.'})
+        }
+
+    try:
+        body = json.loads(http_response.request_body(event) or '{}')
+        markers = [LocationMarker.from_json(marker_data) for marker_data in body['markers']]
+        if not markers or len(markers) > MAX_BATCH_MARKERS:
+            raise ValueError(f"markers must contain between 1 and {MAX_BATCH_MARKERS} entries")
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError, AttributeError) as e:
+        logger.error(f"Invalid or missing body in the request: {e}")
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': f'Body must be {{"markers": [...]}} with 1 to {MAX_BATCH_MARKERS} markers.'})
+        }
+
+    data_service = DataService(table_name=table_name,
+                               history_table_name=os.environ.get('HISTORY_TABLE_NAME'))
+
+    try:
+        marker_ids = data_service.batch_put(markers)
+        logger.info(f"Successfully added {len(marker_ids)} markers.")
+        return {
+            'statusCode': 201,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'message': 'Markers added successfully', 'markerIds': marker_ids})
+        }
+    except Exception as e:
+        logger.error(f"Failed to batch add markers to DynamoDB: {e}")
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Failed to add markers to DynamoDB.'})
+        }
@@ -0,0 +1,78 @@
+import json
+import os
+import logging
+from data_service import DataService
+import http_response
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Maximum number of ids accepted by DELETE /markers/batch
+MAX_BATCH_IDS = 1000
+
+def lambda_handler(event, context):
+    """
+    AWS Lambda handler function to delete many location markers at once.
+
+    :param event: AWS Lambda event object, expected to contain {"markerIds": [...]} in the body.
+    :param context: AWS Lambda context object.
+    :return: HTTP response with status code and body.
+    """
+    table_name = os.environ.get('TABLE_NAME')
+    if not table_name:
+        logger.error("TABLE_NAME environment variable is not set.")
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Server configuration error.'})
+        }
+
+    try:
+        body = json.loads(http_response.request_body(event) or '{}')
+        marker_ids = [str(marker_id) for marker_id in body['markerIds']]
+        if not marker_ids or len(marker_ids) > MAX_BATCH_IDS:
+            raise ValueError(f"markerIds must contain between 1 and {MAX_BATCH_IDS} entries")
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+        logger.error(f"Invalid or missing body in the request: {e}")
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': f'Body must be {{"markerIds": [...]}} with 1 to {MAX_BATCH_IDS} ids.'})
+        }
+
+    data_service = DataService(table_name=table_name,
+                               history_table_name=os.environ.get('HISTORY_TABLE_NAME'))
+
+    try:
+        missing = data_service.batch_delete(marker_ids)
+        deleted = len(set(marker_ids)) - len(missing)
+        logger.info(f"Successfully deleted {deleted} markers; {len(missing)} not found.")
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'message': 'Markers deleted successfully', 'deleted': deleted, 'notFound': missing})
+        }
+    except Exception as e:
+        logger.error(f"Error batch deleting markers: {e}")
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Failed to delete markers.'})
+        }
@@ -0,0 +1,78 @@
+import json
+import os
+import logging
+from data_service import DataService
+import http_response
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Maximum number of ids accepted by GET /markers/batch
+MAX_BATCH_IDS = 1000
+
+def lambda_handler(event, context):
+    """
+    AWS Lambda handler function to retrieve many location markers at once.
+
+    :param event: AWS Lambda event object, expected to contain a comma-separated `ids` query parameter.
+    :param context: AWS Lambda context object.
+    :return: HTTP response with status code and body.
+    """
+    table_name = os.environ.get('TABLE_NAME')
+    if not table_name:
+        logger.error("TABLE_NAME environment variable is not set.")
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Server configuration error.'})
+        }
+
+    query_params = event.get('queryStringParameters') or {}
+    marker_ids = [marker_id for marker_id in query_params.get('ids', '').split(',') if marker_id]
+    if not marker_ids or len(marker_ids) > MAX_BATCH_IDS:
+        logger.error(f"Invalid number of ids: {len(marker_ids)}")
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': f'ids must list between 1 and {MAX_BATCH_IDS} marker ids.'})
+        }
+
+    data_service = DataService(table_name=table_name)
+
+    try:
+        markers = data_service.batch_get(marker_ids)
+        logger.info(f"Successfully retrieved {len(markers)} of {len(marker_ids)} markers.")
+    except Exception as e:
+        logger.error(f"Error batch retrieving markers: {e}")
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Failed to retrieve markers.'})
+        }
+
+    found = {marker.get_marker_id() for marker in markers}
+    return http_response.compress({
+        'statusCode': 200,
+        'headers': {
+            'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+            'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+            'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+        },
+        'body': json.dumps({
+            'markers': [marker.to_json() for marker in markers],
+            'missing': [marker_id for marker_id in dict.fromkeys(marker_ids) if marker_id not in found]
+        })
+    }, event)
@@ -0,0 +1,66 @@
+import os
+import logging
+from data_service import DataService, MarkerNotFoundError
+from location_marker import LocationMarker
+from stream_records import markers_with_new_image
+import change_detection
+import image_pyramid
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+def lambda_handler(event, context):
+    """
+    AWS Lambda handler function processing the new current image of each marker in a batch
+    of LocationMarkers stream records: it is compared with the previous image, the result
+    being stored as the marker's lastChange, and turned into a tile pack (pyramid and
+    thumbnail) in the pyramid bucket that the image is pointed at. Both steps share one read
+    of the image, and one reader of the table's stream. Images that cannot be decoded are
+    logged and skipped; any other exception fails the batch, which the event source retries.
+
+    :param event: DynamoDB stream event.
+    :param context: AWS Lambda context object.
+    :return: Number of markers compared, pyramids built, and steps skipped.
+    """
+    table_name = os.environ.get('TABLE_NAME')
+    bucket = os.environ.get('PYRAMID_BUCKET')
+    if not table_name or not bucket:
+        raise RuntimeError("TABLE_NAME and PYRAMID_BUCKET environment variables must be set.")
+
+    data_service = DataService(table_name=table_name, history_table_name=os.environ.get('HISTORY_TABLE_NAME'))
+    compared, built, skipped = 0, 0, 0
+    for item in markers_with_new_image(event.get('Records', [])):
+        marker_id = item["markerId"]
+        marker = LocationMarker.from_json(item)
+        images = {}
+
+        def read_image(image):
+            # The current image is read once for the comparison and the pyramid
+            key = (image.get_s3_bucket_name(), image.get_s3_key())
+            if key not in images:
+                images[key] = change_detection.read_s3_image(image)
+            return images[key]
+
+        try:
+            record = change_detection.detect_marker_change(data_service, marker, read_image=read_image)
+        except (ValueError, MarkerNotFoundError) as e:
+            logger.warning(f"Skipping change detection of marker {marker_id}: {e}")
+            record = None
+        if record is None:
+            skipped += 1
+        else:
+            compared += 1
+            logger.info(f"Marker {marker_id}: score {record.get_score()}, changed {record.get_changed_fraction()}")
+
+        try:
+            image = image_pyramid.build_marker_pyramid(data_service, marker, bucket, read_image=read_image)
+        except (ValueError, MarkerNotFoundError) as e:
+            logger.warning(f"Skipping pyramid of marker {marker_id}: {e}")
+            image = None
+        if image is None:
+            skipped += 1
+        else:
+            built += 1
+            logger.info(f"Marker {marker_id}: {image.get_pyramid_levels()} levels at {image.get_pyramid_key()}")
+    return {'compared': compared, 'built': built, 'skipped': skipped}
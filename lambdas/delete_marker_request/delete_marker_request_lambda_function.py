@@ -1,16 +1,12 @@
 import json
 import os
 import logging
-import boto3
 from data_service import DataService
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize outside the handler for connection reuse
-dynamodb_resource = boto3.resource('dynamodb')
-
 def lambda_handler(event, context):
     """
     AWS Lambda handler function to delete a location marker.
@@ -32,7 +28,8 @@ def lambda_handler(event, context):
             'body': json.dumps({'error': 'Server configuration error.'})
         }
 
-    data_service = DataService(table_name=table_name, dynamodb_resource=dynamodb_resource)
+    data_service = DataService(table_name=table_name,
+                               history_table_name=os.environ.get('HISTORY_TABLE_NAME'))
     
     try:
         marker_id = event["queryStringParameters"]["markerId"]
@@ -0,0 +1,129 @@
+import json
+import os
+import logging
+from data_service import DataService
+import http_response
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Page size bounds for GET /marker/events
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def lambda_handler(event, context):
+    """
+    AWS Lambda handler function to page through the detection events of a location marker:
+    the labels that appeared and disappeared between consecutive detections.
+
+    :param event: AWS Lambda event object, expected to contain the markerId query parameter and
+                  optionally `order` ("newest" or "oldest"), `limit` and `nextToken`.
+    :param context: AWS Lambda context object.
+    :return: HTTP response with status code and body.
+    """
+    table_name = os.environ.get('TABLE_NAME')
+    events_table_name = os.environ.get('DETECTION_EVENTS_TABLE_NAME')
+    if not table_name or not events_table_name:
+        logger.error("TABLE_NAME or DETECTION_EVENTS_TABLE_NAME environment variable is not set.")
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Server configuration error.'})
+        }
+
+    query_params = event.get('queryStringParameters') or {}
+    marker_id = query_params.get('markerId')
+    if not marker_id:
+        logger.error("markerId is missing from the query parameters.")
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'markerId is required.'})
+        }
+
+    order = query_params.get('order', 'newest')
+    next_token = query_params.get('nextToken')
+    try:
+        limit = int(query_params.get('limit', DEFAULT_PAGE_SIZE))
+        if limit < 1 or limit > MAX_PAGE_SIZE or order not in ('oldest', 'newest'):
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE} and order oldest or newest")
+    except ValueError as e:
+        logger.error(f"Invalid query parameters: {e}")
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Invalid query parameters.'})
+        }
+
+    data_service = DataService(table_name=table_name,
+                               detection_events_table_name=events_table_name)
+
+    try:
+        # Only the first page checks that the marker exists; later pages follow a valid cursor
+        if not next_token and not data_service.marker_exists(marker_id):
+            logger.warning(f"No location marker found with ID: {marker_id}")
+            return {
+                'statusCode': 404,
+                'headers': {
+                    'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                    'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                    'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+                },
+                'body': json.dumps({'error': 'Location marker not found.'})
+            }
+
+        events, next_token = data_service.get_detection_events(
+            marker_id,
+            newest_first=order == 'newest',
+            limit=limit,
+            next_token=next_token,
+        )
+    except ValueError as e:
+        logger.error(f"Invalid nextToken parameter: {e}")
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Invalid nextToken.'})
+        }
+    except Exception as e:
+        logger.error(f"Error retrieving detection events: {e}")
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Failed to retrieve detection events.'})
+        }
+
+    return http_response.compress({
+        'statusCode': 200,
+        'headers': {
+            'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+            'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+            'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+        },
+        'body': json.dumps({
+            'markerId': marker_id,
+            'events': events,
+            'nextToken': next_token
+        })
+    }, event)
@@ -0,0 +1,75 @@
+import json
+import os
+import logging
+from data_service import DataService
+import http_response
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+def lambda_handler(event, context):
+    """
+    AWS Lambda handler function returning the markers a label was detected at, newest first,
+    from the detection index (the marker table is not scanned).
+
+    :param event: AWS Lambda event object, with `label` and optional `since` (ISO 8601 date),
+                  `limit` and `nextToken` query parameters.
+    :param context: AWS Lambda context object.
+    :return: HTTP response with status code and body {"detections": [...], "nextToken": ...}.
+    """
+    table_name = os.environ.get('TABLE_NAME')
+    index_table_name = os.environ.get('DETECTION_INDEX_TABLE_NAME')
+    if not table_name or not index_table_name:
+        logger.error("TABLE_NAME or DETECTION_INDEX_TABLE_NAME environment variable is not set.")
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Server configuration error.'})
+        }
+
+    query_params = event.get('queryStringParameters') or {}
+    data_service = DataService(table_name=table_name, detection_index_table_name=index_table_name)
+
+    try:
+        detections, next_token = data_service.find_detections(query_params.get('label'),
+                                                              since=query_params.get('since'),
+                                                              limit=int(query_params.get('limit', 100)),
+                                                              next_token=query_params.get('nextToken'))
+        logger.info(f"Successfully retrieved {len(detections)} detections.")
+    except ValueError as e:
+        logger.error(f"Invalid detections request: {e}")
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': str(e)})
+        }
+    except Exception as e:
+        logger.error(f"Error retrieving detections: {e}")
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Failed to retrieve detections.'})
+        }
+
+    return http_response.compress({
+        'statusCode': 200,
+        'headers': {
+            'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+            'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+            'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+        },
+        'body': json.dumps({'detections': detections, 'nextToken': next_token})
+    }, event)
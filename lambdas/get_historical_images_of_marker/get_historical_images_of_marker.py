@@ -1,83 +1,130 @@
-import json  
-import os  
-import logging  
-import boto3  
-from data_service import DataService  
-from location_marker import LocationMarker  
-
-# Configure logging  
-logger = logging.getLogger()  
-logger.setLevel(logging.INFO)  
-
-# Initialize outside the handler for connection reuse  
-dynamodb_resource = boto3.resource('dynamodb')  
-
-def lambda_handler(event, context):  
-    """  
-    AWS Lambda handler function to view historical images of a location marker.  
-
-    :param event: AWS Lambda event object, expected to contain the markerId in the body.  
-    :param context: AWS Lambda context object.  
-    :return: HTTP response with status code and body.  
-    """  
-    table_name = os.environ.get('TABLE_NAME')  
-    if not table_name:  
-        logger.error("TABLE_NAME environment variable is not set.")  
-        return {  
-            'statusCode': 500,  
-            'body': json.dumps({'error': 'Server configuration error.'})  
-        }  
-
-    data_service = DataService(table_name=table_name, dynamodb_resource=dynamodb_resource)  
-
-    try:  
-        body = json.loads(event.get('body', '{}'))  
-        marker_id = body.get('markerId')  
-
-        if not marker_id:  
-            logger.error("markerId is missing from the request body.")  
-            return {  
-                'statusCode': 400,  
-                'body': json.dumps({'error': 'markerId is required.'})  
-            }  
-    except json.JSONDecodeError as e:  
-        logger.error(f"Invalid JSON in request body: {e}")  
-        return {  
-            'statusCode': 400,  
-            'body': json.dumps({'error': 'Invalid request body.'})  
-        }  
-
-    try:  
-        # Retrieve the location marker from the database using the markerId  
-        marker = data_service.get_marker(marker_id)  
-        if not marker:  
-            logger.warning(f"No location marker found with ID: {marker_id}")  
-            return {  
-                'statusCode': 404,  
-                'body': json.dumps({'error': 'Location marker not found.'})  
-            }  
-
-        # Retrieve historical images 
-        historical_images = marker.get_historical_images()
-        if not historical_images:  
-            logger.info(f"No historical images found for marker ID: {marker_id}")  
-            return {  
-                'statusCode': 404,  
-                'body': json.dumps({'error': 'Historical images unavailable.'})  
-            }  
-
-        # Return the historical images in the response  
-        return {  
-            'statusCode': 200,  
-            'body': json.dumps({  
-                'markerId': marker.get_marker_id(),  
-                'historicalImages': [image.to_json() for image in historical_images]  
-            })  
-        }  
-    except Exception as e:  
-        logger.error(f"Error retrieving historical images: {e}")  
-        return {  
-            'statusCode': 500,  
-            'body': json.dumps({'error': 'Failed to retrieve historical images.'})  
-        }
-    
+import json
+import os
+import logging
+from data_service import DataService
+import http_response
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Page size bounds for GET /marker/history
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def lambda_handler(event, context):
+    """
+    AWS Lambda handler function to view historical images of a location marker.
+
+    :param event: AWS Lambda event object, expected to contain the markerId query parameter and
+                  optionally `from`, `to`, `order` ("oldest" or "newest"), `limit` and `nextToken`.
+    :param context: AWS Lambda context object.
+    :return: HTTP response with status code and body.
+    """
+    table_name = os.environ.get('TABLE_NAME')
+    history_table_name = os.environ.get('HISTORY_TABLE_NAME')
+    if not table_name or not history_table_name:
+        logger.error("TABLE_NAME or HISTORY_TABLE_NAME environment variable is not set.")
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Server configuration error.'})
+        }
+
+    query_params = event.get('queryStringParameters') or {}
+    marker_id = query_params.get('markerId')
+    if not marker_id:
+        logger.error("markerId is missing from the query parameters.")
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'markerId is required.'})
+        }
+
+    order = query_params.get('order', 'oldest')
+    next_token = query_params.get('nextToken')
+    try:
+        limit = int(query_params.get('limit', DEFAULT_PAGE_SIZE))
+        if limit < 1 or limit > MAX_PAGE_SIZE or order not in ('oldest', 'newest'):
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE} and order oldest or newest")
+    except ValueError as e:
+        logger.error(f"Invalid query parameters: {e}")
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Invalid query parameters.'})
+        }
+
+    data_service = DataService(table_name=table_name,
+                               history_table_name=history_table_name)
+
+    try:
+        # Only the first page checks that the marker exists; later pages follow a valid cursor
+        if not next_token and not data_service.marker_exists(marker_id):
+            logger.warning(f"No location marker found with ID: {marker_id}")
+            return {
+                'statusCode': 404,
+                'headers': {
+                    'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                    'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                    'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+                },
+                'body': json.dumps({'error': 'Location marker not found.'})
+            }
+
+        historical_images, next_token = data_service.get_historical_images(
+            marker_id,
+            date_from=query_params.get('from'),
+            date_to=query_params.get('to'),
+            newest_first=order == 'newest',
+            limit=limit,
+            next_token=next_token,
+        )
+    except ValueError as e:
+        logger.error(f"Invalid nextToken parameter: {e}")
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Invalid nextToken.'})
+        }
+    except Exception as e:
+        logger.error(f"Error retrieving historical images: {e}")
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Failed to retrieve historical images.'})
+        }
+
+    return http_response.compress({
+        'statusCode': 200,
+        'headers': {
+            'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+            'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+            'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+        },
+        'body': json.dumps({
+            'markerId': marker_id,
+            'historicalImages': [image.to_json() for image in historical_images],
+            'nextToken': next_token
+        })
+    }, event)
@@ -0,0 +1,105 @@
+import base64
+import json
+import os
+import logging
+import tile_pack
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Tiles of an image never change once built, so clients and CDNs may keep them
+TILE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Packs kept on local disk by a warm container
+PACK_CACHE_BYTES = int(os.environ.get('TILE_PACK_CACHE_BYTES', tile_pack.DEFAULT_CACHE_BYTES))
+
+# Created on first use, so the container keeps its downloaded packs between invocations
+_packs = None
+
+def lambda_handler(event, context):
+    """
+    AWS Lambda handler function serving one tile, or the thumbnail, of an image's pyramid.
+    The tile is sliced out of the memory-mapped tile pack and returned as is, without
+    decoding.
+
+    :param event: AWS Lambda event object, with `markerId` and `dateTaken` query parameters
+                  naming the image, and `level`, `x` and `y` naming the tile. Without `level`
+                  the thumbnail is returned.
+    :param context: AWS Lambda context object.
+    :return: HTTP response with the PNG tile, base64-encoded.
+    """
+    global _packs
+    bucket = os.environ.get('PYRAMID_BUCKET')
+    if not bucket:
+        logger.error("PYRAMID_BUCKET environment variable is not set.")
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Server configuration error.'})
+        }
+
+    query_params = event.get('queryStringParameters') or {}
+    try:
+        key = tile_pack.pack_key(query_params['markerId'], query_params['dateTaken'])
+        level = query_params.get('level')
+        position = (int(level), int(query_params.get('x', 0)), int(query_params.get('y', 0))) if level else None
+    except (KeyError, ValueError) as e:
+        logger.error(f"Invalid tile request: {e}")
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'markerId and dateTaken are required; level, x and y must be numbers.'})
+        }
+
+    if _packs is None:
+        _packs = tile_pack.TilePackCache(bucket, max_bytes=PACK_CACHE_BYTES)
+
+    try:
+        pack = _packs.get(key)
+        if pack is None:
+            raise tile_pack.TileNotFoundError(f"No tile pack at {key}")
+        tile = pack.tile(*position) if position else pack.thumbnail()
+    except tile_pack.TileNotFoundError as e:
+        logger.info(f"Tile not found: {e}")
+        return {
+            'statusCode': 404,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Tile not found.'})
+        }
+    except Exception as e:
+        logger.error(f"Error retrieving tile: {e}")
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Failed to retrieve tile.'})
+        }
+
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+            'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+            'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            'Content-Type': 'image/png',
+            'Cache-Control': TILE_CACHE_CONTROL,
+        },
+        'body': base64.b64encode(tile).decode('ascii'),
+        'isBase64Encoded': True,
+    }
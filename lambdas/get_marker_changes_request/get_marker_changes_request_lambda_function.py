@@ -0,0 +1,99 @@
+import json
+import os
+import logging
+from data_service import DataService, SyncTokenExpiredError, MAX_CHANGES
+import http_response
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+def lambda_handler(event, context):
+    """
+    AWS Lambda handler function returning the location markers written or deleted since a
+    sync token, so clients can keep a local copy of the markers up to date.
+
+    :param event: AWS Lambda event object, with optional `since` (token from a previous
+                  response) and `limit` query parameters.
+    :param context: AWS Lambda context object.
+    :return: HTTP response with status code and body. The body holds `changes`, the `token`
+             to send as `since` next time, and `complete`, which is false while more changes
+             are waiting. A 410 means the token has expired and the client must start over.
+    """
+    table_name = os.environ.get('TABLE_NAME')
+    if not table_name:
+        logger.error("TABLE_NAME environment variable is not set.")
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Server configuration error.'})
+        }
+
+    query_params = event.get('queryStringParameters') or {}
+    since = query_params.get('since')
+    try:
+        limit = int(query_params.get('limit', MAX_CHANGES))
+    except ValueError as e:
+        logger.error(f"Invalid limit query parameter: {e}")
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'limit must be a number.'})
+        }
+
+    data_service = DataService(table_name=table_name)
+
+    try:
+        changes, token, complete = data_service.get_changes(since=since, limit=limit)
+        logger.info(f"Successfully retrieved {len(changes)} marker changes.")
+    except SyncTokenExpiredError as e:
+        logger.info(f"Expired sync token: {e}")
+        return {
+            'statusCode': 410,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Sync token has expired; sync again without since.'})
+        }
+    except ValueError as e:
+        logger.error(f"Invalid changes request: {e}")
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': str(e)})
+        }
+    except Exception as e:
+        logger.error(f"Error retrieving marker changes: {e}")
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Failed to retrieve marker changes.'})
+        }
+
+    return http_response.compress({
+        'statusCode': 200,
+        'headers': {
+            'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+            'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+            'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+        },
+        'body': json.dumps({'changes': changes, 'token': token, 'complete': complete})
+    }, event)
@@ -1,20 +1,25 @@
 import json
 import os
 import logging
-import boto3
 from data_service import DataService
 from location_marker import LocationMarker
+import marker_cache
+import http_response
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize outside the handler for connection reuse
-dynamodb_resource = boto3.resource('dynamodb')
+# Read-through cache settings; entries within the stale window skip the version check
+CACHE_MAX_ENTRIES = int(os.environ.get('MARKER_CACHE_MAX_ENTRIES', marker_cache.DEFAULT_MAX_ENTRIES))
+CACHE_TTL_SECONDS = float(os.environ.get('MARKER_CACHE_TTL_SECONDS', marker_cache.DEFAULT_TTL_SECONDS))
+CACHE_STALE_SECONDS = float(os.environ.get('MARKER_CACHE_STALE_SECONDS', marker_cache.DEFAULT_STALE_SECONDS))
 
 def lambda_handler(event, context):
     """
-    AWS Lambda handler function to retrieve a location marker.
+    AWS Lambda handler function to retrieve a location marker. Responses carry an ETag
+    derived from the marker version; a request whose If-None-Match still matches it gets
+    a 304 after reading only the version.
 
     :param event: AWS Lambda event object.
     :param context: AWS Lambda context object.
@@ -33,7 +38,9 @@ def lambda_handler(event, context):
             'body': json.dumps({'error': 'Server configuration error.'})
         }
 
-    data_service = DataService(table_name=table_name, dynamodb_resource=dynamodb_resource)
+    cache = marker_cache.get_cache(table_name, max_entries=CACHE_MAX_ENTRIES, ttl_seconds=CACHE_TTL_SECONDS,
+                                   stale_seconds=CACHE_STALE_SECONDS)
+    data_service = DataService(table_name=table_name, low_level=True, cache=cache)
     
     try:
         marker_id = event["queryStringParameters"]["markerId"]
@@ -49,9 +56,29 @@ def lambda_handler(event, context):
             'body': json.dumps({'error': 'Failed to retrieve markerId.'})
         }
 
+    if_none_match = http_response.header(event, 'If-None-Match')
     try:
-        marker = data_service.get_marker(marker_id)
-        logger.info(f"Successfully retrieved marker.")
+        if if_none_match:
+            version = data_service.get_marker_version(marker_id)
+            etag = http_response.version_etag(marker_id, version) if version is not None else None
+            if http_response.etag_matches(if_none_match, etag):
+                logger.info(f"Marker not modified. Cache: {cache.stats()}")
+                return {
+                    'statusCode': 304,
+                    'headers': {
+                        'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                        'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                        'Access-Control-Allow-Headers': 'Content-Type,If-None-Match',  # Allowed headers
+                        'Access-Control-Expose-Headers': 'ETag',
+                        'ETag': etag,
+                        'Cache-Control': http_response.REVALIDATE,
+                    },
+                    'body': ''
+                }
+
+        # Only serialized, so the item is normalized without building a LocationMarker
+        marker = data_service.get_marker(marker_id, raw=True)
+        logger.info(f"Successfully retrieved marker. Cache: {cache.stats()}")
     except Exception as e:
         logger.error(f"Error retrieving marker: {e}")
         return {
@@ -64,12 +91,15 @@ def lambda_handler(event, context):
             'body': json.dumps({'error': 'Failed to retrieve marker.'})
         }
 
-    return {
+    return http_response.compress({
         'statusCode': 200,
         'headers': {
             'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
             'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
-            'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            'Access-Control-Allow-Headers': 'Content-Type,If-None-Match',  # Allowed headers
+            'Access-Control-Expose-Headers': 'ETag',
+            'ETag': http_response.version_etag(marker['markerId'], marker['version']),
+            'Cache-Control': http_response.REVALIDATE,
         },
-        'body': json.dumps(marker.to_json())
-    }
+        'body': json.dumps(marker)
+    }, event)
@@ -1,22 +1,42 @@
 import json
 import os
 import logging
-import boto3
+import gzip
+import base64
 from data_service import DataService
 from location_marker import LocationMarker
+from snapshot_store import S3SnapshotStore
+import http_response
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize outside the handler for connection reuse
-dynamodb_resource = boto3.resource('dynamodb')
+# Page size bounds for GET /markers
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Supported values of the `view` query parameter
+VIEWS = ('full', 'summary')
+
+# How the first summary page is served when a markers snapshot is configured:
+# 'inline' returns the snapshot as the response body, 'redirect' sends a 302 to a presigned URL
+SNAPSHOT_DELIVERY = os.environ.get('SNAPSHOT_DELIVERY', 'inline')
+PRESIGNED_URL_SECONDS = 60
+
+# Last snapshot read by this container, revalidated with a conditional GET on every request;
+# kept both as stored (gzip) and decompressed, for clients that do not accept gzip
+_snapshot = {'etag': None, 'body': None, 'compressed': None}
 
 def lambda_handler(event, context):
     """
-    AWS Lambda handler function to retrieve location markers.
+    AWS Lambda handler function to retrieve a page of location markers. Responses carry an
+    ETag (the snapshot's, or one derived from the markers' versions) and a request whose
+    If-None-Match still matches it gets an empty 304. Large bodies are compressed as
+    Accept-Encoding allows.
 
-    :param event: AWS Lambda event object.
+    :param event: AWS Lambda event object, optionally with `limit`, `nextToken` and `view` query parameters,
+                  or a `bbox` query parameter of the form "minLat,minLon,maxLat,maxLon".
     :param context: AWS Lambda context object.
     :return: HTTP response with status code and body.
     """
@@ -33,11 +53,71 @@ def lambda_handler(event, context):
             'body': json.dumps({'error': 'Server configuration error.'})
         }
 
-    data_service = DataService(table_name=table_name, dynamodb_resource=dynamodb_resource)
+    query_params = event.get('queryStringParameters') or {}
+    if_none_match = http_response.header(event, 'If-None-Match')
+
+    if 'bbox' in query_params:
+        return http_response.compress(get_markers_in_bbox(table_name, query_params['bbox'], if_none_match), event)
+
+    next_token = query_params.get('nextToken')
+    try:
+        limit = int(query_params.get('limit', DEFAULT_PAGE_SIZE))
+        if limit < 1 or limit > MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    except ValueError as e:
+        logger.error(f"Invalid limit parameter: {e}")
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': f'limit must be an integer between 1 and {MAX_PAGE_SIZE}.'})
+        }
+
+    view = query_params.get('view', 'full')
+    if view not in VIEWS:
+        logger.error(f"Invalid view parameter: {view}")
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': f"view must be one of {', '.join(VIEWS)}."})
+        }
+    summary = view == 'summary'
+
+    # The summary view is materialized in S3 by the markers snapshot stream function;
+    # it holds every marker, so limit does not apply and there is no next page
+    snapshot_bucket = os.environ.get('SNAPSHOT_BUCKET')
+    if summary and not next_token and snapshot_bucket:
+        # The stored gzip can only be passed through to clients API Gateway sends bytes to
+        accept_encoding = http_response.header(event, 'Accept-Encoding') if http_response.accepts_binary(event) else None
+        response = get_markers_snapshot(snapshot_bucket, os.environ.get('SNAPSHOT_KEY'), if_none_match,
+                                        accept_encoding)
+        if response:
+            return http_response.compress(response, event)
+
+    data_service = DataService(table_name=table_name, low_level=True)
     
     try:
-        markers = data_service.get_markers()
+        markers, next_token, tag = data_service.get_markers_page_tag(limit=limit, next_token=next_token,
+                                                                     summary=summary)
         logger.info(f"Successfully retrieved {len(markers)} markers.")
+    except ValueError as e:
+        logger.error(f"Invalid nextToken parameter: {e}")
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Invalid nextToken.'})
+        }
     except Exception as e:
         logger.error(f"Error retrieving markers: {e}")
         return {
@@ -50,12 +130,188 @@ def lambda_handler(event, context):
             'body': json.dumps({'error': 'Failed to retrieve markers.'})
         }
 
+    # The page's tag is known before serializing, so a 304 skips json.dumps entirely
+    etag = http_response.content_etag(f"{view}:{limit}:{tag}")
+    return http_response.compress(cacheable_response(
+        lambda: json.dumps({'markers': markers, 'nextToken': next_token}), if_none_match, etag), event)
+
+
+def cacheable_response(render, if_none_match, etag=None):
+    """
+    Build the 200 response of a markers listing with its ETag, or an empty 304 if the client
+    already holds that listing.
+
+    :param render: Function returning the serialized response body; only called when needed.
+    :param if_none_match: The request's If-None-Match header, or None.
+    :param etag: The listing's ETag, or None to hash one from the body.
+    :return: HTTP response with status code and body.
+    """
+    body = None
+    if etag is None:
+        body = render()
+        etag = http_response.content_etag(body)
+    if http_response.etag_matches(if_none_match, etag):
+        return {
+            'statusCode': 304,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type,If-None-Match',  # Allowed headers
+                'Access-Control-Expose-Headers': 'ETag',
+                'ETag': etag,
+                'Cache-Control': http_response.REVALIDATE,
+            },
+            'body': ''
+        }
+
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+            'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+            'Access-Control-Allow-Headers': 'Content-Type,If-None-Match',  # Allowed headers
+            'Access-Control-Expose-Headers': 'ETag',
+            'ETag': etag,
+            'Cache-Control': http_response.REVALIDATE,
+        },
+        'body': render() if body is None else body
+    }
+
+
+def get_markers_in_bbox(table_name, bbox, if_none_match=None):
+    """
+    Retrieve the summaries of all markers inside a bounding box.
+
+    :param table_name: Name of the DynamoDB table.
+    :param bbox: Bounding box as "minLat,minLon,maxLat,maxLon".
+    :param if_none_match: The request's If-None-Match header, or None.
+    :return: HTTP response with status code and body.
+    """
+    try:
+        min_lat, min_lon, max_lat, max_lon = (float(value) for value in bbox.split(','))
+    except ValueError as e:
+        logger.error(f"Invalid bbox parameter: {e}")
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'bbox must be of the form minLat,minLon,maxLat,maxLon.'})
+        }
+
+    data_service = DataService(table_name=table_name)
+
+    try:
+        markers = data_service.query_bbox(min_lat, min_lon, max_lat, max_lon, raw=True)
+        logger.info(f"Successfully retrieved {len(markers)} markers in bbox.")
+    except ValueError as e:
+        logger.error(f"Invalid bbox: {e}")
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': str(e)})
+        }
+    except Exception as e:
+        logger.error(f"Error retrieving markers in bbox: {e}")
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Failed to retrieve markers.'})
+        }
+
+    return cacheable_response(lambda: json.dumps({
+        'markers': markers,
+        'nextToken': None
+    }), if_none_match)
+
+
+def get_markers_snapshot(bucket, key, if_none_match=None, accept_encoding=None):
+    """
+    Serve the summaries of all markers from the snapshot in S3, with the snapshot's S3 ETag.
+    The container's copy is revalidated first, so a client holding the current snapshot
+    gets a 304 for the price of a conditional GET.
+
+    :param bucket: Name of the bucket holding the snapshot.
+    :param key: Object key of the snapshot.
+    :param if_none_match: The request's If-None-Match header, or None.
+    :param accept_encoding: The request's Accept-Encoding header, or None. The snapshot is
+                            stored gzip-compressed and sent as is to clients preferring gzip.
+    :return: HTTP response with status code and body, or None if there is no snapshot to
+             serve and the markers should be scanned instead.
+    """
+    store = S3SnapshotStore(bucket=bucket, key=key)
+    try:
+        body, etag = store.read(if_none_match=_snapshot['etag'])
+        if body is not None:
+            _snapshot.update(etag=etag, body=gzip.decompress(body).decode('utf-8'), compressed=body)
+        elif etag is None:
+            logger.warning("No markers snapshot yet, scanning the table.")
+            return None
+    except Exception as e:
+        logger.error(f"Error reading markers snapshot, scanning the table: {e}")
+        return None
+
+    if http_response.etag_matches(if_none_match, _snapshot['etag']):
+        return {
+            'statusCode': 304,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type,If-None-Match',  # Allowed headers
+                'Access-Control-Expose-Headers': 'ETag',
+                'ETag': _snapshot['etag'],
+                'Cache-Control': http_response.REVALIDATE,
+            },
+            'body': ''
+        }
+
+    if SNAPSHOT_DELIVERY == 'redirect':
+        return {
+            'statusCode': 302,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+                'Location': store.presigned_url(PRESIGNED_URL_SECONDS),
+            },
+            'body': ''
+        }
+
+    if http_response.accepted_encoding(accept_encoding) == 'gzip':
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type,If-None-Match',  # Allowed headers
+                'Access-Control-Expose-Headers': 'ETag',
+                'ETag': 'W/' + _snapshot['etag'],
+                'Cache-Control': http_response.REVALIDATE,
+                'Content-Encoding': 'gzip',
+            },
+            'body': base64.b64encode(_snapshot['compressed']).decode('ascii'),
+            'isBase64Encoded': True
+        }
+
     return {
         'statusCode': 200,
         'headers': {
             'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
             'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
-            'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            'Access-Control-Allow-Headers': 'Content-Type,If-None-Match',  # Allowed headers
+            'Access-Control-Expose-Headers': 'ETag',
+            'ETag': _snapshot['etag'],
+            'Cache-Control': http_response.REVALIDATE,
         },
-        'body': json.dumps([marker.to_json() for marker in markers])
+        'body': _snapshot['body']
     }
@@ -0,0 +1,93 @@
+import json
+import os
+import logging
+from data_service import DataService
+import http_response
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Defaults for GET /markers/nearest
+DEFAULT_K = 10
+DEFAULT_MAX_RADIUS_METERS = 50000.0
+
+def lambda_handler(event, context):
+    """
+    AWS Lambda handler function to find the location markers nearest to a point.
+
+    :param event: AWS Lambda event object, with `lat` and `lon` query parameters and
+                  optional `k` and `maxRadius` (meters) query parameters.
+    :param context: AWS Lambda context object.
+    :return: HTTP response with status code and body.
+    """
+    table_name = os.environ.get('TABLE_NAME')
+    if not table_name:
+        logger.error("TABLE_NAME environment variable is not set.")
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Server configuration error.'})
+        }
+
+    query_params = event.get('queryStringParameters') or {}
+    try:
+        latitude = float(query_params['lat'])
+        longitude = float(query_params['lon'])
+        k = int(query_params.get('k', DEFAULT_K))
+        max_radius = float(query_params.get('maxRadius', DEFAULT_MAX_RADIUS_METERS))
+    except (KeyError, ValueError) as e:
+        logger.error(f"Invalid or missing query parameters: {e}")
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'lat and lon are required; k and maxRadius must be numbers.'})
+        }
+
+    data_service = DataService(table_name=table_name)
+
+    try:
+        results = data_service.nearest(latitude, longitude, k=k, max_radius=max_radius)
+        logger.info(f"Successfully retrieved {len(results)} nearest markers.")
+    except ValueError as e:
+        logger.error(f"Invalid nearest search: {e}")
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': str(e)})
+        }
+    except Exception as e:
+        logger.error(f"Error retrieving nearest markers: {e}")
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Failed to retrieve nearest markers.'})
+        }
+
+    return http_response.compress({
+        'statusCode': 200,
+        'headers': {
+            'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+            'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+            'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+        },
+        'body': json.dumps({
+            'markers': [dict(marker.to_summary_json(), distance=round(distance, 1)) for marker, distance in results]
+        })
+    }, event)
@@ -0,0 +1,61 @@
+import os
+import logging
+from data_service import DataService
+import markers_snapshot
+from snapshot_store import S3SnapshotStore
+from stream_records import apply_detection_records
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Page size of the scan that seeds a missing snapshot
+REBUILD_PAGE_SIZE = 500
+
+def rebuild_items(table_name):
+    """
+    Read every marker of the table, to seed the snapshot when none exists yet.
+
+    :param table_name: Name of the DynamoDB table.
+    :return: Generator of marker items as LocationMarker.normalize_json dictionaries.
+    """
+    data_service = DataService(table_name=table_name, low_level=True)
+    next_token = None
+    while True:
+        markers, next_token = data_service.get_markers_page(limit=REBUILD_PAGE_SIZE, next_token=next_token, raw=True)
+        yield from markers
+        if not next_token:
+            return
+
+def lambda_handler(event, context):
+    """
+    AWS Lambda handler function applying a batch of LocationMarkers stream records to the
+    markers snapshot in S3, and to the DetectionIndex and DetectionEvents tables. Both are
+    applied idempotently; an exception fails the batch, which the event source retries.
+
+    :param event: DynamoDB stream event with the NEW_AND_OLD_IMAGES view.
+    :param context: AWS Lambda context object.
+    :return: Number of records applied, whether the snapshot was rewritten, and the number
+             of index items written and deleted and of events written.
+    """
+    table_name = os.environ.get('TABLE_NAME')
+    bucket = os.environ.get('SNAPSHOT_BUCKET')
+    key = os.environ.get('SNAPSHOT_KEY')
+    index_table_name = os.environ.get('DETECTION_INDEX_TABLE_NAME')
+    events_table_name = os.environ.get('DETECTION_EVENTS_TABLE_NAME')
+    if not table_name or not bucket or not key or not index_table_name or not events_table_name:
+        raise RuntimeError("TABLE_NAME, SNAPSHOT_BUCKET, SNAPSHOT_KEY, DETECTION_INDEX_TABLE_NAME or "
+                           "DETECTION_EVENTS_TABLE_NAME environment variable is not set.")
+
+    records = event.get('Records', [])
+    store = S3SnapshotStore(bucket=bucket, key=key)
+    written = markers_snapshot.update(store, records, rebuild=lambda: rebuild_items(table_name))
+    logger.info(f"Applied {len(records)} stream records; snapshot {'written' if written else 'unchanged'}.")
+
+    data_service = DataService(table_name=table_name, detection_index_table_name=index_table_name,
+                               detection_events_table_name=events_table_name)
+    counts = apply_detection_records(data_service, records)
+    logger.info(f"Detection index: {counts['written']} items written, {counts['deleted']} deleted; "
+                f"{counts['events']} events written.")
+    return {'records': len(records), 'written': written, 'index_written': counts['written'],
+            'index_deleted': counts['deleted'], 'events': counts['events']}
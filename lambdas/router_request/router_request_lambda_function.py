@@ -0,0 +1,85 @@
+import importlib
+import json
+import logging
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Dispatch table from (httpMethod, resource path) to the module of the handler serving it.
+# Modules are imported on first use, so a container only pays for the routes it serves.
+ROUTES = {
+    ('GET', '/markers'): 'get_markers_request.get_markers_request_lambda_function',
+    ('GET', '/markers/nearest'): 'get_nearest_markers_request.get_nearest_markers_request_lambda_function',
+    ('GET', '/markers/changes'): 'get_marker_changes_request.get_marker_changes_request_lambda_function',
+    ('GET', '/markers/batch'): 'batch_get_markers_request.batch_get_markers_request_lambda_function',
+    ('POST', '/markers/batch'): 'batch_add_markers_request.batch_add_markers_request_lambda_function',
+    ('DELETE', '/markers/batch'): 'batch_delete_markers_request.batch_delete_markers_request_lambda_function',
+    ('GET', '/detections'): 'get_detections_request.get_detections_request_lambda_function',
+    ('GET', '/marker'): 'get_marker_request.get_marker_request_lambda_function',
+    ('POST', '/marker'): 'add_marker_request.add_marker_request_lambda_function',
+    ('PUT', '/marker'): 'update_marker_request.update_marker_request_lambda_function',
+    ('PATCH', '/marker'): 'update_marker_request.update_marker_request_lambda_function',
+    ('DELETE', '/marker'): 'delete_marker_request.delete_marker_request_lambda_function',
+    ('GET', '/marker/history'): 'get_historical_images_of_marker.get_historical_images_of_marker',
+    ('GET', '/marker/tile'): 'get_image_tile_request.get_image_tile_request_lambda_function',
+    ('GET', '/marker/events'): 'get_detection_events_request.get_detection_events_request_lambda_function',
+    ('POST', '/marker/capture'): 'add_capture_request.add_capture_request_lambda_function',
+}
+
+# Handlers resolved so far, keyed by module name
+_handlers = {}
+
+def route_key(event):
+    """
+    Build the dispatch key for an API Gateway proxy event. Behind a {proxy+} resource
+    the matched resource is the proxy itself, so the request path is used instead.
+
+    :param event: AWS Lambda event object.
+    :return: Tuple of (httpMethod, resource path).
+    """
+    resource = event.get('resource') or ''
+    if not resource or '{proxy+}' in resource:
+        resource = event.get('path') or '/'
+    return event.get('httpMethod', '').upper(), resource.rstrip('/') or '/'
+
+def lambda_handler(event, context):
+    """
+    AWS Lambda handler function routing every marker API request to its handler.
+
+    :param event: AWS Lambda event object.
+    :param context: AWS Lambda context object.
+    :return: HTTP response with status code and body.
+    """
+    key = route_key(event)
+    module_name = ROUTES.get(key)
+    allowed = sorted(method for method, path in ROUTES if path == key[1])
+    if not module_name and allowed:
+        logger.error(f"Method {key[0]} not allowed on {key[1]}")
+        return {
+            'statusCode': 405,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+                'Allow': ','.join(allowed),
+            },
+            'body': json.dumps({'error': 'Method not allowed.'})
+        }
+    if not module_name:
+        logger.error(f"No route for {key[0]} {key[1]}")
+        return {
+            'statusCode': 404,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Route not found.'})
+        }
+
+    handler = _handlers.get(module_name)
+    if handler is None:
+        handler = importlib.import_module(module_name).lambda_handler
+        _handlers[module_name] = handler
+    return handler(event, context)
@@ -1,22 +1,19 @@
 import json
 import os
 import logging
-import boto3
-from data_service import DataService
-from location_marker import LocationMarker
+from data_service import DataService, MarkerNotFoundError, VersionConflictError
+import http_response
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize outside the handler for connection reuse
-dynamodb_resource = boto3.resource('dynamodb')
-
 def lambda_handler(event, context):
     """
-    AWS Lambda handler function to update new location marker.
+    AWS Lambda handler function to partially update a location marker (PUT or PATCH).
 
-    :param event: AWS Lambda event object, expected to contain the marker data in the body.
+    :param event: AWS Lambda event object, expected to contain the markerId, the fields to change
+                  and optionally the expected `version` in the body.
     :param context: AWS Lambda context object.
     :return: HTTP response with status code and body.
     """
@@ -34,9 +31,12 @@ def lambda_handler(event, context):
         }
 
     try:
-        body = json.loads(event.get('body', '{}'))
-        marker = LocationMarker.from_json(body)
-    except (json.JSONDecodeError, KeyError) as e:
+        body = json.loads(http_response.request_body(event) or '{}')
+        marker_id = body['markerId']
+        expected_version = int(body['version']) if body.get('version') is not None else None
+        # Read-only attributes (dateCreated, version, ...) are ignored so a full marker can be sent back
+        changes = {field: value for field, value in body.items() if field in DataService.UPDATABLE_FIELDS}
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
         logger.error(f"Invalid or missing body in the request: {e}")
         return {
             'statusCode': 400,
@@ -47,8 +47,24 @@ def lambda_handler(event, context):
             },
             'body': json.dumps({'error': 'Invalid request body.'})
         }
-    except Exception as e:
-        logger.error(f"Error creating LocationMarker from JSON: {e}")
+
+    data_service = DataService(table_name=table_name,
+                               history_table_name=os.environ.get('HISTORY_TABLE_NAME'))
+
+    try:
+        new_version = data_service.update_marker_fields(marker_id, changes, expected_version)
+        logger.info(f"Successfully updated marker {marker_id} to version {new_version}.")
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'message': 'Marker updated successfully', 'markerId': marker_id, 'version': new_version})
+        }
+    except ValueError as e:
+        logger.error(f"Invalid marker update: {e}")
         return {
             'statusCode': 400,
             'headers': {
@@ -56,22 +72,30 @@ def lambda_handler(event, context):
                 'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
                 'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
             },
-            'body': json.dumps({'error': 'Invalid marker data format.'})
+            'body': json.dumps({'error': str(e)})
         }
-
-    data_service = DataService(table_name=table_name, dynamodb_resource=dynamodb_resource)
-
-    try:
-        data_service.update_marker(marker)
-        logger.info(f"Successfully updated marker.")
+    except MarkerNotFoundError as e:
+        logger.error(f"Marker to update does not exist: {e}")
+        return {
+            'statusCode': 404,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
+                'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
+                'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
+            },
+            'body': json.dumps({'error': 'Marker not found.'})
+        }
+    except VersionConflictError as e:
+        logger.warning(f"Version conflict updating marker: {e}")
         return {
-            'statusCode': 201,
+            'statusCode': 409,
             'headers': {
                 'Access-Control-Allow-Origin': '*',  # Allow all origins for testing
                 'Access-Control-Allow-Methods': 'GET,OPTIONS',  # Allowed methods
                 'Access-Control-Allow-Headers': 'Content-Type',  # Allowed headers
             },
-            'body': json.dumps({'message': 'Marker updated successfully'})
+            'body': json.dumps({'error': 'Marker was modified by another request.',
+                                'currentVersion': e.current_version})
         }
     except Exception as e:
         logger.error(f"Failed to update marker and upload to DynamoDB: {e}")
@@ -0,0 +1,74 @@
+from decimal import Decimal
+
+# Decoder for items in DynamoDB's low-level wire format ({"S": "..."}, {"M": {...}}, ...),
+# used by DataService in place of boto3's TypeDeserializer. Nested maps and lists are
+# decoded with an explicit stack instead of recursion, so deep historicalImages lists cost
+# one loop iteration per attribute rather than a chain of method calls.
+
+
+def _number(text: str):
+    """
+    Decodes an N attribute. Integers, by far the most common numbers in marker items
+    (e.g. version), become int; anything else keeps its exact value as a Decimal,
+    as TypeDeserializer would return.
+    """
+    digits = text[1:] if text[:1] == '-' else text
+    return int(text) if digits.isdigit() else Decimal(text)
+
+
+def decode_item(item: dict) -> dict:
+    """
+    Decodes an item (or key) in wire format into plain Python values.
+
+    :param item: Mapping of attribute name to attribute value, e.g. {"markerId": {"S": "..."}}.
+    :return: Dictionary of attribute name to decoded value.
+    :raises ValueError: If an attribute value does not have exactly one, known, type.
+    """
+    result = {}
+    # Each entry is a container being filled and the wire-format attributes that fill it
+    stack = [(result, item.items())]
+    while stack:
+        target, attributes = stack.pop()
+        for key, attribute in attributes:
+            [(attribute_type, value)] = attribute.items()  # Exactly one type per attribute value
+            if attribute_type == 'S':
+                decoded = value
+            elif attribute_type == 'M':
+                decoded = {}
+                stack.append((decoded, value.items()))
+            elif attribute_type == 'L':
+                decoded = [None] * len(value)
+                stack.append((decoded, enumerate(value)))
+            elif attribute_type == 'N':
+                decoded = _number(value)
+            elif attribute_type == 'BOOL':
+                decoded = value
+            elif attribute_type == 'NULL':
+                decoded = None
+            elif attribute_type == 'SS' or attribute_type == 'BS':
+                decoded = set(value)
+            elif attribute_type == 'NS':
+                decoded = {_number(number) for number in value}
+            elif attribute_type == 'B':
+                decoded = value
+            else:
+                raise ValueError(f"Unknown attribute type {attribute_type!r} for {key!r}")
+            target[key] = decoded
+    return result
+
+
+def encode_key(key: dict) -> dict:
+    """
+    Encodes a table or index key into wire format. Every key attribute in this
+    service (markerId, dateTaken, geohashPrefix, geohash) is a string.
+
+    :param key: Dictionary of key attribute name to string value.
+    :return: Key in wire format.
+    :raises ValueError: If a key attribute is not a string.
+    """
+    encoded = {}
+    for name, value in key.items():
+        if not isinstance(value, str):
+            raise ValueError(f"Key attribute {name!r} must be a string")
+        encoded[name] = {'S': value}
+    return encoded
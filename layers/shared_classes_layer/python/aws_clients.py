@@ -0,0 +1,50 @@
+import threading
+from typing import Optional
+
+# boto3 is imported and each client built on first use rather than at module load, so
+# handlers that never reach AWS (validation errors, unknown routes) skip the cost,
+# and every handler in a container shares one instance per service.
+_dynamodb_resource = None
+_s3_client = None
+_lock = threading.Lock()
+
+
+def get_dynamodb_resource():
+    """
+    Returns the DynamoDB service resource shared by the whole container, creating it on first call.
+
+    :return: A boto3 DynamoDB ServiceResource.
+    """
+    global _dynamodb_resource
+    if _dynamodb_resource is None:
+        with _lock:
+            if _dynamodb_resource is None:
+                import boto3
+                _dynamodb_resource = boto3.resource('dynamodb')
+    return _dynamodb_resource
+
+
+def get_s3_client():
+    """
+    Returns the S3 client shared by the whole container, creating it on first call.
+
+    :return: A boto3 S3 client.
+    """
+    global _s3_client
+    if _s3_client is None:
+        with _lock:
+            if _s3_client is None:
+                import boto3
+                _s3_client = boto3.client('s3')
+    return _s3_client
+
+
+def error_code(error: Exception) -> Optional[str]:
+    """
+    Returns the AWS error code of a botocore ClientError, or None for any other exception.
+    Checked structurally so that botocore does not have to be imported up front.
+    """
+    response = getattr(error, 'response', None)
+    if not isinstance(response, dict):
+        return None
+    return response.get('Error', {}).get('Code')
@@ -0,0 +1,125 @@
+import threading
+import time
+from typing import Callable, Dict, NamedTuple, Optional
+
+import change_detection
+from data_service import VersionConflictError
+import image_hash
+from image import Image
+
+# Hash functions captures can be compared with; a table must stick to one of them. dhash
+# misses changes covering a few percent of the frame, so phash is the default
+HASH_METHODS = {'dhash': image_hash.dhash, 'phash': image_hash.phash}
+DEFAULT_METHOD = 'phash'
+
+# Captures within this many differing bits (of 64) of a recent image are considered unchanged
+DEFAULT_MAX_DISTANCE = 6
+
+# Hashes of the latest stored images kept on each marker
+RECENT_HASHES = 8
+
+# Attempts at storing a capture when other writes to the marker keep changing its version
+MAX_STORE_ATTEMPTS = 5
+
+
+class CaptureResult(NamedTuple):
+    """Outcome of record_capture()."""
+    stored: bool  # False if the capture was collapsed into the marker's unchanged counter
+    perceptual_hash: str
+    distance: Optional[int]  # Distance to the nearest recent hash, None if the marker had none
+    unchanged_captures: int  # Captures skipped since the current image
+
+
+class DedupStats:
+    """
+    Running counts of the captures a container has recorded, kept for its lifetime and
+    logged by the handlers, like the marker cache statistics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(("captures", "duplicates", "hash_seconds", "store_seconds",
+                                        "collapse_seconds"), 0)
+
+    def record(self, duplicate: bool, hash_seconds: float, write_seconds: float):
+        with self._lock:
+            self._counters["captures"] += 1
+            self._counters["duplicates"] += int(duplicate)
+            self._counters["hash_seconds"] += hash_seconds
+            self._counters["collapse_seconds" if duplicate else "store_seconds"] += write_seconds
+
+    def stats(self) -> Dict[str, float]:
+        """
+        :return: The counters, the dedup rate, and the write time saved: for each duplicate,
+                 the mean time of storing a capture minus the mean time of collapsing one.
+                 Hashing every capture costs hash_seconds in return. The stream work skipped
+                 downstream (change detection, pyramids) comes on top and is not counted.
+        """
+        with self._lock:
+            stats = dict(self._counters)
+        stored = stats["captures"] - stats["duplicates"]
+        stats["dedup_rate"] = stats["duplicates"] / stats["captures"] if stats["captures"] else 0.0
+        if stored and stats["duplicates"]:
+            per_store = stats["store_seconds"] / stored
+            per_collapse = stats["collapse_seconds"] / stats["duplicates"]
+            stats["write_seconds_saved"] = stats["duplicates"] * (per_store - per_collapse)
+        else:
+            stats["write_seconds_saved"] = 0.0
+        return stats
+
+
+# Statistics of the captures recorded by this container
+stats = DedupStats()
+
+
+def record_capture(data_service, marker_id: str, image: Image,
+                   read_image: Callable[[Image], bytes] = change_detection.read_s3_image,
+                   max_distance: int = DEFAULT_MAX_DISTANCE, method: str = DEFAULT_METHOD,
+                   dedup_stats: DedupStats = stats) -> CaptureResult:
+    """
+    Record a new capture of a marker, unless it looks like one of the marker's recent images.
+    A distinct capture is stored like DataService.append_image, and its hash joins the
+    marker's recent hashes; a near-identical one only increments the marker's
+    unchangedCaptures and sets its lastCaptureDate, so no history entry is written and the
+    stream functions do not process it. The recent hashes are only replaced if the marker is
+    still at the version they were read at; otherwise they are read again and the capture
+    compared anew, so concurrent captures do not drop each other's hashes.
+
+    :param data_service: DataService of the marker table.
+    :param marker_id: Unique identifier for the marker.
+    :param image: The captured Image; its dateTaken must be set.
+    :param read_image: Returns the encoded bytes of an Image; defaults to reading from S3.
+    :param max_distance: Largest hash distance at which a capture counts as unchanged.
+    :param method: Name of the hash function in HASH_METHODS.
+    :param dedup_stats: Statistics to update.
+    :return: A CaptureResult.
+    :raises ValueError: If the image has no dateTaken or cannot be read or decoded.
+    :raises MarkerNotFoundError: If the marker does not exist.
+    :raises VersionConflictError: If the marker kept changing over MAX_STORE_ATTEMPTS attempts.
+    """
+    if not image.get_date_taken():
+        raise ValueError("Image must have a dateTaken")
+    started = time.perf_counter()
+    perceptual_hash = HASH_METHODS[method](change_detection.load_image(read_image(image)))
+    hashed = time.perf_counter()
+    image.set_perceptual_hash(perceptual_hash)
+
+    for attempt in range(MAX_STORE_ATTEMPTS):
+        recent_hashes, version = data_service.get_recent_hashes(marker_id)
+        distance = min((image_hash.hamming_distance(perceptual_hash, recent) for recent in recent_hashes),
+                       default=None)
+        if distance is not None and distance <= max_distance:
+            unchanged_captures = data_service.collapse_capture(marker_id, image.get_date_taken())
+            result = CaptureResult(False, perceptual_hash, distance, unchanged_captures)
+            break
+        try:
+            data_service.append_image(marker_id, image, recent_hashes=([perceptual_hash] + recent_hashes)[:RECENT_HASHES],
+                                      expected_version=version)
+        except VersionConflictError:
+            if attempt == MAX_STORE_ATTEMPTS - 1:
+                raise
+            continue
+        result = CaptureResult(True, perceptual_hash, distance, 0)
+        break
+    dedup_stats.record(not result.stored, hashed - started, time.perf_counter() - hashed)
+    return result
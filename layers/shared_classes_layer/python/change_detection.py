@@ -0,0 +1,286 @@
+from datetime import datetime, timezone
+from typing import Callable, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+import aws_clients
+from change_record import ChangeRecord
+from image import Image
+
+# Side of the square blocks change is scored on, in pixels
+DEFAULT_BLOCK_SIZE = 16
+
+# Mean absolute intensity difference (0 to 1) above which a block counts as changed
+DEFAULT_THRESHOLD = 0.1
+
+# Images are downsampled to at most this many pixels per side to estimate the shift
+ALIGNMENT_MAX_SIDE = 512
+
+# Shifts larger than this fraction of the image are not trusted, and the images are compared unshifted
+MAX_SHIFT_FRACTION = 0.25
+
+# Rows of blocks scored at a time, bounding the temporary arrays on large captures
+STRIP_BLOCK_ROWS = 32
+
+
+class ChangeResult(NamedTuple):
+    """Outcome of comparing two images with compare()."""
+    score: float  # Mean absolute difference over the compared area, 0 to 1
+    changed_fraction: float  # Fraction of blocks above the threshold
+    mask: np.ndarray  # Boolean block mask, True where a block changed
+    region: Optional[Tuple[int, int, int, int]]  # (x0, y0, x1, y1) of the changed blocks in the current image
+    shift: Tuple[int, int]  # (dy, dx) such that current[y, x] ~ previous[y - dy, x - dx]
+
+
+def load_image(data: bytes) -> np.ndarray:
+    """
+    Decode an image into a grayscale float32 array with intensities between 0 and 1.
+    Netpbm images (PGM/PPM, binary or plain) are decoded with NumPy alone; other formats
+    (JPEG, PNG) need Pillow.
+
+    :param data: The encoded image.
+    :return: Array of shape (height, width).
+    :raises ValueError: If the image cannot be decoded.
+    """
+    if is_netpbm(data):
+        image = read_netpbm(data)
+        if image.shape[2] == 3:
+            return image @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+        return image[:, :, 0]
+    try:
+        from PIL import Image as PILImage  # Optional; only needed for compressed formats
+    except ImportError as e:
+        raise ValueError("Only PGM/PPM images can be decoded without Pillow") from e
+    import io
+    try:
+        with PILImage.open(io.BytesIO(data)) as picture:
+            return np.asarray(picture.convert('L'), dtype=np.float32) / 255.0
+    except OSError as e:
+        raise ValueError("Image cannot be decoded") from e
+
+
+def is_netpbm(data: bytes) -> bool:
+    """
+    :return: True if data starts like a PGM (P2/P5) or PPM (P3/P6) image.
+    """
+    return data[:2] in (b'P2', b'P3', b'P5', b'P6')
+
+
+def read_netpbm(data: bytes) -> np.ndarray:
+    """
+    Decode a PGM (P2/P5) or PPM (P3/P6) image.
+
+    :param data: The encoded image.
+    :return: float32 array of shape (height, width, channels) with intensities between 0 and 1,
+             with 1 channel for PGM and 3 for PPM.
+    :raises ValueError: If the image is truncated.
+    """
+    magic = data[:2]
+    # Header: magic, width, height, maxval, separated by whitespace and # comments
+    fields, position = [], 2
+    while len(fields) < 3:
+        while position < len(data) and data[position:position + 1].isspace():
+            position += 1
+        if data[position:position + 1] == b'#':
+            position = data.index(b'\n', position) + 1
+            continue
+        start = position
+        while position < len(data) and not data[position:position + 1].isspace():
+            position += 1
+        fields.append(int(data[start:position]))
+    width, height, maxval = fields
+    channels = 3 if magic in (b'P3', b'P6') else 1
+    count = width * height * channels
+
+    if magic in (b'P5', b'P6'):
+        dtype = np.dtype('>u2') if maxval > 255 else np.uint8
+        pixels = np.frombuffer(data, dtype=dtype, count=count, offset=position + 1)
+    else:
+        pixels = np.array(data[position:].split()[:count], dtype=np.int64)
+    if pixels.size != count:
+        raise ValueError("Truncated netpbm image")
+
+    return pixels.reshape(height, width, channels).astype(np.float32) / maxval
+
+
+def _downsample(image: np.ndarray, factor: int) -> np.ndarray:
+    """
+    Average non-overlapping factor x factor blocks of an image.
+    """
+    if factor <= 1:
+        return image
+    height, width = (image.shape[0] // factor) * factor, (image.shape[1] // factor) * factor
+    return image[:height, :width].reshape(height // factor, factor, width // factor, factor).mean(axis=(1, 3))
+
+
+def estimate_shift(previous: np.ndarray, current: np.ndarray) -> Tuple[int, int]:
+    """
+    Estimate the translation between two captures of the same scene by phase correlation,
+    on copies downsampled to at most ALIGNMENT_MAX_SIDE pixels per side.
+
+    :param previous: Earlier image, as returned by load_image.
+    :param current: Later image of the same shape.
+    :return: (dy, dx) such that current[y, x] ~ previous[y - dy, x - dx], or (0, 0) if the
+             estimated shift exceeds MAX_SHIFT_FRACTION of the image.
+    """
+    factor = max(1, -(-max(previous.shape) // ALIGNMENT_MAX_SIDE))
+    a, b = _downsample(previous, factor), _downsample(current, factor)
+    window = np.outer(np.hanning(a.shape[0]), np.hanning(a.shape[1])).astype(np.float32)
+    spectrum_a = np.fft.rfft2((a - a.mean()) * window)
+    spectrum_b = np.fft.rfft2((b - b.mean()) * window)
+    cross_power = spectrum_b * np.conj(spectrum_a)
+    cross_power /= np.abs(cross_power) + 1e-12
+    correlation = np.fft.irfft2(cross_power, s=a.shape)
+
+    peak_y, peak_x = np.unravel_index(np.argmax(correlation), correlation.shape)
+    dy = peak_y - a.shape[0] if peak_y > a.shape[0] // 2 else peak_y
+    dx = peak_x - a.shape[1] if peak_x > a.shape[1] // 2 else peak_x
+    if abs(dy) > a.shape[0] * MAX_SHIFT_FRACTION or abs(dx) > a.shape[1] * MAX_SHIFT_FRACTION:
+        return 0, 0
+    return int(dy) * factor, int(dx) * factor
+
+
+def _overlap(previous: np.ndarray, current: np.ndarray, shift: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Crop two images to the area they share once current is moved back by shift.
+    """
+    height, width = min(previous.shape[0], current.shape[0]), min(previous.shape[1], current.shape[1])
+    dy, dx = shift
+    previous = previous[max(0, -dy):height - max(0, dy), max(0, -dx):width - max(0, dx)]
+    current = current[max(0, dy):height - max(0, -dy), max(0, dx):width - max(0, -dx)]
+    return previous, current
+
+
+def compare(previous: np.ndarray, current: np.ndarray, block_size: int = DEFAULT_BLOCK_SIZE,
+            threshold: float = DEFAULT_THRESHOLD) -> ChangeResult:
+    """
+    Score the change between two captures of a scene. The current image is aligned on the
+    previous one, its brightness and contrast are matched to it, and the mean absolute
+    difference is computed per block_size x block_size block, a strip of blocks at a time.
+
+    :param previous: Earlier image, as returned by load_image.
+    :param current: Later image, as returned by load_image.
+    :param block_size: Side of the scored blocks, in pixels.
+    :param threshold: Block score above which a block counts as changed.
+    :return: A ChangeResult.
+    :raises ValueError: If the aligned images do not overlap by at least one block.
+    """
+    shift = estimate_shift(previous, current) if previous.shape == current.shape else (0, 0)
+    previous, current = _overlap(previous, current, shift)
+    rows, columns = previous.shape[0] // block_size, previous.shape[1] // block_size
+    if rows == 0 or columns == 0:
+        raise ValueError("Images do not overlap by a whole block")
+    previous = previous[:rows * block_size, :columns * block_size]
+    current = current[:rows * block_size, :columns * block_size]
+
+    # Gain and offset that match the current image's brightness and contrast to the previous one
+    gain = previous.std() / max(float(current.std()), 1e-6)
+    offset = previous.mean() - gain * current.mean()
+
+    scores = np.empty((rows, columns), dtype=np.float32)
+    strip_height = STRIP_BLOCK_ROWS * block_size
+    for strip in range(0, rows, STRIP_BLOCK_ROWS):
+        top = strip * block_size
+        difference = np.abs(previous[top:top + strip_height] - (current[top:top + strip_height] * gain + offset))
+        strip_rows = difference.shape[0] // block_size
+        scores[strip:strip + strip_rows] = difference.reshape(strip_rows, block_size, columns, block_size).mean(axis=(1, 3))
+
+    mask = scores > threshold
+    region = None
+    if mask.any():
+        changed_rows, changed_columns = np.flatnonzero(mask.any(axis=1)), np.flatnonzero(mask.any(axis=0))
+        origin_y, origin_x = max(0, shift[0]), max(0, shift[1])
+        region = (origin_x + int(changed_columns[0]) * block_size, origin_y + int(changed_rows[0]) * block_size,
+                  origin_x + (int(changed_columns[-1]) + 1) * block_size,
+                  origin_y + (int(changed_rows[-1]) + 1) * block_size)
+    return ChangeResult(score=float(scores.mean()), changed_fraction=float(mask.mean()), mask=mask,
+                        region=region, shift=shift)
+
+
+def change_record(result: ChangeResult, current: Image, previous: Image,
+                  block_size: int = DEFAULT_BLOCK_SIZE) -> ChangeRecord:
+    """
+    Build the ChangeRecord stored on a marker from a comparison result.
+
+    :param result: The result of compare().
+    :param current: The marker's current Image.
+    :param previous: The Image it was compared with.
+    :param block_size: The block size compare() used.
+    :return: A ChangeRecord; scores are stored as strings, like coordinates.
+    """
+    return ChangeRecord(date_compared=datetime.now(timezone.utc).isoformat(),
+                        current_date_taken=current.get_date_taken(),
+                        previous_date_taken=previous.get_date_taken(),
+                        score=f"{result.score:.4f}",
+                        changed_fraction=f"{result.changed_fraction:.4f}",
+                        changed_blocks=int(result.mask.sum()),
+                        block_size=block_size,
+                        region=list(result.region) if result.region else None,
+                        shift=list(result.shift))
+
+
+def read_s3_image(image: Image) -> bytes:
+    """
+    Download an image from the S3 location it records.
+
+    :raises ValueError: If the object does not exist.
+    """
+    try:
+        response = aws_clients.get_s3_client().get_object(Bucket=image.get_s3_bucket_name(), Key=image.get_s3_key())
+    except Exception as e:
+        if aws_clients.error_code(e) in ('NoSuchKey', '404'):
+            raise ValueError(f"Image s3://{image.get_s3_bucket_name()}/{image.get_s3_key()} does not exist") from e
+        raise
+    return response['Body'].read()
+
+
+def previous_image(data_service, marker) -> Optional[Image]:
+    """
+    Find the most recent image of a marker taken before its current image.
+
+    :param data_service: DataService of the marker table.
+    :param marker: The LocationMarker.
+    :return: The previous Image, or None if the current image is the first one.
+    """
+    current = marker.get_current_image()
+    if data_service.history_table:
+        # The current image is normally the newest history item, so two items are enough
+        history, _ = data_service.get_historical_images(marker.get_marker_id(), date_to=current.get_date_taken(),
+                                                        newest_first=True, limit=2)
+    else:
+        history = sorted(marker.get_historical_images(), key=lambda image: image.get_date_taken(), reverse=True)
+    for image in history:
+        if image.get_date_taken() < current.get_date_taken():
+            return image
+    return None
+
+
+def detect_marker_change(data_service, marker,
+                         read_image: Callable[[Image], bytes] = read_s3_image,
+                         block_size: int = DEFAULT_BLOCK_SIZE,
+                         threshold: float = DEFAULT_THRESHOLD) -> Optional[ChangeRecord]:
+    """
+    Compare a marker's current image with the previous one and store the result as the
+    marker's lastChange.
+
+    :param data_service: DataService of the marker table.
+    :param marker: The LocationMarker, e.g. built from a stream record's NewImage.
+    :param read_image: Returns the encoded bytes of an Image; defaults to reading from S3.
+    :param block_size: Side of the scored blocks, in pixels.
+    :param threshold: Block score above which a block counts as changed.
+    :return: The stored ChangeRecord, or None if the marker has fewer than two images.
+    :raises ValueError: If an image cannot be read or decoded.
+    :raises MarkerNotFoundError: If the marker was deleted in the meantime.
+    """
+    current = marker.get_current_image()
+    if current is None:
+        return None
+    previous = previous_image(data_service, marker)
+    if previous is None:
+        return None
+
+    result = compare(load_image(read_image(previous)), load_image(read_image(current)),
+                     block_size=block_size, threshold=threshold)
+    record = change_record(result, current, previous, block_size)
+    data_service.set_last_change(marker.get_marker_id(), record)
+    return record
@@ -0,0 +1,133 @@
+from typing import Dict, List, Optional
+
+class ChangeRecord:
+    __slots__ = ("_date_compared", "_current_date_taken", "_previous_date_taken", "_score", "_changed_fraction",
+                 "_changed_blocks", "_block_size", "_region", "_shift")
+
+    def __init__(self, date_compared: str, current_date_taken: str, previous_date_taken: str, score: str,
+                 changed_fraction: str, changed_blocks: int, block_size: int, region: Optional[List[int]] = None,
+                 shift: Optional[List[int]] = None):
+        """
+        Constructor for the ChangeRecord class, the result of comparing a marker's current
+        image with the previous one.
+
+        :param date_compared: Date when the images were compared, as a string.
+        :param current_date_taken: dateTaken of the current image.
+        :param previous_date_taken: dateTaken of the image it was compared with.
+        :param score: Mean absolute intensity difference (0 to 1) after alignment, as a string.
+        :param changed_fraction: Fraction of blocks above the change threshold (0 to 1), as a string.
+        :param changed_blocks: Number of blocks above the change threshold.
+        :param block_size: Side of the square blocks, in pixels.
+        :param region: Bounding box [x0, y0, x1, y1] of the changed blocks in the current image, or None.
+        :param shift: Translation [dy, dx] of the current image relative to the previous one, in pixels.
+        """
+        self._date_compared = date_compared
+        self._current_date_taken = current_date_taken
+        self._previous_date_taken = previous_date_taken
+        self._score = score
+        self._changed_fraction = changed_fraction
+        self._changed_blocks = changed_blocks
+        self._block_size = block_size
+        self._region = region
+        self._shift = shift or [0, 0]
+
+    # Getters
+    def get_date_compared(self) -> str:
+        return self._date_compared
+
+    def get_current_date_taken(self) -> str:
+        return self._current_date_taken
+
+    def get_previous_date_taken(self) -> str:
+        return self._previous_date_taken
+
+    def get_score(self) -> str:
+        return self._score
+
+    def get_changed_fraction(self) -> str:
+        return self._changed_fraction
+
+    def get_changed_blocks(self) -> int:
+        return self._changed_blocks
+
+    def get_block_size(self) -> int:
+        return self._block_size
+
+    def get_region(self) -> Optional[List[int]]:
+        return self._region
+
+    def get_shift(self) -> List[int]:
+        return self._shift
+
+    # JSON Serialization
+    def to_json(self) -> Dict[str, any]:
+        """
+        Converts the ChangeRecord instance to a JSON-compatible dictionary.
+
+        :return: Dictionary with change details.
+        """
+        return {
+            "dateCompared": self._date_compared,
+            "currentDateTaken": self._current_date_taken,
+            "previousDateTaken": self._previous_date_taken,
+            "score": self._score,
+            "changedFraction": self._changed_fraction,
+            "changedBlocks": self._changed_blocks,
+            "blockSize": self._block_size,
+            "region": self._region,
+            "shift": self._shift
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, any]) -> 'ChangeRecord':
+        """
+        Creates a ChangeRecord instance from a JSON-compatible dictionary.
+
+        :param data: Dictionary with change details.
+        :return: A new ChangeRecord instance.
+        """
+        normalized = cls.normalize_json(data)
+        instance = cls.__new__(cls)
+        instance._date_compared = normalized["dateCompared"]
+        instance._current_date_taken = normalized["currentDateTaken"]
+        instance._previous_date_taken = normalized["previousDateTaken"]
+        instance._score = normalized["score"]
+        instance._changed_fraction = normalized["changedFraction"]
+        instance._changed_blocks = normalized["changedBlocks"]
+        instance._block_size = normalized["blockSize"]
+        instance._region = normalized["region"]
+        instance._shift = normalized["shift"]
+        return instance
+
+    @staticmethod
+    def normalize_json(data: Dict[str, any]) -> Dict[str, any]:
+        """
+        Returns the dictionary ChangeRecord.from_json(data).to_json() would produce, without building the object.
+
+        :param data: Dictionary with change details.
+        :return: Dictionary with exactly the ChangeRecord keys.
+        """
+        get = data.get
+        region = get("region")
+        return {
+            "dateCompared": get("dateCompared", ""),
+            "currentDateTaken": get("currentDateTaken", ""),
+            "previousDateTaken": get("previousDateTaken", ""),
+            "score": get("score", "0"),
+            "changedFraction": get("changedFraction", "0"),
+            "changedBlocks": int(get("changedBlocks", 0)),  # DynamoDB returns numbers as Decimal
+            "blockSize": int(get("blockSize", 0)),
+            "region": [int(value) for value in region] if region else None,
+            "shift": [int(value) for value in get("shift") or [0, 0]]
+        }
+
+    def __repr__(self) -> str:
+        """
+        Returns a string representation of the ChangeRecord instance.
+
+        :return: String representation of ChangeRecord.
+        """
+        return (f"ChangeRecord(current_date_taken='{self._current_date_taken}', "
+                f"previous_date_taken='{self._previous_date_taken}', "
+                f"score='{self._score}', changed_fraction='{self._changed_fraction}', "
+                f"region={self._region}, shift={self._shift})")
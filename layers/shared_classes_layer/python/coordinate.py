@@ -1,6 +1,11 @@
 import json
+from typing import Optional
+
+import geohash
 
 class Coordinate:
+    __slots__ = ("_longitude", "_latitude")
+
     def __init__(self, longitude: str, latitude: str):
         """
         Constructor for the Coordinate class.
@@ -27,6 +32,18 @@ class Coordinate:
         """
         return self._latitude
 
+    def get_geohash(self, precision: int = 9) -> Optional[str]:
+        """
+        Returns the geohash of the coordinate.
+        
+        :param precision: Number of geohash characters.
+        :return: Geohash as a string, or None if the coordinate is missing or invalid.
+        """
+        try:
+            return geohash.encode(float(self._latitude), float(self._longitude), precision)
+        except (TypeError, ValueError):
+            return None
+
     def to_json(self) -> dict:
         """
         Converts the Coordinate instance to a JSON-compatible dictionary.
@@ -46,10 +63,23 @@ class Coordinate:
         :param data: Dictionary containing longitude and latitude.
         :return: A new Coordinate instance.
         """
-        return cls(
-            longitude=data.get("longitude", ""),
-            latitude=data.get("latitude", "")
-        )
+        instance = cls.__new__(cls)
+        instance._longitude = data.get("longitude", "")
+        instance._latitude = data.get("latitude", "")
+        return instance
+
+    @staticmethod
+    def normalize_json(data: dict) -> dict:
+        """
+        Returns the dictionary Coordinate.from_json(data).to_json() would produce, without building the Coordinate.
+        
+        :param data: Dictionary containing longitude and latitude.
+        :return: Dictionary with longitude and latitude.
+        """
+        return {
+            "longitude": data.get("longitude", ""),
+            "latitude": data.get("latitude", "")
+        }
 
     def __repr__(self) -> str:
         """
@@ -1,36 +1,990 @@
-import boto3
-from typing import List
+import base64
+import copy
+import hashlib
+import heapq
+import json
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Optional, Tuple, Union
 from location_marker import LocationMarker
+from coordinate import Coordinate
+from image import Image
+from detected_objects import DetectedObjects
+from change_record import ChangeRecord
+import geohash
+import detection_index
+import detection_events
+import aws_clients
+import marker_cache
+from attribute_decoder import decode_item, encode_key
 import uuid
 
+# Global secondary index keyed on geohashPrefix (partition) and geohash (sort)
+GEOHASH_INDEX_NAME = 'GeohashIndex'
+
+# Upper bound on the number of geohash cells (and so index queries) for one bounding box
+MAX_BBOX_CELLS = 32
+
+# Number of threads used to run index queries concurrently
+QUERY_WORKERS = 8
+
+# DynamoDB per-request limits for BatchGetItem and BatchWriteItem
+BATCH_GET_LIMIT = 100
+BATCH_WRITE_LIMIT = 25
+
+# Retries of UnprocessedKeys/UnprocessedItems use full-jitter exponential backoff
+BATCH_MAX_ATTEMPTS = 8
+BATCH_BACKOFF_BASE_SECONDS = 0.05
+BATCH_BACKOFF_MAX_SECONDS = 2.0
+
+# Limits for nearest-marker searches
+MAX_NEAREST_K = 100
+MAX_NEAREST_RADIUS_METERS = 500000.0
+
+# The ring search starts with cells of NEAREST_START_PRECISION (about 150 m) and searches this
+# many rings of them before moving to the next coarser precision, down to the one whose cells
+# reach max_radius within this many rings. It never queries more than MAX_NEAREST_CELLS cells
+NEAREST_START_PRECISION = 7
+NEAREST_TARGET_RINGS = 3
+MAX_NEAREST_CELLS = 512
+
+# Global secondary index keyed on syncPartition (partition) and updatedAt (sort)
+SYNC_INDEX_NAME = 'SyncIndex'
+
+# Deleted markers stay in the table as tombstones for this long, so that clients syncing
+# through get_changes learn about the deletion, before DynamoDB TTL (expiresAt) removes them
+TOMBSTONE_TTL_SECONDS = 30 * 24 * 3600
+
+# Tokens handed out by get_changes trail the current time by this much, so that writes still
+# propagating to the sync index (or stamped by a slightly slower clock) are not skipped
+SYNC_LAG_SECONDS = 5
+
+# Upper bound on the number of changes returned by one get_changes call
+MAX_CHANGES = 1000
+
+# Format of updatedAt; fixed width, so timestamps sort as strings
+UPDATED_AT_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+# Upper bound on the number of detections returned by one find_detections call
+MAX_DETECTIONS = 1000
+
+
+def _encode_cursor(last_evaluated_key: Optional[dict]) -> Optional[str]:
+    """
+    Encode a DynamoDB LastEvaluatedKey as an opaque, URL-safe cursor.
+
+    :param last_evaluated_key: The LastEvaluatedKey returned by DynamoDB, or None.
+    :return: The cursor string, or None when there are no more pages.
+    """
+    if not last_evaluated_key:
+        return None
+    raw = json.dumps(last_evaluated_key, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def _decode_cursor(cursor: str) -> dict:
+    """
+    Decode a cursor produced by _encode_cursor back into an ExclusiveStartKey.
+
+    :param cursor: The opaque cursor string.
+    :return: The ExclusiveStartKey dictionary.
+    :raises ValueError: If the cursor is malformed.
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception as e:
+        raise ValueError("Invalid pagination cursor") from e
+    if not isinstance(key, dict) or not key:
+        raise ValueError("Invalid pagination cursor")
+    return key
+
+
+def _decode_marker_cursor(cursor: str, marker_id: str, sort_key: str) -> dict:
+    """
+    Decode a cursor over the items of one marker in a table keyed by markerId and sort_key.
+    The handlers skip their marker_exists check when a cursor is given, so a cursor issued
+    for another marker, or of any other shape, is rejected here.
+
+    :param cursor: The opaque cursor string.
+    :param marker_id: The marker whose items are being paged through.
+    :param sort_key: Name of the table's sort key.
+    :return: The ExclusiveStartKey dictionary.
+    :raises ValueError: If the cursor is malformed or was issued for another marker.
+    """
+    key = _decode_cursor(cursor)
+    if (set(key) != {'markerId', sort_key} or key['markerId'] != str(marker_id)
+            or not isinstance(key[sort_key], str)):
+        raise ValueError("Invalid pagination cursor")
+    return key
+
+
+# Projection that reads only the attributes needed for LocationMarker.to_summary_json,
+# plus the tombstone flag so that deleted markers can be left out and the version that
+# tags a page (see get_markers_page_tag)
+_SUMMARY_PROJECTION = {
+    'ProjectionExpression': ', '.join(f'#{name}' for name in LocationMarker.SUMMARY_ATTRIBUTES + ('deleted', 'version')),
+    'ExpressionAttributeNames': {f'#{name}': name for name in LocationMarker.SUMMARY_ATTRIBUTES + ('deleted', 'version')},
+}
+
+
+def _timestamp(moment: Optional[datetime] = None) -> str:
+    """
+    Format a moment (by default now) as an updatedAt value.
+    """
+    return (moment or datetime.now(timezone.utc)).strftime(UPDATED_AT_FORMAT)
+
+
+def sync_token(moment: datetime) -> str:
+    """
+    Build a get_changes token positioned at a moment, for clients that got the markers as of
+    that moment some other way (the markers snapshot) and sync from there.
+
+    :param moment: Changes stamped at or after this moment are returned.
+    :return: The token.
+    """
+    return _encode_cursor({'updatedAt': _timestamp(moment), 'markerId': ''})
+
+
+def _is_live(item: Optional[dict]) -> bool:
+    """
+    Check that an item is a marker rather than the tombstone of a deleted one.
+    """
+    return bool(item) and not item.get('deleted')
+
+
+def _in_bbox(item: dict, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> bool:
+    """
+    Check whether a marker item lies inside a bounding box, which may cross the antimeridian.
+    """
+    coordinate = item.get('coordinate') or {}
+    try:
+        latitude = float(coordinate.get('latitude'))
+        longitude = float(coordinate.get('longitude'))
+    except (TypeError, ValueError):
+        return False
+    if not min_lat <= latitude <= max_lat:
+        return False
+    if min_lon <= max_lon:
+        return min_lon <= longitude <= max_lon
+    return longitude >= min_lon or longitude <= max_lon
+
+
+class MarkerNotFoundError(Exception):
+    """Raised when a conditional write targets a marker that does not exist."""
+
+    def __init__(self, marker_id: str):
+        super().__init__(f"Marker with ID {marker_id} does not exist")
+        self.marker_id = marker_id
+
+
+class SyncTokenExpiredError(Exception):
+    """Raised when a sync token predates the tombstones still kept, so deletions may have been missed."""
+
+
+class VersionConflictError(Exception):
+    """Raised when a conditional write finds a different marker version than expected."""
+
+    def __init__(self, marker_id: str, expected_version: int, current_version: int):
+        super().__init__(f"Marker {marker_id} is at version {current_version}, expected {expected_version}")
+        self.marker_id = marker_id
+        self.expected_version = expected_version
+        self.current_version = current_version
+
+
+def _item_version(item: Optional[dict]) -> int:
+    """
+    Read the version attribute from an item in either resource or low-level (wire) format,
+    as returned with a ConditionalCheckFailedException.
+    """
+    version = (item or {}).get('version', 0)
+    if isinstance(version, dict):
+        version = version.get('N', 0)
+    return int(version)
+
+
+def _chunks(values: list, size: int) -> List[list]:
+    """
+    Split a list into consecutive chunks of at most `size` elements.
+    """
+    return [values[start:start + size] for start in range(0, len(values), size)]
+
+
+def _backoff(attempt: int):
+    """
+    Sleep before retrying unprocessed batch items, using full-jitter exponential backoff.
+    """
+    time.sleep(random.uniform(0, min(BATCH_BACKOFF_MAX_SECONDS, BATCH_BACKOFF_BASE_SECONDS * 2 ** attempt)))
+
+
+def _to_attribute_values(values: dict) -> dict:
+    """
+    Serialize a mapping of Python values into DynamoDB wire format for low-level client calls.
+    """
+    from boto3.dynamodb.types import TypeSerializer  # Deferred with the rest of boto3, see aws_clients
+
+    serializer = TypeSerializer()
+    return {key: serializer.serialize(value) for key, value in values.items()}
+
+
+# Sentinel placed on the result queue by a segment worker when it has finished
+_SEGMENT_DONE = object()
+
+
 class DataService:
     """A service class for interacting with the DynamoDB LocationMarkers table."""
 
-    def __init__(self, table_name: str, dynamodb_resource=None):
+    # Marker attributes that may be changed with update_marker_fields
+    UPDATABLE_FIELDS = ("name", "status", "subscribedEmails", "coordinate", "currentImage")
+
+    def __init__(self, table_name: str, dynamodb_resource=None, history_table_name: str = None,
+                 low_level: bool = False, cache: Optional[marker_cache.MarkerCache] = None,
+                 detection_index_table_name: str = None, detection_events_table_name: str = None):
         """
         Initialize the DataService with the specified DynamoDB table.
 
         :param table_name: The name of the DynamoDB table to interact with.
         :param dynamodb_resource: Optional DynamoDB resource for dependency injection.
+        :param history_table_name: Optional name of the table holding historical images as
+                                   separate items (PK markerId, SK dateTaken). Without it,
+                                   historical images stay inline in the marker item.
+        :param low_level: If True, scans and get_marker go through the low-level client
+                          (dynamodb.meta.client) and attribute_decoder instead of the Table
+                          resource and its TypeDeserializer. Writes are unaffected.
+        :param cache: Optional read-through cache for get_marker, usually the container-wide
+                      marker_cache.get_cache(table_name). Writes invalidate the container-wide
+                      cache of the table whether or not this instance reads through it.
+        :param detection_index_table_name: Optional name of the table mapping detected labels
+                                           to markers (see detection_index).
+        :param detection_events_table_name: Optional name of the table of changes between
+                                            consecutive detections (see detection_events).
+        """
+        self._low_level = low_level
+        self._cache = cache
+        self._dynamodb = dynamodb_resource
+        self._table_name = table_name
+        self._history_table_name = history_table_name
+        self._table = None
+        self._history_table = None
+        self._detection_index_table_name = detection_index_table_name
+        self._detection_index_table = None
+        self._detection_events_table_name = detection_events_table_name
+        self._detection_events_table = None
+
+    @property
+    def dynamodb(self):
+        """The DynamoDB resource, defaulting to the container-wide one from aws_clients."""
+        if self._dynamodb is None:
+            self._dynamodb = aws_clients.get_dynamodb_resource()
+        return self._dynamodb
+
+    @property
+    def table(self):
+        """The LocationMarkers Table, created on first use."""
+        if self._table is None:
+            self._table = self.dynamodb.Table(self._table_name)
+        return self._table
+
+    @property
+    def history_table(self):
+        """The history Table, or None when no history table is configured."""
+        if self._history_table is None and self._history_table_name:
+            self._history_table = self.dynamodb.Table(self._history_table_name)
+        return self._history_table
+
+    @property
+    def detection_index_table(self):
+        """The DetectionIndex Table, or None when no detection index table is configured."""
+        if self._detection_index_table is None and self._detection_index_table_name:
+            self._detection_index_table = self.dynamodb.Table(self._detection_index_table_name)
+        return self._detection_index_table
+
+    @property
+    def detection_events_table(self):
+        """The DetectionEvents Table, or None when no detection events table is configured."""
+        if self._detection_events_table is None and self._detection_events_table_name:
+            self._detection_events_table = self.dynamodb.Table(self._detection_events_table_name)
+        return self._detection_events_table
+
+    def _scan(self, **scan_kwargs) -> dict:
+        """
+        Scan the marker table. Items and LastEvaluatedKey are returned decoded, whether the
+        scan went through the Table resource or, in low-level mode, the client.
+        """
+        if not self._low_level:
+            return self.table.scan(**scan_kwargs)
+
+        if 'ExclusiveStartKey' in scan_kwargs:
+            scan_kwargs['ExclusiveStartKey'] = encode_key(scan_kwargs['ExclusiveStartKey'])
+        response = self.dynamodb.meta.client.scan(TableName=self._table_name, **scan_kwargs)
+        decoded = {'Items': [decode_item(item) for item in response.get('Items', [])]}
+        if response.get('LastEvaluatedKey'):
+            decoded['LastEvaluatedKey'] = decode_item(response['LastEvaluatedKey'])
+        return decoded
+
+    def _get_item(self, key: dict, **get_kwargs) -> Optional[dict]:
+        """
+        Get a marker item by key, through the low-level client in low-level mode.
+
+        :param get_kwargs: Further GetItem arguments, e.g. a ProjectionExpression.
+        :return: The decoded item, or None if it does not exist.
         """
-        self.dynamodb = dynamodb_resource or boto3.resource('dynamodb')
-        self.table = self.dynamodb.Table(table_name)
+        if not self._low_level:
+            return self.table.get_item(Key=key, **get_kwargs).get('Item')
 
-    def get_markers(self) -> List[LocationMarker]:
+        response = self.dynamodb.meta.client.get_item(TableName=self._table_name, Key=encode_key(key), **get_kwargs)
+        return decode_item(response['Item']) if response.get('Item') else None
+
+    def _get_cached_item(self, marker_id: str) -> Optional[dict]:
+        """
+        Get a marker item through the read-through cache. A cached entry outside the cache's
+        stale window is only served if a GetItem projecting just the key and version shows it
+        is still current; otherwise the full item is read and cached.
+
+        :return: The item, or None if the marker does not exist. Cached items are shared and must not be mutated.
+        """
+        key = {'markerId': marker_id}
+        cached = self._cache.lookup(marker_id)
+        if cached is not None:
+            item, _, needs_validation = cached
+            if not needs_validation:
+                return item
+            current = self._get_item(key, ProjectionExpression='#markerId, #version',
+                                     ExpressionAttributeNames={'#markerId': 'markerId', '#version': 'version'})
+            if self._cache.validated(marker_id, _item_version(current) if current else None):
+                return item
+            if current is None:
+                return None
+
+        item = self._get_item(key)
+        if _is_live(item):
+            self._cache.store(marker_id, item, _item_version(item))
+        return item
+
+    def _invalidate(self, *marker_ids: str):
+        """
+        Drop written markers from the container-wide cache of this table, if there is one.
+        """
+        cache = self._cache or marker_cache.existing_cache(self._table_name)
+        if cache is None:
+            return
+        for marker_id in marker_ids:
+            if marker_id:
+                cache.invalidate(str(marker_id))
+
+    def _to_item(self, marker: LocationMarker) -> Tuple[dict, List[dict]]:
+        """
+        Split a marker into its DynamoDB item and its historical image items.
+
+        :param marker: A LocationMarker instance.
+        :return: A tuple of (marker item, history items); history items are empty when
+                 no history table is configured and the images stay inline.
         """
-        Retrieve all markers from the DynamoDB table.
+        item = marker.to_json()
+        if not self.history_table:
+            return item, []
+        history = item.pop('historicalImages', [])
+        return item, [dict(image, markerId=item['markerId']) for image in history]
 
-        :return: A list of markers.
+    def _put_history_items(self, history_items: List[dict]):
+        """
+        Write historical image items to the history table in batches.
+
+        :param history_items: Items produced by _to_item.
+        """
+        if not history_items:
+            return
+        with self.history_table.batch_writer(overwrite_by_pkeys=['markerId', 'dateTaken']) as batch:
+            for history_item in history_items:
+                batch.put_item(Item=history_item)
+
+    def get_markers(self, total_segments: int = 1, workers: Optional[int] = None) -> Iterator[LocationMarker]:
+        """
+        Lazily retrieve all markers from the DynamoDB table, following
+        LastEvaluatedKey so that tables larger than one scan page are read completely.
+
+        :param total_segments: Number of scan segments; values above 1 use parallel_scan.
+        :param workers: Number of worker threads when scanning in parallel.
+        :return: A generator of markers.
         :raises Exception: Raises an exception if there is an issue retrieving markers.
         """
-        try: 
-            response = self.table.scan()
-            markers_data = response.get('Items', [])
-            markers = [LocationMarker.from_json(marker_data) for marker_data in markers_data]
-            return markers
+        if total_segments > 1:
+            yield from self.parallel_scan(total_segments=total_segments, workers=workers)
+            return
+
+        try:
+            scan_kwargs = {}
+            while True:
+                response = self._scan(**scan_kwargs)
+                for marker_data in response.get('Items', []):
+                    if _is_live(marker_data):
+                        yield LocationMarker.from_json(marker_data)
+
+                last_evaluated_key = response.get('LastEvaluatedKey')
+                if not last_evaluated_key:
+                    break
+                scan_kwargs['ExclusiveStartKey'] = last_evaluated_key
         except Exception as e:
             raise Exception("Failed to retrieve markers from DynamoDB") from e
 
+    def parallel_scan(self, total_segments: int = 4, workers: Optional[int] = None) -> Iterator[LocationMarker]:
+        """
+        Scan the whole table as `total_segments` DynamoDB Segment/TotalSegments scans
+        running on a thread pool, yielding markers as soon as each page arrives.
+        Markers are yielded in no particular order.
+
+        :param total_segments: Number of segments to split the table into.
+        :param workers: Number of worker threads (defaults to total_segments).
+        :return: A generator of markers.
+        :raises ValueError: If total_segments or workers is less than 1.
+        :raises Exception: Raises an exception if there is an issue retrieving markers.
+        """
+        workers = workers or total_segments
+        if total_segments < 1 or workers < 1:
+            raise ValueError("total_segments and workers must be at least 1")
+
+        # Bounded so that a slow consumer applies back-pressure to the scanners
+        pages = queue.Queue(maxsize=workers * 2)
+        stop = threading.Event()
+
+        def put(value):
+            while not stop.is_set():
+                try:
+                    pages.put(value, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def scan_segment(segment: int):
+            try:
+                scan_kwargs = {'Segment': segment, 'TotalSegments': total_segments}
+                while not stop.is_set():
+                    response = self._scan(**scan_kwargs)
+                    put([item for item in response.get('Items', []) if _is_live(item)])
+
+                    last_evaluated_key = response.get('LastEvaluatedKey')
+                    if not last_evaluated_key:
+                        break
+                    scan_kwargs['ExclusiveStartKey'] = last_evaluated_key
+            except Exception as e:
+                put(e)
+            finally:
+                put(_SEGMENT_DONE)
+
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            for segment in range(total_segments):
+                executor.submit(scan_segment, segment)
+
+            finished = 0
+            while finished < total_segments:
+                page = pages.get()
+                if page is _SEGMENT_DONE:
+                    finished += 1
+                elif isinstance(page, Exception):
+                    raise Exception("Failed to retrieve markers from DynamoDB") from page
+                else:
+                    for marker_data in page:
+                        yield LocationMarker.from_json(marker_data)
+        finally:
+            # Release any scanner blocked on a full queue if the consumer stopped early
+            stop.set()
+            executor.shutdown(wait=False)
+
+    def get_markers_page(self, limit: int, next_token: Optional[str] = None, summary: bool = False,
+                         raw: bool = False) -> Tuple[List[Union[LocationMarker, dict]], Optional[str]]:
+        """
+        Retrieve a single bounded page of markers from the DynamoDB table.
+
+        :param limit: Maximum number of items to read; tombstones of deleted markers count
+                      towards it but are left out, so a page may hold fewer markers.
+        :param next_token: Opaque cursor returned by a previous call, or None for the first page.
+        :param summary: If True, only LocationMarker.SUMMARY_ATTRIBUTES are read from the table.
+        :param raw: If True, return the markers as LocationMarker.normalize_json dictionaries
+                    (summaries when summary is True) instead of LocationMarker instances.
+        :return: A tuple of (markers, next_token); next_token is None on the last page.
+        :raises ValueError: If next_token is not a valid cursor.
+        :raises Exception: Raises an exception if there is an issue retrieving markers.
+        """
+        items, next_token = self._scan_page(limit, next_token, summary)
+        if raw:
+            return [LocationMarker.normalize_json(marker_data, summary=summary) for marker_data in items], next_token
+        return [LocationMarker.from_json(marker_data) for marker_data in items], next_token
+
+    def get_markers_page_tag(self, limit: int, next_token: Optional[str] = None,
+                             summary: bool = False) -> Tuple[List[dict], Optional[str], str]:
+        """
+        Retrieve a page like get_markers_page with raw=True, along with a tag of its content
+        taken from the markerId and version of each marker and the next cursor. Every write
+        increments the version, so the tag changes whenever the page does, and it is known
+        before the page is serialized.
+
+        :return: A tuple of (markers, next_token, tag).
+        :raises ValueError: If next_token is not a valid cursor.
+        :raises Exception: Raises an exception if there is an issue retrieving markers.
+        """
+        items, next_token = self._scan_page(limit, next_token, summary)
+        digest = hashlib.sha256()
+        for item in items:
+            digest.update(f"{item.get('markerId')}:{_item_version(item)}\n".encode('utf-8'))
+        digest.update((next_token or '').encode('ascii'))
+        markers = [LocationMarker.normalize_json(marker_data, summary=summary) for marker_data in items]
+        return markers, next_token, digest.hexdigest()[:32]
+
+    def _scan_page(self, limit: int, next_token: Optional[str], summary: bool) -> Tuple[List[dict], Optional[str]]:
+        """
+        Scan one page of the table and return its live items with the cursor of the next page.
+        """
+        scan_kwargs = {'Limit': limit}
+        if summary:
+            scan_kwargs.update(_SUMMARY_PROJECTION)
+        if next_token:
+            start_key = _decode_cursor(next_token)
+            # A tampered cursor must fail here, as a ValueError, rather than later in the scan
+            if set(start_key) != {'markerId'} or not isinstance(start_key['markerId'], str):
+                raise ValueError("Invalid pagination cursor")
+            scan_kwargs['ExclusiveStartKey'] = start_key
+
+        try:
+            response = self._scan(**scan_kwargs)
+            items = [item for item in response.get('Items', []) if _is_live(item)]
+            return items, _encode_cursor(response.get('LastEvaluatedKey'))
+        except Exception as e:
+            raise Exception("Failed to retrieve markers from DynamoDB") from e
+
+    def query_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float,
+                   raw: bool = False) -> List[Union[LocationMarker, dict]]:
+        """
+        Retrieve the markers inside a bounding box through the geohash index.
+        The box is covered with the smallest set of geohash cells allowed by MAX_BBOX_CELLS
+        and the cells are queried concurrently, so no full table scan is needed.
+        A box with min_lon greater than max_lon crosses the antimeridian.
+        Only LocationMarker.SUMMARY_ATTRIBUTES are populated on the returned markers.
+
+        :param min_lat: Southern edge of the box.
+        :param min_lon: Western edge of the box.
+        :param max_lat: Northern edge of the box.
+        :param max_lon: Eastern edge of the box.
+        :param raw: If True, return marker summaries (LocationMarker.normalize_json) instead of instances.
+        :return: A list of markers inside the box.
+        :raises ValueError: If the box is invalid or needs more than MAX_BBOX_CELLS cells.
+        :raises Exception: Raises an exception if there is an issue retrieving markers.
+        """
+        if not (-90.0 <= min_lat <= max_lat <= 90.0 and -180.0 <= min_lon <= 180.0 and -180.0 <= max_lon <= 180.0):
+            raise ValueError("Invalid bounding box")
+
+        cells = geohash.minimal_cover(min_lat, min_lon, max_lat, max_lon,
+                                      max_cells=MAX_BBOX_CELLS,
+                                      min_precision=LocationMarker.GEOHASH_PREFIX_LENGTH,
+                                      max_precision=LocationMarker.GEOHASH_PRECISION)
+        try:
+            with ThreadPoolExecutor(max_workers=min(len(cells), QUERY_WORKERS)) as executor:
+                cell_items = list(executor.map(self._query_geohash_cell, cells))
+            decode = (lambda item: LocationMarker.normalize_json(item, summary=True)) if raw else LocationMarker.from_json
+            return [decode(item)
+                    for items in cell_items for item in items
+                    if _in_bbox(item, min_lat, min_lon, max_lat, max_lon)]
+        except Exception as e:
+            raise Exception("Failed to query markers from DynamoDB") from e
+
+    def nearest(self, latitude: float, longitude: float, k: int = 10,
+                max_radius: float = 50000.0) -> List[Tuple[LocationMarker, float]]:
+        """
+        Find the k markers closest to a point, searching expanding rings of geohash
+        cells around it through the geohash index. The search starts with small cells,
+        so dense areas are answered from a few small queries, and coarsens the cells
+        after NEAREST_TARGET_RINGS rings until k markers are found. Candidates are kept
+        in a bounded heap of haversine distances and the search stops as soon as the
+        k-th distance is within the radius already searched, or max_radius has been
+        covered. Only LocationMarker.SUMMARY_ATTRIBUTES are populated on the returned markers.
+
+        :param latitude: Latitude of the point.
+        :param longitude: Longitude of the point.
+        :param k: Number of markers to return, at most MAX_NEAREST_K.
+        :param max_radius: Search radius in meters, at most MAX_NEAREST_RADIUS_METERS.
+        :return: A list of (marker, distance in meters) tuples, closest first.
+        :raises ValueError: If any argument is out of range.
+        :raises Exception: Raises an exception if there is an issue retrieving markers.
+        """
+        if not (-90.0 <= latitude <= 90.0 and -180.0 <= longitude <= 180.0):
+            raise ValueError("Coordinate out of range")
+        if not 1 <= k <= MAX_NEAREST_K:
+            raise ValueError(f"k must be between 1 and {MAX_NEAREST_K}")
+        if not 0 < max_radius <= MAX_NEAREST_RADIUS_METERS:
+            raise ValueError(f"max_radius must be between 0 and {MAX_NEAREST_RADIUS_METERS:.0f} meters")
+
+        # Coarsest precision searched: NEAREST_TARGET_RINGS rings of its cells reach max_radius
+        coarsest = LocationMarker.GEOHASH_PREFIX_LENGTH
+        for candidate in range(LocationMarker.GEOHASH_PRECISION, LocationMarker.GEOHASH_PREFIX_LENGTH, -1):
+            if min(geohash.cell_size_meters(candidate, latitude)) * NEAREST_TARGET_RINGS >= max_radius:
+                coarsest = candidate
+                break
+        precision = max(coarsest, min(NEAREST_START_PRECISION, LocationMarker.GEOHASH_PRECISION))
+
+        # Max-heap of the k best candidates, stored as (-distance, markerId, item)
+        best = []
+        # A coarser cell holds the finer cells already searched, so markers come back again
+        considered = set()
+        queried = 0
+        try:
+            with ThreadPoolExecutor(max_workers=QUERY_WORKERS) as executor:
+                done = False
+                while not done:
+                    centre = geohash.encode(latitude, longitude, precision)
+                    searched = set()
+                    radius = 0
+                    while True:
+                        cells = [cell for cell in geohash.ring(centre, radius) if cell not in searched]
+                        searched.update(cells)
+                        queried += len(cells)
+                        for items in executor.map(self._query_geohash_cell, cells):
+                            for item in items:
+                                if item['markerId'] in considered:
+                                    continue
+                                considered.add(item['markerId'])
+                                coordinate = item.get('coordinate') or {}
+                                try:
+                                    distance = geohash.haversine(latitude, longitude,
+                                                                 float(coordinate.get('latitude')),
+                                                                 float(coordinate.get('longitude')))
+                                except (TypeError, ValueError):
+                                    continue
+                                if distance > max_radius:
+                                    continue
+                                entry = (-distance, item['markerId'], item)
+                                if len(best) < k:
+                                    heapq.heappush(best, entry)
+                                elif entry > best[0]:
+                                    heapq.heapreplace(best, entry)
+
+                        covered = geohash.searched_radius(latitude, longitude, centre, radius)
+                        if (covered >= max_radius or (len(best) == k and -best[0][0] <= covered)
+                                or queried >= MAX_NEAREST_CELLS):
+                            done = True
+                            break
+                        if radius >= NEAREST_TARGET_RINGS and precision > coarsest:
+                            precision -= 1
+                            break
+                        radius += 1
+        except Exception as e:
+            raise Exception("Failed to query markers from DynamoDB") from e
+
+        return [(LocationMarker.from_json(item), -negative_distance)
+                for negative_distance, _, item in sorted(best, reverse=True)]
+
+    def _query_geohash_cell(self, cell: str) -> List[dict]:
+        """
+        Retrieve every index item whose geohash starts with the given cell.
+
+        :param cell: A geohash at least LocationMarker.GEOHASH_PREFIX_LENGTH characters long.
+        :return: A list of projected marker items.
+        """
+        query_kwargs = {
+            'IndexName': GEOHASH_INDEX_NAME,
+            'KeyConditionExpression': '#prefix = :prefix AND begins_with(#geohash, :cell)',
+            'ExpressionAttributeNames': {'#prefix': 'geohashPrefix', '#geohash': 'geohash'},
+            'ExpressionAttributeValues': {
+                ':prefix': cell[:LocationMarker.GEOHASH_PREFIX_LENGTH],
+                ':cell': cell,
+            },
+        }
+        items = []
+        while True:
+            response = self.table.query(**query_kwargs)
+            items.extend(response.get('Items', []))
+
+            last_evaluated_key = response.get('LastEvaluatedKey')
+            if not last_evaluated_key:
+                return items
+            query_kwargs['ExclusiveStartKey'] = last_evaluated_key
+
+    def get_changes(self, since: Optional[str] = None, limit: int = MAX_CHANGES) -> Tuple[List[dict], str, bool]:
+        """
+        Retrieve the markers written or deleted since a sync token, oldest first, through the
+        sync index. The SYNC_PARTITIONS partitions of the index are queried concurrently and
+        merged on (updatedAt, markerId), which also orders the token position.
+
+        Each change is a marker summary with its version and updatedAt, or for a deleted marker
+        {"markerId", "deleted": True, "updatedAt"}. Clients apply the changes in order and call
+        again with the returned token; the index is eventually consistent, so the token of a
+        complete response trails the current time by SYNC_LAG_SECONDS and a few changes may be
+        returned again.
+
+        :param since: Token returned by a previous call, or None to read every marker.
+        :param limit: Maximum number of changes to return.
+        :return: A tuple of (changes, token, complete); complete is False when more changes
+                 are waiting and the caller should call again right away.
+        :raises ValueError: If since is not a valid token or limit is out of range.
+        :raises SyncTokenExpiredError: If since is older than TOMBSTONE_TTL_SECONDS.
+        :raises Exception: Raises an exception if there is an issue retrieving changes.
+        """
+        if not 1 <= limit <= MAX_CHANGES:
+            raise ValueError(f"limit must be between 1 and {MAX_CHANGES}")
+        position = None
+        if since:
+            token = _decode_cursor(since)
+            if not isinstance(token.get('updatedAt'), str) or not isinstance(token.get('markerId'), str):
+                raise ValueError("Invalid sync token")
+            position = (token['updatedAt'], token['markerId'])
+
+        now = datetime.now(timezone.utc)
+        if position and position[0] < _timestamp(now - timedelta(seconds=TOMBSTONE_TTL_SECONDS)):
+            raise SyncTokenExpiredError("Sync token has expired; start again without one")
+
+        partitions = [str(partition) for partition in range(LocationMarker.SYNC_PARTITIONS)]
+        try:
+            with ThreadPoolExecutor(max_workers=min(len(partitions), QUERY_WORKERS)) as executor:
+                partition_items = list(executor.map(
+                    lambda partition: self._query_sync_partition(partition, position, limit + 1), partitions))
+        except Exception as e:
+            raise Exception("Failed to retrieve changes from DynamoDB") from e
+
+        items = sorted((item for items in partition_items for item in items),
+                       key=lambda item: (item['updatedAt'], item['markerId']))
+        complete = len(items) <= limit
+        items = items[:limit]
+        if complete:
+            position = max(position or ('', ''), (_timestamp(now - timedelta(seconds=SYNC_LAG_SECONDS)), ''))
+        else:
+            position = (items[-1]['updatedAt'], items[-1]['markerId'])
+
+        changes = []
+        for item in items:
+            if item.get('deleted'):
+                changes.append({'markerId': item['markerId'], 'deleted': True, 'updatedAt': item['updatedAt']})
+            else:
+                change = LocationMarker.normalize_json(item, summary=True)
+                change.update(version=int(item.get('version', 0)), updatedAt=item['updatedAt'])
+                changes.append(change)
+        return changes, _encode_cursor({'updatedAt': position[0], 'markerId': position[1]}), complete
+
+    def _query_sync_partition(self, partition: str, position: Optional[Tuple[str, str]], limit: int) -> List[dict]:
+        """
+        Retrieve the first `limit` items of one sync index partition after a token position.
+
+        :param partition: The syncPartition value.
+        :param position: (updatedAt, markerId) to start after, or None to start at the beginning.
+        :param limit: Maximum number of items to return.
+        :return: A list of projected items, oldest first.
+        """
+        query_kwargs = {
+            'IndexName': SYNC_INDEX_NAME,
+            'KeyConditionExpression': '#syncPartition = :partition',
+            'ExpressionAttributeNames': {'#syncPartition': 'syncPartition'},
+            'ExpressionAttributeValues': {':partition': partition},
+            'Limit': limit,
+        }
+        if position:
+            # Items sharing the token's updatedAt are filtered below by markerId
+            query_kwargs['KeyConditionExpression'] += ' AND #updatedAt >= :since'
+            query_kwargs['ExpressionAttributeNames']['#updatedAt'] = 'updatedAt'
+            query_kwargs['ExpressionAttributeValues'][':since'] = position[0]
+
+        items = []
+        while len(items) < limit:
+            response = self.table.query(**query_kwargs)
+            items.extend(item for item in response.get('Items', [])
+                         if not position or (item['updatedAt'], item['markerId']) > position)
+
+            last_evaluated_key = response.get('LastEvaluatedKey')
+            if not last_evaluated_key:
+                break
+            query_kwargs['ExclusiveStartKey'] = last_evaluated_key
+        return items[:limit]
+
+    def update_detection_index(self, puts: List[dict], deletes: List[dict]):
+        """
+        Write and delete DetectionIndex items, as computed by detection_index.index_changes.
+
+        :param puts: Index items to write.
+        :param deletes: Keys of the index items to delete.
+        :raises Exception: Raises an exception if there is an issue writing the index.
+        """
+        if not puts and not deletes:
+            return
+        try:
+            if not self.detection_index_table:
+                raise ValueError("No detection index table configured")
+            with self.detection_index_table.batch_writer(overwrite_by_pkeys=['labelShard', 'detectionKey']) as batch:
+                for key in deletes:
+                    batch.delete_item(Key=key)
+                for item in puts:
+                    batch.put_item(Item=item)
+        except Exception as e:
+            raise Exception("Failed to update detection index in DynamoDB") from e
+
+    def find_detections(self, label: str, since: Optional[str] = None, limit: int = 100,
+                        next_token: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        Retrieve one page of the detections of a label, newest first, from the detection
+        index; the marker table is never read. The detection_index.SHARDS partitions of the
+        label are queried concurrently and merged on detectionKey.
+
+        :param label: The detected label; matched after detection_index.normalize_label.
+        :param since: Optional inclusive lower bound on dateDetected (ISO 8601).
+        :param limit: Maximum number of detections to return.
+        :param next_token: Cursor returned with the previous page.
+        :return: A tuple of (detections, next_token), each detection being {"markerId",
+                 "dateDetected", "label", "count"}; next_token is None on the last page.
+        :raises ValueError: If label is empty, limit is out of range or next_token is invalid.
+        :raises Exception: Raises an exception if there is an issue querying the index.
+        """
+        label = detection_index.normalize_label(label or '')
+        if not label:
+            raise ValueError("label is required")
+        if not 1 <= limit <= MAX_DETECTIONS:
+            raise ValueError(f"limit must be between 1 and {MAX_DETECTIONS}")
+        before = None
+        if next_token:
+            cursor = _decode_cursor(next_token)
+            if cursor.get('label') != label or not isinstance(cursor.get('before'), str):
+                raise ValueError("Invalid pagination cursor")
+            before = cursor['before']
+
+        shards = [detection_index.label_shard(label, number) for number in range(detection_index.SHARDS)]
+        try:
+            with ThreadPoolExecutor(max_workers=min(len(shards), QUERY_WORKERS)) as executor:
+                shard_items = list(executor.map(
+                    lambda shard: self._query_detection_shard(shard, since, before, limit + 1), shards))
+        except Exception as e:
+            raise Exception("Failed to retrieve detections from DynamoDB") from e
+
+        items = heapq.nlargest(limit + 1, (item for items in shard_items for item in items),
+                               key=lambda item: item['detectionKey'])
+        token = None
+        if len(items) > limit:
+            items = items[:limit]
+            token = _encode_cursor({'label': label, 'before': items[-1]['detectionKey']})
+        detections = [{'markerId': item['markerId'], 'dateDetected': item['dateDetected'], 'label': item['label'],
+                       'count': int(item.get('count', 1))} for item in items]
+        return detections, token
+
+    def _query_detection_shard(self, shard: str, since: Optional[str], before: Optional[str],
+                               limit: int) -> List[dict]:
+        """
+        Retrieve the newest `limit` items of one shard of a label, between since and before.
+
+        :param shard: The labelShard value.
+        :param since: Inclusive lower bound on dateDetected, or None.
+        :param before: detectionKey to start after (exclusive upper bound), or None.
+        :param limit: Maximum number of items to return.
+        :return: A list of index items, newest first.
+        """
+        names = {'#labelShard': 'labelShard', '#detectionKey': 'detectionKey'}
+        values = {':shard': shard}
+        condition = '#labelShard = :shard'
+        if since and before:
+            condition += ' AND #detectionKey BETWEEN :since AND :before'
+            values.update({':since': since, ':before': before})
+        elif since:
+            condition += ' AND #detectionKey >= :since'
+            values[':since'] = since
+        elif before:
+            condition += ' AND #detectionKey < :before'
+            values[':before'] = before
+        query_kwargs = {
+            'KeyConditionExpression': condition,
+            'ExpressionAttributeNames': names,
+            'ExpressionAttributeValues': values,
+            'ScanIndexForward': False,
+            'Limit': limit,
+        }
+
+        items = []
+        while len(items) < limit:
+            response = self.detection_index_table.query(**query_kwargs)
+            # BETWEEN is inclusive; the item at the cursor was on the previous page
+            items.extend(item for item in response.get('Items', []) if item['detectionKey'] != before)
+
+            last_evaluated_key = response.get('LastEvaluatedKey')
+            if not last_evaluated_key:
+                break
+            query_kwargs['ExclusiveStartKey'] = last_evaluated_key
+        return items[:limit]
+
+    def store_detection_events(self, events: List[dict]):
+        """
+        Write DetectionEvents items, as computed by detection_events.new_events.
+
+        :param events: The event items to write.
+        :raises Exception: Raises an exception if there is an issue writing the events.
+        """
+        if not events:
+            return
+        try:
+            if not self.detection_events_table:
+                raise ValueError("No detection events table configured")
+            with self.detection_events_table.batch_writer(overwrite_by_pkeys=['markerId', 'dateDetected']) as batch:
+                for event in events:
+                    batch.put_item(Item=event)
+        except Exception as e:
+            raise Exception("Failed to store detection events in DynamoDB") from e
+
+    def delete_detection_events(self, marker_id: str):
+        """
+        Delete every detection event of a marker.
+
+        :param marker_id: Unique identifier for the marker.
+        :raises Exception: Raises an exception if there is an issue deleting the events.
+        """
+        query_kwargs = {
+            'KeyConditionExpression': '#markerId = :markerId',
+            'ExpressionAttributeNames': {'#markerId': 'markerId', '#dateDetected': 'dateDetected'},
+            'ExpressionAttributeValues': {':markerId': str(marker_id)},
+            'ProjectionExpression': '#markerId, #dateDetected',
+        }
+        try:
+            if not self.detection_events_table:
+                raise ValueError("No detection events table configured")
+            with self.detection_events_table.batch_writer() as batch:
+                while True:
+                    response = self.detection_events_table.query(**query_kwargs)
+                    for key in response.get('Items', []):
+                        batch.delete_item(Key=key)
+
+                    last_evaluated_key = response.get('LastEvaluatedKey')
+                    if not last_evaluated_key:
+                        break
+                    query_kwargs['ExclusiveStartKey'] = last_evaluated_key
+        except Exception as e:
+            raise Exception("Failed to delete detection events from DynamoDB") from e
+
+    def get_detection_events(self, marker_id: str, newest_first: bool = True, limit: int = 100,
+                             next_token: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        Retrieve one page of a marker's detection events, ordered by dateDetected.
+
+        :param marker_id: Unique identifier for the marker.
+        :param newest_first: If True (the default), return the most recent events first.
+        :param limit: Maximum number of events to return.
+        :param next_token: Opaque cursor returned by a previous call, or None for the first page.
+        :return: A tuple of (events, next_token), each event being {"markerId", "dateDetected",
+                 "previousDateDetected", "appeared", "disappeared"}; next_token is None on the last page.
+        :raises ValueError: If next_token is not a valid cursor of this marker's events.
+        :raises Exception: Raises an exception if there is an issue retrieving the events.
+        """
+        query_kwargs = {
+            'KeyConditionExpression': '#markerId = :markerId',
+            'ExpressionAttributeNames': {'#markerId': 'markerId'},
+            'ExpressionAttributeValues': {':markerId': str(marker_id)},
+            'ScanIndexForward': not newest_first,
+            'Limit': limit,
+        }
+        if next_token:
+            query_kwargs['ExclusiveStartKey'] = _decode_marker_cursor(next_token, marker_id, 'dateDetected')
+
+        try:
+            if not self.detection_events_table:
+                raise ValueError("No detection events table configured")
+            response = self.detection_events_table.query(**query_kwargs)
+            events = [detection_events.normalize_event(item) for item in response.get('Items', [])]
+            return events, _encode_cursor(response.get('LastEvaluatedKey'))
+        except Exception as e:
+            raise Exception("Failed to retrieve detection events from DynamoDB") from e
+
     def add_marker(self, marker: LocationMarker) -> str:
         """
         Adds a new marker to the DynamoDB table.
@@ -41,77 +995,757 @@ class DataService:
         try:
             unique_id = str(uuid.uuid4()) #generate id
             marker.set_marker_id(unique_id)
+            marker.set_version(1)
+            marker.set_updated_at(_timestamp())
            
-            self.table.put_item(Item=marker.to_json())
+            item, history_items = self._to_item(marker)
+            self.table.put_item(Item=item)
+            self._put_history_items(history_items)
 
             return unique_id
         except Exception as e:
             raise Exception("Failed to add marker to DynamoDB") from e        
 
+    def batch_get(self, marker_ids: List[str]) -> List[LocationMarker]:
+        """
+        Retrieve many markers with BatchGetItem. Ids are split into chunks of
+        BATCH_GET_LIMIT that are fetched concurrently, and UnprocessedKeys are retried
+        with jittered backoff. Ids that do not exist are left out of the result.
+
+        :param marker_ids: Unique identifiers of the markers.
+        :return: A list of the markers found, in no particular order.
+        :raises Exception: Raises an exception if there is an issue retrieving markers.
+        """
+        try:
+            return [LocationMarker.from_json(item) for item in self._batch_get_items(marker_ids)]
+        except Exception as e:
+            raise Exception("Failed to batch retrieve markers from DynamoDB") from e
+
+    def _batch_get_items(self, marker_ids: List[str], **get_kwargs) -> List[dict]:
+        """
+        Fetch the live marker items of many ids with BatchGetItem, see batch_get.
+
+        :param marker_ids: Unique identifiers of the markers.
+        :param get_kwargs: Extra parameters of each table's request, e.g. ProjectionExpression.
+        :return: The items found, in no particular order.
+        """
+        keys = [{'markerId': marker_id} for marker_id in dict.fromkeys(str(marker_id) for marker_id in marker_ids)]
+        if not keys:
+            return []
+
+        def get_chunk(chunk: List[dict]) -> List[dict]:
+            items = []
+            request = {self.table.name: dict(get_kwargs, Keys=chunk)}
+            for attempt in range(BATCH_MAX_ATTEMPTS):
+                response = self.dynamodb.batch_get_item(RequestItems=request)
+                items.extend(response.get('Responses', {}).get(self.table.name, []))
+                request = response.get('UnprocessedKeys')
+                if not request:
+                    return items
+                _backoff(attempt)
+            raise Exception(f"{len(request[self.table.name]['Keys'])} keys still unprocessed after retries")
+
+        chunks = _chunks(keys, BATCH_GET_LIMIT)
+        with ThreadPoolExecutor(max_workers=min(len(chunks), QUERY_WORKERS)) as executor:
+            return [item for items in executor.map(get_chunk, chunks) for item in items if _is_live(item)]
+
+    def batch_put(self, markers: List[LocationMarker]) -> List[str]:
+        """
+        Add many new markers with BatchWriteItem. Each marker gets a generated ID, as in
+        add_marker, and its historical images are written to the history table in the
+        same batches.
+
+        :param markers: LocationMarker instances with location details.
+        :return: The generated marker IDs, in the order of `markers`.
+        :raises Exception: Raises an exception if there is an issue adding markers.
+        """
+        marker_ids = []
+        requests = []
+        for marker in markers:
+            marker.set_marker_id(str(uuid.uuid4()))
+            marker.set_version(1)
+            marker.set_updated_at(_timestamp())
+            marker_ids.append(marker.get_marker_id())
+
+            item, history_items = self._to_item(marker)
+            requests.append((self.table.name, {'PutRequest': {'Item': item}}))
+            requests.extend((self.history_table.name, {'PutRequest': {'Item': history_item}})
+                            for history_item in history_items)
+
+        try:
+            self._batch_write(requests)
+            return marker_ids
+        except Exception as e:
+            raise Exception("Failed to batch add markers to DynamoDB") from e
+
+    def batch_delete(self, marker_ids: List[str]) -> List[str]:
+        """
+        Delete many markers with BatchWriteItem, along with their historical images.
+        Each marker is replaced by its tombstone (see delete_marker). BatchWriteItem has no
+        conditions, so the ids are first looked up with BatchGetItem and only the markers
+        that exist get a tombstone.
+
+        :param marker_ids: Unique identifiers of the markers.
+        :return: The ids that were not found, in the order given.
+        :raises Exception: Raises an exception if there is an issue deleting markers.
+        """
+        marker_ids = list(dict.fromkeys(str(marker_id) for marker_id in marker_ids))
+        try:
+            found = {item['markerId'] for item in self._batch_get_items(
+                marker_ids, ProjectionExpression='#markerId, #deleted',
+                ExpressionAttributeNames={'#markerId': 'markerId', '#deleted': 'deleted'})}
+            existing = [marker_id for marker_id in marker_ids if marker_id in found]
+            self._batch_write([(self.table.name, {'PutRequest': {'Item': self._tombstone(marker_id)}})
+                               for marker_id in existing])
+            if self.history_table and existing:
+                with ThreadPoolExecutor(max_workers=min(len(existing), QUERY_WORKERS)) as executor:
+                    list(executor.map(self._delete_history, existing))
+        except Exception as e:
+            raise Exception("Failed to batch delete markers from DynamoDB") from e
+        finally:
+            self._invalidate(*marker_ids)
+        return [marker_id for marker_id in marker_ids if marker_id not in found]
+
+    def _batch_write(self, requests: List[Tuple[str, dict]]):
+        """
+        Send write requests with BatchWriteItem in concurrent chunks of BATCH_WRITE_LIMIT,
+        retrying UnprocessedItems with jittered backoff.
+
+        :param requests: List of (table name, PutRequest/DeleteRequest) tuples.
+        """
+        def write_chunk(chunk: List[Tuple[str, dict]]):
+            request = {}
+            for table_name, write_request in chunk:
+                request.setdefault(table_name, []).append(write_request)
+            for attempt in range(BATCH_MAX_ATTEMPTS):
+                request = self.dynamodb.batch_write_item(RequestItems=request).get('UnprocessedItems')
+                if not request:
+                    return
+                _backoff(attempt)
+            raise Exception(f"{sum(len(items) for items in request.values())} items still unprocessed after retries")
+
+        chunks = _chunks(requests, BATCH_WRITE_LIMIT)
+        if not chunks:
+            return
+        with ThreadPoolExecutor(max_workers=min(len(chunks), QUERY_WORKERS)) as executor:
+            list(executor.map(write_chunk, chunks))
+
+    @staticmethod
+    def _tombstone(marker_id: str) -> dict:
+        """
+        Build the item that replaces a deleted marker: it keeps the marker in the sync index
+        until DynamoDB TTL removes it, TOMBSTONE_TTL_SECONDS later.
+        """
+        now = datetime.now(timezone.utc)
+        return {
+            'markerId': marker_id,
+            'deleted': True,
+            'updatedAt': _timestamp(now),
+            'syncPartition': LocationMarker.sync_partition(marker_id),
+            'expiresAt': int(now.timestamp()) + TOMBSTONE_TTL_SECONDS,
+        }
+
     def delete_marker(self, markerId):
         """
-        Delete a marker from the DynamoDB table.
+        Delete a marker from the DynamoDB table. The marker item is overwritten with a
+        tombstone (see _tombstone) rather than removed, so get_changes can report the deletion.
 
         :param markerId: Unique identifier for the location to delete.
-        :return: The response from DynamoDB.
+        :return: The response from DynamoDB, or None if the marker does not exist.
         """
         try:
-            response = self.table.delete_item(
-                Key={
-                    'markerId': str(markerId)  #dynamoDB schema requires string here
-                }
+            response = self.table.put_item(
+                Item=self._tombstone(str(markerId)),  #dynamoDB schema requires string here
+                ConditionExpression='attribute_exists(#markerId) AND attribute_not_exists(#deleted)',
+                ExpressionAttributeNames={'#markerId': 'markerId', '#deleted': 'deleted'},
             )
+            self._delete_history(str(markerId))
             return response
         except Exception as e:
             return None
+        finally:
+            self._invalidate(markerId)
+
+    def _delete_history(self, marker_id: str):
+        """
+        Delete every historical image item of a marker from the history table.
+
+        :param marker_id: Unique identifier for the marker.
+        """
+        if not self.history_table:
+            return
+        query_kwargs = {
+            'KeyConditionExpression': '#markerId = :markerId',
+            'ExpressionAttributeNames': {'#markerId': 'markerId', '#dateTaken': 'dateTaken'},
+            'ExpressionAttributeValues': {':markerId': marker_id},
+            'ProjectionExpression': '#markerId, #dateTaken',
+        }
+        with self.history_table.batch_writer() as batch:
+            while True:
+                response = self.history_table.query(**query_kwargs)
+                for key in response.get('Items', []):
+                    batch.delete_item(Key=key)
+
+                last_evaluated_key = response.get('LastEvaluatedKey')
+                if not last_evaluated_key:
+                    break
+                query_kwargs['ExclusiveStartKey'] = last_evaluated_key
+
+    def add_history_image(self, marker_id: str, image: Image):
+        """
+        Store a historical image of a marker as its own item in the history table.
+
+        :param marker_id: Unique identifier for the marker.
+        :param image: The Image to store; its dateTaken is the sort key.
+        :raises Exception: Raises an exception if there is an issue storing the image.
+        """
+        try:
+            if not self.history_table:
+                raise ValueError("No history table configured")
+            self.history_table.put_item(Item=dict(image.to_json(), markerId=str(marker_id)))
+        except Exception as e:
+            raise Exception("Failed to add historical image to DynamoDB") from e
+
+    def append_image(self, marker_id: str, image: Image, recent_hashes: Optional[List[str]] = None,
+                     expected_version: Optional[int] = None):
+        """
+        Record a newly captured image for a marker and make it the marker's current image.
+        With a history table, the history item and the currentImage update are written
+        in one transaction; otherwise the image is appended to the inline history with
+        list_append. Either way the marker item is never read or rewritten as a whole.
+
+        :param marker_id: Unique identifier for the marker.
+        :param image: The captured Image; its dateTaken must be set.
+        :param recent_hashes: If given, the new recentHashes of the marker (see capture_dedup);
+                              its unchanged capture count is then reset.
+        :param expected_version: Version the caller last read, or None to append unconditionally.
+        :raises ValueError: If the image has no dateTaken.
+        :raises MarkerNotFoundError: If the marker does not exist.
+        :raises VersionConflictError: If the stored marker is at a different version.
+        :raises Exception: Raises an exception if there is an issue storing the image.
+        """
+        if not image.get_date_taken():
+            raise ValueError("Image must have a dateTaken")
+        image_json = image.to_json()
+        marker_key = {'markerId': str(marker_id)}
+        names = {'#markerId': 'markerId', '#currentImage': 'currentImage', '#version': 'version'}
+        values = {':image': image_json, ':zero': 0, ':one': 1}
+        set_clauses = ['#currentImage = :image', '#version = if_not_exists(#version, :zero) + :one']
+        if recent_hashes is not None:
+            names.update({'#recentHashes': 'recentHashes', '#unchangedCaptures': 'unchangedCaptures',
+                          '#lastCaptureDate': 'lastCaptureDate'})
+            values.update({':recentHashes': list(recent_hashes), ':dateTaken': image.get_date_taken()})
+            set_clauses += ['#recentHashes = :recentHashes', '#unchangedCaptures = :zero',
+                            '#lastCaptureDate = :dateTaken']
+        self._stamp_update(str(marker_id), names, values, set_clauses)
+        condition = 'attribute_exists(#markerId) AND attribute_not_exists(#deleted)'
+        if expected_version is not None:
+            values[':expected'] = expected_version
+            if expected_version == 0:
+                condition += ' AND (attribute_not_exists(#version) OR #version = :expected)'
+            else:
+                condition += ' AND #version = :expected'
+
+        try:
+            if self.history_table:
+                self.dynamodb.meta.client.transact_write_items(TransactItems=[
+                    {'Put': {
+                        'TableName': self.history_table.name,
+                        'Item': _to_attribute_values(dict(image_json, markerId=str(marker_id))),
+                    }},
+                    {'Update': {
+                        'TableName': self.table.name,
+                        'Key': _to_attribute_values(marker_key),
+                        'UpdateExpression': 'SET ' + ', '.join(set_clauses),
+                        'ConditionExpression': condition,
+                        'ExpressionAttributeNames': names,
+                        'ExpressionAttributeValues': _to_attribute_values(values),
+                        'ReturnValuesOnConditionCheckFailure': 'ALL_OLD',
+                    }},
+                ])
+            else:
+                names['#historicalImages'] = 'historicalImages'
+                values.update({':images': [image_json], ':empty': []})
+                set_clauses.append('#historicalImages = list_append(if_not_exists(#historicalImages, :empty), :images)')
+                self.table.update_item(
+                    Key=marker_key,
+                    UpdateExpression='SET ' + ', '.join(set_clauses),
+                    ConditionExpression=condition,
+                    ExpressionAttributeNames=names,
+                    ExpressionAttributeValues=values,
+                    ReturnValuesOnConditionCheckFailure='ALL_OLD',
+                )
+        except Exception as e:
+            if expected_version is not None:
+                self._raise_condition_failure(e, marker_id, expected_version)
+            self._raise_append_failure(e, marker_id)
+            raise Exception("Failed to append image in DynamoDB") from e
+        finally:
+            self._invalidate(marker_id)
+
+    def get_recent_hashes(self, marker_id: str) -> Tuple[List[str], int]:
+        """
+        Read only the perceptual hashes of a marker's latest stored images, and its version.
+
+        :param marker_id: Unique identifier for the marker.
+        :return: A tuple of (the hashes, newest first; the marker version), the version being
+                 what append_image(expected_version=...) checks before replacing the hashes.
+        :raises MarkerNotFoundError: If the marker does not exist.
+        :raises Exception: Raises an exception if there is an issue reading the marker.
+        """
+        try:
+            item = self._get_item({'markerId': str(marker_id)}, ConsistentRead=True,
+                                  ProjectionExpression='#markerId, #recentHashes, #version, #deleted',
+                                  ExpressionAttributeNames={'#markerId': 'markerId', '#recentHashes': 'recentHashes',
+                                                            '#version': 'version', '#deleted': 'deleted'})
+        except Exception as e:
+            raise Exception("Failed to retrieve recent hashes from DynamoDB") from e
+        if not _is_live(item):
+            raise MarkerNotFoundError(marker_id)
+        return list(item.get('recentHashes') or []), _item_version(item)
+
+    def collapse_capture(self, marker_id: str, date_taken: str) -> int:
+        """
+        Count a capture that looked like one of the marker's recent images instead of storing it.
+        unchangedCaptures and lastCaptureDate are part of the marker body, so the version is
+        incremented with them and the marker's strong ETag changes with its body. The sync
+        index keys are left alone: the counters are not in the summaries get_changes reports,
+        so a skipped capture is not a change there, and the stream functions find nothing to do.
+
+        :param marker_id: Unique identifier for the marker.
+        :param date_taken: dateTaken of the skipped capture, stored as lastCaptureDate.
+        :return: The number of captures skipped since the current image.
+        :raises MarkerNotFoundError: If the marker does not exist.
+        :raises Exception: Raises an exception if there is an issue updating the marker.
+        """
+        try:
+            response = self.table.update_item(
+                Key={'markerId': str(marker_id)},
+                UpdateExpression='SET #unchangedCaptures = if_not_exists(#unchangedCaptures, :zero) + :one, '
+                                 '#lastCaptureDate = :dateTaken, #version = if_not_exists(#version, :zero) + :one',
+                ConditionExpression='attribute_exists(#markerId) AND attribute_not_exists(#deleted)',
+                ExpressionAttributeNames={'#markerId': 'markerId', '#deleted': 'deleted', '#version': 'version',
+                                          '#unchangedCaptures': 'unchangedCaptures',
+                                          '#lastCaptureDate': 'lastCaptureDate'},
+                ExpressionAttributeValues={':dateTaken': date_taken, ':zero': 0, ':one': 1},
+                ReturnValues='UPDATED_NEW',
+            )
+            return int(response['Attributes']['unchangedCaptures'])
+        except Exception as e:
+            self._raise_append_failure(e, marker_id)
+            raise Exception("Failed to record unchanged capture in DynamoDB") from e
+        finally:
+            self._invalidate(marker_id)
+
+    def append_detection(self, marker_id: str, detection: DetectedObjects):
+        """
+        Append a DetectedObjects entry to a marker with a single list_append UpdateItem,
+        so the write size does not depend on how many detections the marker already has.
+
+        :param marker_id: Unique identifier for the marker.
+        :param detection: The DetectedObjects entry to append.
+        :raises MarkerNotFoundError: If the marker does not exist.
+        :raises Exception: Raises an exception if there is an issue storing the detection.
+        """
+        names = {'#markerId': 'markerId', '#detectedObjects': 'detectedObjects', '#version': 'version'}
+        values = {':detections': [detection.to_json()], ':empty': [], ':zero': 0, ':one': 1}
+        set_clauses = ['#detectedObjects = list_append(if_not_exists(#detectedObjects, :empty), :detections)',
+                       '#version = if_not_exists(#version, :zero) + :one']
+        self._stamp_update(str(marker_id), names, values, set_clauses)
+        try:
+            self.table.update_item(
+                Key={'markerId': str(marker_id)},
+                UpdateExpression='SET ' + ', '.join(set_clauses),
+                ConditionExpression='attribute_exists(#markerId) AND attribute_not_exists(#deleted)',
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+            )
+        except Exception as e:
+            self._raise_append_failure(e, marker_id)
+            raise Exception("Failed to append detection in DynamoDB") from e
+        finally:
+            self._invalidate(marker_id)
+
+    def set_last_change(self, marker_id: str, change: ChangeRecord) -> int:
+        """
+        Store the result of comparing a marker's current image with the previous one.
+        Like any other write, it increments the marker version.
+
+        :param marker_id: Unique identifier for the marker.
+        :param change: The ChangeRecord to store as the marker's lastChange.
+        :return: The new version of the marker.
+        :raises MarkerNotFoundError: If the marker does not exist.
+        :raises Exception: Raises an exception if there is an issue storing the change.
+        """
+        names = {'#markerId': 'markerId', '#lastChange': 'lastChange', '#version': 'version'}
+        values = {':change': change.to_json(), ':zero': 0, ':one': 1}
+        set_clauses = ['#lastChange = :change', '#version = if_not_exists(#version, :zero) + :one']
+        self._stamp_update(str(marker_id), names, values, set_clauses)
+        try:
+            response = self.table.update_item(
+                Key={'markerId': str(marker_id)},
+                UpdateExpression='SET ' + ', '.join(set_clauses),
+                ConditionExpression='attribute_exists(#markerId) AND attribute_not_exists(#deleted)',
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+                ReturnValues='UPDATED_NEW',
+            )
+            return _item_version(response.get('Attributes'))
+        except Exception as e:
+            self._raise_append_failure(e, marker_id)
+            raise Exception("Failed to store change record in DynamoDB") from e
+        finally:
+            self._invalidate(marker_id)
+
+    def set_image_pyramid(self, marker_id: str, image: Image, history_index: Optional[int] = None) -> bool:
+        """
+        Store the tile pyramid fields of a marker's current image, on the marker and on the
+        image's history entry: the history table item if there is one, otherwise the inline
+        historicalImages entry at history_index. Like any other write to the marker, it
+        increments the marker version.
+
+        :param marker_id: Unique identifier for the marker.
+        :param image: The current Image, with its pyramid set.
+        :param history_index: Position of the image in the inline historicalImages list, if known.
+        :return: False if the marker's current image was replaced in the meantime, in which case
+                 only the history table item (if any) is updated.
+        :raises MarkerNotFoundError: If the marker does not exist.
+        :raises Exception: Raises an exception if there is an issue storing the pyramid.
+        """
+        image_json = image.to_json()
+        names = {'#markerId': 'markerId', '#currentImage': 'currentImage', '#dateTaken': 'dateTaken',
+                 '#version': 'version'}
+        values = {':image': image_json, ':dateTaken': image.get_date_taken(), ':zero': 0, ':one': 1}
+        set_clauses = ['#currentImage = :image', '#version = if_not_exists(#version, :zero) + :one']
+        conditions = ['attribute_exists(#markerId)', 'attribute_not_exists(#deleted)',
+                      '#currentImage.#dateTaken = :dateTaken']
+        self._stamp_update(str(marker_id), names, values, set_clauses)
+
+        try:
+            if self.history_table:
+                pyramid = {name: image_json[name] for name in Image.PYRAMID_FIELDS}
+                self.history_table.update_item(
+                    Key={'markerId': str(marker_id), 'dateTaken': image.get_date_taken()},
+                    UpdateExpression='SET ' + ', '.join(f'#{name} = :{name}' for name in pyramid),
+                    ConditionExpression='attribute_exists(#dateTaken)',
+                    ExpressionAttributeNames=dict({f'#{name}': name for name in pyramid}, **{'#dateTaken': 'dateTaken'}),
+                    ExpressionAttributeValues={f':{name}': value for name, value in pyramid.items()},
+                )
+            elif history_index is not None:
+                names['#historicalImages'] = 'historicalImages'
+                set_clauses.append(f'#historicalImages[{int(history_index)}] = :image')
+                conditions.append(f'#historicalImages[{int(history_index)}].#dateTaken = :dateTaken')
+        except Exception as e:
+            if aws_clients.error_code(e) != 'ConditionalCheckFailedException':  # Image not in the history table
+                raise Exception("Failed to store image pyramid in DynamoDB") from e
+
+        try:
+            self.table.update_item(
+                Key={'markerId': str(marker_id)},
+                UpdateExpression='SET ' + ', '.join(set_clauses),
+                ConditionExpression=' AND '.join(conditions),
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+                ReturnValuesOnConditionCheckFailure='ALL_OLD',
+            )
+            return True
+        except Exception as e:
+            if aws_clients.error_code(e) == 'ConditionalCheckFailedException':
+                current = e.response.get('Item')
+                if not current or current.get('deleted'):
+                    raise MarkerNotFoundError(marker_id) from e
+                return False
+            raise Exception("Failed to store image pyramid in DynamoDB") from e
+        finally:
+            self._invalidate(marker_id)
+
+    @staticmethod
+    def _stamp_update(marker_id: str, names: dict, values: dict, set_clauses: List[str]):
+        """
+        Extend an UpdateItem on a marker so that it refreshes the sync index keys, and
+        declare the #deleted name its condition uses to skip tombstones.
+        """
+        names.update({'#updatedAt': 'updatedAt', '#syncPartition': 'syncPartition', '#deleted': 'deleted'})
+        values.update({':updatedAt': _timestamp(), ':syncPartition': LocationMarker.sync_partition(marker_id)})
+        set_clauses += ['#updatedAt = :updatedAt', '#syncPartition = :syncPartition']
+
+    @staticmethod
+    def _raise_append_failure(error: Exception, marker_id: str):
+        """
+        Translate a failed attribute_exists condition on an append (plain or transactional)
+        into MarkerNotFoundError; other errors are left to the caller.
+        """
+        code = aws_clients.error_code(error)
+        if code is None:
+            return
+        reasons = [reason.get('Code') for reason in error.response.get('CancellationReasons', [])]
+        if code == 'ConditionalCheckFailedException' or 'ConditionalCheckFailed' in reasons:
+            raise MarkerNotFoundError(marker_id) from error
+
+    def get_historical_images(self, marker_id: str, date_from: Optional[str] = None, date_to: Optional[str] = None,
+                              newest_first: bool = False, limit: int = 100,
+                              next_token: Optional[str] = None) -> Tuple[List[Image], Optional[str]]:
+        """
+        Retrieve one page of a marker's historical images, ordered by dateTaken.
+
+        :param marker_id: Unique identifier for the marker.
+        :param date_from: Optional inclusive lower bound on dateTaken (ISO 8601).
+        :param date_to: Optional inclusive upper bound on dateTaken (ISO 8601).
+        :param newest_first: If True, return the most recent images first.
+        :param limit: Maximum number of images to return.
+        :param next_token: Opaque cursor returned by a previous call, or None for the first page.
+        :return: A tuple of (images, next_token); next_token is None on the last page.
+        :raises ValueError: If next_token is not a valid cursor of this marker's images.
+        :raises Exception: Raises an exception if there is an issue retrieving the images.
+        """
+        key_condition = '#markerId = :markerId'
+        names = {'#markerId': 'markerId'}
+        values = {':markerId': str(marker_id)}
+        if date_from or date_to:
+            names['#dateTaken'] = 'dateTaken'
+        if date_from and date_to:
+            key_condition += ' AND #dateTaken BETWEEN :dateFrom AND :dateTo'
+            values.update({':dateFrom': date_from, ':dateTo': date_to})
+        elif date_from:
+            key_condition += ' AND #dateTaken >= :dateFrom'
+            values[':dateFrom'] = date_from
+        elif date_to:
+            key_condition += ' AND #dateTaken <= :dateTo'
+            values[':dateTo'] = date_to
+
+        query_kwargs = {
+            'KeyConditionExpression': key_condition,
+            'ExpressionAttributeNames': names,
+            'ExpressionAttributeValues': values,
+            'ScanIndexForward': not newest_first,
+            'Limit': limit,
+        }
+        if next_token:
+            query_kwargs['ExclusiveStartKey'] = _decode_marker_cursor(next_token, marker_id, 'dateTaken')
+
+        try:
+            if not self.history_table:
+                raise ValueError("No history table configured")
+            response = self.history_table.query(**query_kwargs)
+            images = [Image.from_json(item) for item in response.get('Items', [])]
+            return images, _encode_cursor(response.get('LastEvaluatedKey'))
+        except Exception as e:
+            raise Exception("Failed to retrieve historical images from DynamoDB") from e
+
+    def marker_exists(self, marker_id: str) -> bool:
+        """
+        Check whether a marker exists, reading only its key and tombstone flag.
+
+        :param marker_id: Unique identifier for the marker.
+        :return: True if the marker exists.
+        :raises Exception: Raises an exception if there is an issue reading the marker.
+        """
+        try:
+            response = self.table.get_item(
+                Key={'markerId': str(marker_id)},
+                ProjectionExpression='#markerId, #deleted',
+                ExpressionAttributeNames={'#markerId': 'markerId', '#deleted': 'deleted'},
+            )
+            return _is_live(response.get('Item'))
+        except Exception as e:
+            raise Exception("Failed to retrieve marker from DynamoDB") from e
         
-    def update_marker(self, marker: LocationMarker):
+    def get_marker_version(self, marker_id: str) -> Optional[int]:
+        """
+        Read only the version of a marker, e.g. to answer a conditional GET without reading
+        the whole item. A fresh entry of the read-through cache is used when there is one.
+
+        :param marker_id: Unique identifier for the marker.
+        :return: The marker's version, or None if it does not exist.
+        :raises Exception: Raises an exception if there is an issue reading the marker.
+        """
+        marker_id = str(marker_id)
+        cached = self._cache.lookup(marker_id) if self._cache is not None else None
+        if cached is not None and not cached[2]:
+            return cached[1]
+
+        try:
+            item = self._get_item({'markerId': marker_id}, ProjectionExpression='#markerId, #version, #deleted',
+                                  ExpressionAttributeNames={'#markerId': 'markerId', '#version': 'version',
+                                                            '#deleted': 'deleted'})
+        except Exception as e:
+            raise Exception("Failed to retrieve marker from DynamoDB") from e
+        version = _item_version(item) if _is_live(item) else None
+        if cached is not None:
+            self._cache.validated(marker_id, version)
+        return version
+
+    def update_marker(self, marker: LocationMarker) -> int:
         """
-        Update an existing marker in DynamoDB
+        Replace an existing marker in DynamoDB with a single conditional put. The write
+        only succeeds while the stored marker is still at the version the marker was read
+        at (0 matches a marker stored before versioning), so the new version is always
+        one above the stored one.
+
         :param marker: A LocationMarker with updated information. Replaces marker with identical ID
-        :return: The updated LocationMarker.
+        :return: The new version of the marker.
+        :raises MarkerNotFoundError: If the marker does not exist.
+        :raises VersionConflictError: If the stored marker is at a different version.
         :raises Exception: Raises an exception if there is an issue updating the marker.
         """
+        marker_id = marker.get_marker_id()
+        expected_version = marker.get_version()
+        updated_at = marker.get_updated_at()
         try:
-            marker_id = marker.get_marker_id()
             if not marker_id:
                 raise ValueError("Marker must have an ID")
 
-            #get original marker data
-            original_marker_data = self.table.get_item(
-                Key={'markerId': str(marker_id)}
-            ).get('Item')
+            condition = 'attribute_exists(#markerId) AND attribute_not_exists(#deleted)'
+            if expected_version == 0:
+                condition += ' AND (attribute_not_exists(#version) OR #version = :expected)'
+            else:
+                condition += ' AND #version = :expected'
 
-            if not original_marker_data:
-                raise ValueError(f"Marker with ID {marker_id} does not exist")
+            marker.set_version(expected_version + 1)
+            marker.set_updated_at(_timestamp())
+            item, history_items = self._to_item(marker)
+            self.table.put_item(
+                Item=item,
+                ConditionExpression=condition,
+                ExpressionAttributeNames={'#markerId': 'markerId', '#deleted': 'deleted', '#version': 'version'},
+                ExpressionAttributeValues={':expected': expected_version},
+                ReturnValuesOnConditionCheckFailure='ALL_OLD',
+            )
+            self._put_history_items(history_items)
+            return marker.get_version()
+        except Exception as e:
+            marker.set_version(expected_version)
+            marker.set_updated_at(updated_at)
+            self._raise_condition_failure(e, marker_id, expected_version)
+            raise Exception("Failed to update marker in DynamoDB") from e
+        finally:
+            self._invalidate(marker_id)
 
-            #remove old entry
-            self.delete_marker(marker_id)
+    def update_marker_fields(self, marker_id: str, changes: dict, expected_version: Optional[int] = None) -> int:
+        """
+        Apply a partial update to a marker with a single UpdateItem call. The version
+        attribute is incremented atomically, and when expected_version is given the
+        update only succeeds while the stored marker is still at that version.
 
-            #replace with updated entry
-            self.table.put_item(Item=marker.to_json())
-        
+        :param marker_id: Unique identifier for the marker.
+        :param changes: Mapping of UPDATABLE_FIELDS names to their new JSON values.
+        :param expected_version: Version the caller last read, or None to update unconditionally.
+        :return: The new version of the marker.
+        :raises ValueError: If changes is empty or contains fields that cannot be updated.
+        :raises MarkerNotFoundError: If the marker does not exist.
+        :raises VersionConflictError: If the stored marker is at a different version.
+        :raises Exception: Raises an exception if there is an issue updating the marker.
+        """
+        if not changes:
+            raise ValueError("No changes given")
+        unknown = set(changes) - set(self.UPDATABLE_FIELDS)
+        if unknown:
+            raise ValueError(f"Fields cannot be updated: {', '.join(sorted(unknown))}")
+
+        changes = dict(changes)
+        if 'coordinate' in changes:
+            changes['coordinate'] = Coordinate.from_json(changes['coordinate'] or {}).to_json()
+        if changes.get('currentImage') is not None:
+            changes['currentImage'] = Image.from_json(changes['currentImage']).to_json()
+
+        names = {'#markerId': 'markerId', '#version': 'version'}
+        values = {':zero': 0, ':one': 1}
+        set_clauses = ['#version = if_not_exists(#version, :zero) + :one']
+        self._stamp_update(str(marker_id), names, values, set_clauses)
+        remove_clauses = []
+        for index, (field, value) in enumerate(changes.items()):
+            names[f'#f{index}'] = field
+            values[f':v{index}'] = value
+            set_clauses.append(f'#f{index} = :v{index}')
+
+        # Keep the geohash index keys in step with the coordinate
+        if 'coordinate' in changes:
+            names.update({'#geohash': 'geohash', '#geohashPrefix': 'geohashPrefix'})
+            location_hash = Coordinate.from_json(changes['coordinate']).get_geohash(LocationMarker.GEOHASH_PRECISION)
+            if location_hash:
+                values.update({':geohash': location_hash,
+                               ':geohashPrefix': location_hash[:LocationMarker.GEOHASH_PREFIX_LENGTH]})
+                set_clauses += ['#geohash = :geohash', '#geohashPrefix = :geohashPrefix']
+            else:
+                remove_clauses += ['#geohash', '#geohashPrefix']
+
+        condition = 'attribute_exists(#markerId) AND attribute_not_exists(#deleted)'
+        if expected_version is not None:
+            values[':expected'] = expected_version
+            if expected_version == 0:
+                condition += ' AND (attribute_not_exists(#version) OR #version = :expected)'
+            else:
+                condition += ' AND #version = :expected'
+
+        update_expression = 'SET ' + ', '.join(set_clauses)
+        if remove_clauses:
+            update_expression += ' REMOVE ' + ', '.join(remove_clauses)
+
+        try:
+            response = self.table.update_item(
+                Key={'markerId': str(marker_id)},
+                UpdateExpression=update_expression,
+                ConditionExpression=condition,
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+                ReturnValues='UPDATED_NEW',
+                ReturnValuesOnConditionCheckFailure='ALL_OLD',
+            )
+            return _item_version(response.get('Attributes'))
         except Exception as e:
+            self._raise_condition_failure(e, marker_id, expected_version)
             raise Exception("Failed to update marker in DynamoDB") from e
+        finally:
+            self._invalidate(marker_id)
+
+    @staticmethod
+    def _raise_condition_failure(error: Exception, marker_id: str, expected_version: Optional[int]):
+        """
+        Translate a ConditionalCheckFailedException on a marker write into
+        MarkerNotFoundError or VersionConflictError; other errors are left to the caller.
+        """
+        code = aws_clients.error_code(error)
+        if code == 'TransactionCanceledException':
+            # The Update of a transactional write carries the old item in its cancellation reason
+            failed = [reason for reason in error.response.get('CancellationReasons', [])
+                      if reason.get('Code') == 'ConditionalCheckFailed' and 'Item' in reason]
+            if not failed:
+                return
+            current = failed[0]['Item']
+        elif code == 'ConditionalCheckFailedException':
+            current = error.response.get('Item')
+        else:
+            return
+        if not current or current.get('deleted'):
+            raise MarkerNotFoundError(marker_id) from error
+        raise VersionConflictError(marker_id, expected_version, _item_version(current)) from error
         
-    def get_marker(self, marker_id: str) -> LocationMarker:
+    def get_marker(self, marker_id: str, raw: bool = False) -> Union[LocationMarker, dict]:
         """
         Retrieve a specific marker from DynamoDB by marker_id.
         
         :param marker_id: Unique identifier for the marker.
+        :param raw: If True, return the marker as a LocationMarker.normalize_json dictionary.
         :return: The corresponding LocationMarker instance, or raises an exception if not found.
         :raises Exception: Raises an exception if there is an issue retrieving the marker.
         """
         try:
-            #get the marker data from
-            marker_data = self.table.get_item(
-                Key={'markerId': str(marker_id)}
-            ).get('Item')
+            #get the marker data from the cache or the table
+            if self._cache is not None:
+                marker_data = self._get_cached_item(str(marker_id))
+            else:
+                marker_data = self._get_item({'markerId': str(marker_id)})
 
             #check if marker exists
-            if not marker_data:
+            if not _is_live(marker_data):
                 raise ValueError(f"Marker with ID {marker_id} does not exist")
 
+            # normalize_json copies what it returns; a marker built from a cached item must not share its lists
+            if raw:
+                return LocationMarker.normalize_json(marker_data)
+            if self._cache is not None:
+                marker_data = copy.deepcopy(marker_data)
+
             #return marker object
             marker = LocationMarker.from_json(marker_data)
             return marker
@@ -1,6 +1,8 @@
 from typing import List, Dict
 
 class DetectedObjects:
+    __slots__ = ("_date_detected", "_detected_objects")
+
     def __init__(self, date_detected: str, detected_objects: List[str]):
         """
         Constructor for the DetectedObjects class.
@@ -45,10 +47,23 @@ class DetectedObjects:
         :param data: Dictionary with detected objects details.
         :return: A new DetectedObjects instance.
         """
-        return cls(
-            date_detected=data.get("dateDetected", ""),
-            detected_objects=data.get("detectedObjects", [])
-        )
+        instance = cls.__new__(cls)
+        instance._date_detected = data.get("dateDetected", "")
+        instance._detected_objects = data.get("detectedObjects", [])
+        return instance
+
+    @staticmethod
+    def normalize_json(data: Dict[str, any]) -> Dict[str, any]:
+        """
+        Returns the dictionary DetectedObjects.from_json(data).to_json() would produce, without building the object.
+        
+        :param data: Dictionary with detected objects details.
+        :return: Dictionary with exactly the DetectedObjects keys.
+        """
+        return {
+            "dateDetected": data.get("dateDetected", ""),
+            "detectedObjects": list(data.get("detectedObjects", []))
+        }
 
     def __repr__(self) -> str:
         """
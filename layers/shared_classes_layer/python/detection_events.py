@@ -0,0 +1,92 @@
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import detection_index
+
+# Items of the DetectionEvents table record what changed between consecutive detections of a marker:
+#   markerId (partition key)
+#   dateDetected (sort key)      date of the detection the event describes
+#   previousDateDetected         date of the detection it was compared with, absent for the first one
+#   appeared, disappeared        {label: count} of the labels gained and lost, as multisets
+# Detections that change nothing produce no event.
+
+
+def diff(previous: List[str], current: List[str]) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """
+    Compare two lists of detected labels as multisets, so that a second car appearing next
+    to a first one is a change. Labels are compared after detection_index.normalize_label.
+
+    :param previous: Labels of the earlier detection.
+    :param current: Labels of the later detection.
+    :return: A tuple of ({label: count} appeared, {label: count} disappeared).
+    """
+    before = Counter(detection_index.normalize_label(label) for label in previous if str(label).strip())
+    after = Counter(detection_index.normalize_label(label) for label in current if str(label).strip())
+    return dict(sorted((after - before).items())), dict(sorted((before - after).items()))
+
+
+def event_item(marker_id: str, previous: Optional[dict], detection: dict) -> Optional[dict]:
+    """
+    Build the event of one detection.
+
+    :param marker_id: Unique identifier for the marker.
+    :param previous: The marker's preceding DetectedObjects entry as JSON, or None.
+    :param detection: The new DetectedObjects entry as JSON.
+    :return: The DetectionEvents item, or None if no label appeared or disappeared.
+    """
+    appeared, disappeared = diff((previous or {}).get("detectedObjects") or [],
+                                 detection.get("detectedObjects") or [])
+    if not appeared and not disappeared:
+        return None
+    item = {
+        'markerId': str(marker_id),
+        'dateDetected': detection.get("dateDetected") or "",
+        'appeared': appeared,
+        'disappeared': disappeared,
+    }
+    if previous is not None:
+        item['previousDateDetected'] = previous.get("dateDetected") or ""
+    return item
+
+
+def new_events(old_item: Optional[dict], new_item: Optional[dict]) -> List[dict]:
+    """
+    Work out the events of a write to a marker item. Only appended detections produce
+    events, each compared with the entry before it; the check that the write is an append
+    looks at the last previous entry alone rather than the whole list. Writes that rewrite
+    earlier detections leave the existing events as they are.
+
+    :param old_item: The marker item before the write, e.g. a stream record's OldImage.
+    :param new_item: The marker item after the write, e.g. a stream record's NewImage.
+    :return: The DetectionEvents items, oldest first.
+    """
+    marker_id = (new_item or {}).get("markerId")
+    old_detections = (old_item or {}).get("detectedObjects") or []
+    new_detections = (new_item or {}).get("detectedObjects") or []
+    appended = len(old_detections)
+    if marker_id is None or len(new_detections) <= appended:
+        return []
+    if old_detections and new_detections[appended - 1] != old_detections[-1]:
+        return []
+
+    events = []
+    for position in range(appended, len(new_detections)):
+        previous = new_detections[position - 1] if position else None
+        event = event_item(marker_id, previous, new_detections[position])
+        if event is not None:
+            events.append(event)
+    return events
+
+
+def normalize_event(item: dict) -> dict:
+    """
+    Returns an event as served by the API, with integer counts whatever the DynamoDB client
+    decoded them to.
+    """
+    return {
+        'markerId': item['markerId'],
+        'dateDetected': item['dateDetected'],
+        'previousDateDetected': item.get('previousDateDetected'),
+        'appeared': {label: int(count) for label, count in (item.get('appeared') or {}).items()},
+        'disappeared': {label: int(count) for label, count in (item.get('disappeared') or {}).items()},
+    }
@@ -0,0 +1,84 @@
+import hashlib
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# Items of the DetectionIndex table map a label to the markers and dates it was detected at:
+#   labelShard (partition key)   "<label>#<shard>"
+#   detectionKey (sort key)      "<dateDetected>#<markerId>", so a label's items sort by date
+#   label, markerId, dateDetected, count (occurrences of the label in that detection)
+# Each label is spread over SHARDS partitions by a hash of markerId, so a common label does
+# not concentrate every write on one partition; reads query the shards and merge them.
+SHARDS = 4
+
+
+def normalize_label(label: str) -> str:
+    """
+    Returns the form labels are indexed under: stripped and lowercased.
+    """
+    return str(label).strip().lower()
+
+
+def shard(marker_id: str) -> int:
+    """
+    Returns the index shard of a marker, between 0 and SHARDS - 1.
+    """
+    return int(hashlib.md5(str(marker_id).encode('utf-8')).hexdigest(), 16) % SHARDS
+
+
+def label_shard(label: str, shard_number: int) -> str:
+    return f"{label}#{shard_number}"
+
+
+def detection_key(date_detected: str, marker_id: str) -> str:
+    return f"{date_detected}#{marker_id}"
+
+
+def index_items(marker_id: str, detection: dict) -> List[dict]:
+    """
+    Build the index items of one DetectedObjects entry, one per distinct label.
+
+    :param marker_id: Unique identifier for the marker.
+    :param detection: The entry, as DetectedObjects.to_json() returns it.
+    :return: The DetectionIndex items.
+    """
+    date_detected = detection.get("dateDetected") or ""
+    labels = Counter(normalize_label(label) for label in detection.get("detectedObjects") or [] if str(label).strip())
+    marker_shard = shard(marker_id)
+    return [{
+        'labelShard': label_shard(label, marker_shard),
+        'detectionKey': detection_key(date_detected, marker_id),
+        'label': label,
+        'markerId': str(marker_id),
+        'dateDetected': date_detected,
+        'count': count,
+    } for label, count in sorted(labels.items())]
+
+
+def _keyed_items(marker_id: str, detections: List[dict]) -> Dict[Tuple[str, str], dict]:
+    return {(item['labelShard'], item['detectionKey']): item
+            for detection in detections for item in index_items(marker_id, detection)}
+
+
+def index_changes(old_item: Optional[dict], new_item: Optional[dict]) -> Tuple[List[dict], List[dict]]:
+    """
+    Work out how the index must change when a marker item changes from old_item to new_item
+    (either may be None or lack detectedObjects, e.g. a tombstone). Detections are normally
+    only appended, in which case only the new entries are indexed.
+
+    :param old_item: The marker item before the write, e.g. a stream record's OldImage.
+    :param new_item: The marker item after the write, e.g. a stream record's NewImage.
+    :return: A tuple of (items to put, keys to delete).
+    """
+    marker_id = (new_item or old_item or {}).get("markerId")
+    if marker_id is None:
+        return [], []
+    old_detections = (old_item or {}).get("detectedObjects") or []
+    new_detections = (new_item or {}).get("detectedObjects") or []
+    if old_detections == new_detections[:len(old_detections)]:
+        return [item for detection in new_detections[len(old_detections):]
+                for item in index_items(marker_id, detection)], []
+
+    old, new = _keyed_items(marker_id, old_detections), _keyed_items(marker_id, new_detections)
+    puts = [item for key, item in new.items() if old.get(key) != item]
+    deletes = [{'labelShard': key[0], 'detectionKey': key[1]} for key in old if key not in new]
+    return puts, deletes
@@ -0,0 +1,250 @@
+import math
+from typing import List, Optional, Tuple
+
+# Geohash base32 alphabet (omits a, i, l and o)
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_DECODE = {char: index for index, char in enumerate(_BASE32)}
+
+
+def _bits(precision: int) -> Tuple[int, int]:
+    """
+    Returns the number of latitude and longitude bits in a geohash of the given precision.
+
+    :param precision: Number of geohash characters.
+    :return: Tuple of (latitude bits, longitude bits).
+    """
+    total = 5 * precision
+    return total // 2, total - total // 2
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """
+    Returns the size of a geohash cell in degrees.
+
+    :param precision: Number of geohash characters.
+    :return: Tuple of (cell height in degrees latitude, cell width in degrees longitude).
+    """
+    lat_bits, lon_bits = _bits(precision)
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def _cell_index(latitude: float, longitude: float, precision: int) -> Tuple[int, int]:
+    """
+    Returns the row and column of the cell containing a point on the geohash grid.
+    """
+    lat_bits, lon_bits = _bits(precision)
+    rows, columns = 1 << lat_bits, 1 << lon_bits
+    row = min(int((latitude + 90.0) / 180.0 * rows), rows - 1)
+    column = min(int((longitude + 180.0) / 360.0 * columns), columns - 1)
+    return row, column
+
+
+def _encode_index(row: int, column: int, precision: int) -> str:
+    """
+    Interleaves a grid row and column into a geohash string (longitude bit first).
+    """
+    lat_bits, lon_bits = _bits(precision)
+    value = 0
+    for bit in range(5 * precision):
+        if bit % 2 == 0:
+            lon_bit = lon_bits - 1 - bit // 2
+            value = (value << 1) | ((column >> lon_bit) & 1)
+        else:
+            lat_bit = lat_bits - 1 - bit // 2
+            value = (value << 1) | ((row >> lat_bit) & 1)
+    return ''.join(_BASE32[(value >> shift) & 31] for shift in range(5 * (precision - 1), -1, -5))
+
+
+def encode(latitude: float, longitude: float, precision: int = 9) -> str:
+    """
+    Encodes a point as a geohash.
+
+    :param latitude: Latitude in degrees, between -90 and 90.
+    :param longitude: Longitude in degrees, between -180 and 180.
+    :param precision: Number of geohash characters.
+    :return: The geohash string.
+    :raises ValueError: If the point is out of range.
+    """
+    if not -90.0 <= latitude <= 90.0 or not -180.0 <= longitude <= 180.0:
+        raise ValueError(f"Coordinate out of range: ({latitude}, {longitude})")
+    row, column = _cell_index(latitude, longitude, precision)
+    return _encode_index(row, column, precision)
+
+
+def bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """
+    Returns the bounding box of a geohash cell.
+
+    :param geohash: The geohash string.
+    :return: Tuple of (min_lat, min_lon, max_lat, max_lon).
+    :raises ValueError: If the geohash contains invalid characters.
+    """
+    precision = len(geohash)
+    lat_bits, lon_bits = _bits(precision)
+    row = column = 0
+    bit = 0
+    for char in geohash:
+        if char not in _DECODE:
+            raise ValueError(f"Invalid geohash: {geohash}")
+        value = _DECODE[char]
+        for shift in range(4, -1, -1):
+            if bit % 2 == 0:
+                column = (column << 1) | ((value >> shift) & 1)
+            else:
+                row = (row << 1) | ((value >> shift) & 1)
+            bit += 1
+    height, width = cell_size(precision)
+    min_lat = row * height - 90.0
+    min_lon = column * width - 180.0
+    return min_lat, min_lon, min_lat + height, min_lon + width
+
+
+def cover(min_lat: float, min_lon: float, max_lat: float, max_lon: float, precision: int) -> List[str]:
+    """
+    Returns every geohash cell of the given precision that intersects a bounding box.
+    A box with min_lon greater than max_lon is treated as crossing the antimeridian.
+
+    :param min_lat: Southern edge of the box.
+    :param min_lon: Western edge of the box.
+    :param max_lat: Northern edge of the box.
+    :param max_lon: Eastern edge of the box.
+    :param precision: Number of geohash characters.
+    :return: List of geohash strings.
+    """
+    if min_lon > max_lon:
+        return (cover(min_lat, min_lon, max_lat, 180.0, precision)
+                + cover(min_lat, -180.0, max_lat, max_lon, precision))
+
+    min_row, min_column = _cell_index(min_lat, min_lon, precision)
+    max_row, max_column = _cell_index(max_lat, max_lon, precision)
+    return [_encode_index(row, column, precision)
+            for row in range(min_row, max_row + 1)
+            for column in range(min_column, max_column + 1)]
+
+
+def cover_count(min_lat: float, min_lon: float, max_lat: float, max_lon: float, precision: int) -> int:
+    """
+    Returns the number of cells cover() would produce, without building them.
+    """
+    if min_lon > max_lon:
+        return (cover_count(min_lat, min_lon, max_lat, 180.0, precision)
+                + cover_count(min_lat, -180.0, max_lat, max_lon, precision))
+
+    min_row, min_column = _cell_index(min_lat, min_lon, precision)
+    max_row, max_column = _cell_index(max_lat, max_lon, precision)
+    return (max_row - min_row + 1) * (max_column - min_column + 1)
+
+
+def minimal_cover(min_lat: float, min_lon: float, max_lat: float, max_lon: float,
+                  max_cells: int, min_precision: int, max_precision: int) -> List[str]:
+    """
+    Covers a bounding box with the finest geohash precision that needs at most
+    `max_cells` cells, so that as little area outside the box as possible is read.
+
+    :param max_cells: Maximum number of cells to return.
+    :param min_precision: Coarsest precision that may be used.
+    :param max_precision: Finest precision that may be used.
+    :return: List of geohash strings.
+    :raises ValueError: If the box needs more than `max_cells` cells even at `min_precision`.
+    """
+    for precision in range(max_precision, min_precision - 1, -1):
+        if cover_count(min_lat, min_lon, max_lat, max_lon, precision) <= max_cells:
+            return cover(min_lat, min_lon, max_lat, max_lon, precision)
+    raise ValueError("Bounding box is too large to query by geohash")
+
+
+
+def neighbour(geohash: str, row_offset: int, column_offset: int) -> Optional[str]:
+    """
+    Returns the geohash of the same precision offset by a number of rows and columns,
+    wrapping around the antimeridian.
+
+    :param geohash: The geohash string.
+    :param row_offset: Number of cells to move north (positive) or south (negative).
+    :param column_offset: Number of cells to move east (positive) or west (negative).
+    :return: The neighbouring geohash, or None if it would lie beyond a pole.
+    """
+    precision = len(geohash)
+    min_lat, min_lon, max_lat, max_lon = bounds(geohash)
+    lat_bits, lon_bits = _bits(precision)
+    row, column = _cell_index((min_lat + max_lat) / 2, (min_lon + max_lon) / 2, precision)
+    row += row_offset
+    if row < 0 or row >= 1 << lat_bits:
+        return None
+    column = (column + column_offset) % (1 << lon_bits)
+    return _encode_index(row, column, precision)
+
+
+def ring(geohash: str, radius: int) -> List[str]:
+    """
+    Returns the cells exactly `radius` cells away from a geohash (Chebyshev distance),
+    i.e. the border of the (2 * radius + 1) square block centred on it.
+
+    :param geohash: The centre geohash.
+    :param radius: Ring number; 0 returns the centre cell itself.
+    :return: List of distinct geohash strings.
+    """
+    if radius == 0:
+        return [geohash]
+    offsets = [(row, column)
+               for row in range(-radius, radius + 1)
+               for column in range(-radius, radius + 1)
+               if max(abs(row), abs(column)) == radius]
+    cells = []
+    for row, column in offsets:
+        cell = neighbour(geohash, row, column)
+        if cell and cell not in cells:
+            cells.append(cell)
+    return cells
+
+
+EARTH_RADIUS_METERS = 6371008.8
+
+
+def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Returns the great-circle distance between two points in meters.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(min(1.0, math.sqrt(a)))
+
+
+def cell_size_meters(precision: int, latitude: float) -> Tuple[float, float]:
+    """
+    Returns the size of a geohash cell in meters at a given latitude.
+
+    :return: Tuple of (cell height in meters, cell width in meters).
+    """
+    height, width = cell_size(precision)
+    meters_per_degree = math.radians(1) * EARTH_RADIUS_METERS
+    return height * meters_per_degree, width * meters_per_degree * math.cos(math.radians(latitude))
+
+
+def searched_radius(latitude: float, longitude: float, geohash: str, radius: int) -> float:
+    """
+    Returns the distance from a point inside `geohash` to the nearest edge of the block
+    formed by the cell and its rings up to `radius`. Every point closer than this
+    distance lies inside the block.
+
+    :return: Distance in meters (infinity if the block wraps the whole globe).
+    """
+    min_lat, min_lon, max_lat, max_lon = bounds(geohash)
+    height, width = cell_size(len(geohash))
+    north = max_lat + radius * height
+    south = min_lat - radius * height
+    meters_per_radian = EARTH_RADIUS_METERS
+
+    distances = [
+        math.inf if north >= 90.0 else math.radians(north - latitude) * meters_per_radian,
+        math.inf if south <= -90.0 else math.radians(latitude - south) * meters_per_radian,
+    ]
+    if (2 * radius + 1) * width < 360.0:
+        cos_lat = math.cos(math.radians(latitude))
+        for delta in (max_lon + radius * width - longitude, longitude - (min_lon - radius * width)):
+            # Great-circle distance from the point to a meridian `delta` degrees away
+            delta = math.radians(min(delta, 90.0))
+            distances.append(math.asin(min(1.0, cos_lat * math.sin(delta))) * meters_per_radian)
+    return min(distances)
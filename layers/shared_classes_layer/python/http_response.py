@@ -0,0 +1,185 @@
+import base64
+import gzip
+import hashlib
+import os
+from typing import Optional, Union
+
+# Cache-Control of responses carrying an ETag: browsers and API Gateway may keep them but
+# must revalidate with If-None-Match before reuse, which the read handlers answer with a 304
+REVALIDATE = 'no-cache'
+
+# Bodies smaller than this are sent uncompressed; below about a kilobyte the encoding
+# overhead and the base64 expansion outweigh the savings
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', 1024))
+
+# Compression levels trading ratio for CPU time, see tests/benchmark/test_compression_benchmark.py
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Media types the API declares binary (binary_media_types in the stack). API Gateway only
+# decodes a base64 body with isBase64Encoded for requests whose Accept header names one of
+# them; any other client would receive the base64 text
+BINARY_MEDIA_TYPES = ('image/png', 'image/*', 'application/octet-stream')
+
+# brotli is not in the standard library; when the layer does not ship it only gzip is offered
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def header(event: dict, name: str) -> Optional[str]:
+    """
+    Returns a request header of an API Gateway proxy event, whatever its case.
+
+    :param event: AWS Lambda event object.
+    :param name: Header name.
+    :return: The header value, or None if the request does not have it.
+    """
+    name = name.lower()
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def version_etag(marker_id: str, version: int) -> str:
+    """
+    Returns the strong ETag of a marker at a version; every write increments the version,
+    so the ETag changes whenever the marker does.
+    """
+    return f'"{marker_id}-v{int(version)}"'
+
+
+def content_etag(body: Union[str, bytes]) -> str:
+    """
+    Returns a strong ETag derived from a response body.
+    """
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """
+    Checks an If-None-Match header against the current ETag of a resource, using the weak
+    comparison that RFC 7232 prescribes for If-None-Match.
+
+    :param if_none_match: The If-None-Match header value (a list of ETags, or "*").
+    :param etag: The current ETag, or None if the resource does not exist.
+    :return: True if the client's copy is current and a 304 can be returned.
+    """
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def accepts_binary(event: dict) -> bool:
+    """
+    Checks whether API Gateway will decode a binary response to a request, i.e. whether its
+    Accept header lists one of BINARY_MEDIA_TYPES.
+
+    :param event: AWS Lambda event object.
+    :return: True if a base64-encoded body reaches the client as bytes.
+    """
+    accept = header(event, 'Accept')
+    if not accept:
+        return False
+    media_types = {part.split(';')[0].strip().lower() for part in accept.split(',')}
+    return any(media_type in media_types for media_type in BINARY_MEDIA_TYPES)
+
+
+def accepted_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Picks the content coding for a response from an Accept-Encoding header: the supported
+    coding ("br" when brotli is available, then "gzip") with the highest quality value.
+
+    :param accept_encoding: The Accept-Encoding header value, or None.
+    :return: "br", "gzip", or None to send the body uncompressed.
+    """
+    if not accept_encoding:
+        return None
+    qualities = {}
+    for part in accept_encoding.split(','):
+        coding, _, parameters = part.strip().partition(';')
+        quality = 1.0
+        parameter_name, _, value = parameters.strip().partition('=')
+        if parameter_name.strip().lower() == 'q':
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        qualities[coding.strip().lower()] = quality
+
+    supported = ('br', 'gzip') if brotli is not None else ('gzip',)
+    best, best_quality = None, 0.0
+    for coding in supported:
+        quality = qualities.get(coding, qualities.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def encode_body(body: bytes, coding: str) -> bytes:
+    """
+    Compresses a body with a content coding returned by accepted_encoding.
+    """
+    if coding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress(response: dict, event: dict, min_bytes: int = COMPRESSION_MIN_BYTES) -> dict:
+    """
+    Compresses the body of a response when the request's Accept-Encoding allows it and the
+    body is at least min_bytes long. The compressed body is base64-encoded with
+    isBase64Encoded set, which API Gateway only decodes for requests that accept a binary
+    media type (see accepts_binary); other requests get the body uncompressed.
+    A strong ETag becomes weak, as the compressed bytes differ from the identity encoding.
+
+    :param response: An API Gateway proxy response with a str body.
+    :param event: AWS Lambda event object of the request.
+    :param min_bytes: Smallest body worth compressing.
+    :return: The response, compressed in place if at all.
+    """
+    headers = response.setdefault('headers', {})
+    # The body depends on Accept too: API Gateway only passes compressed bodies to requests
+    # accepting a binary media type
+    headers['Vary'] = 'Accept, Accept-Encoding'
+    body = response.get('body') or ''
+    if response.get('isBase64Encoded') or len(body) < min_bytes:
+        return response
+    coding = accepted_encoding(header(event, 'Accept-Encoding'))
+    if coding is None or not accepts_binary(event):
+        return response
+
+    response['body'] = base64.b64encode(encode_body(body.encode('utf-8'), coding)).decode('ascii')
+    response['isBase64Encoded'] = True
+    headers['Content-Encoding'] = coding
+    etag = headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        headers['ETag'] = 'W/' + etag
+    return response
+
+
+def request_body(event: dict) -> str:
+    """
+    Returns the body of a request as text. API Gateway passes request bodies base64-encoded
+    when their Content-Type is one of the API's binary media types.
+
+    :param event: AWS Lambda event object.
+    :return: The body, or an empty string if there is none.
+    """
+    body = event.get('body') or ''
+    if event.get('isBase64Encoded'):
+        body = base64.b64decode(body).decode('utf-8')
+    return body
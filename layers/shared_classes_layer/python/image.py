@@ -1,6 +1,13 @@
 import json
+from typing import Optional
 
 class Image:
+    __slots__ = ("_date_taken", "_image_url", "_s3_key", "_s3_bucket_name", "_pyramid_key", "_width", "_height",
+                 "_tile_size", "_pyramid_levels", "_perceptual_hash")
+
+    # Keys added to the JSON form once the image has a tile pyramid
+    PYRAMID_FIELDS = ("pyramidKey", "width", "height", "tileSize", "pyramidLevels")
+
     def __init__(self, date_taken: str, image_url: str, s3_key: str, s3_bucket_name: str):
         """
         Constructor for the Image class.
@@ -14,6 +21,12 @@ class Image:
         self._image_url = image_url
         self._s3_key = s3_key
         self._s3_bucket_name = s3_bucket_name
+        self._pyramid_key = None
+        self._width = 0
+        self._height = 0
+        self._tile_size = 0
+        self._pyramid_levels = 0
+        self._perceptual_hash = None
 
     # Setters
     def set_date_taken(self, date: str):
@@ -28,6 +41,28 @@ class Image:
     def set_s3_bucket_name(self, name: str):
         self._s3_bucket_name = name
 
+    def set_pyramid(self, pyramid_key: str, width: int, height: int, tile_size: int, levels: int):
+        """
+        Points the image at its tile pyramid.
+
+        :param pyramid_key: S3 key of the tile pack holding the pyramid and the thumbnail.
+        :param width: Width of the full-resolution image, in pixels.
+        :param height: Height of the full-resolution image, in pixels.
+        :param tile_size: Side of the tiles, in pixels.
+        :param levels: Number of pyramid levels, level 0 being the full resolution.
+        """
+        self._pyramid_key = pyramid_key
+        self._width = width
+        self._height = height
+        self._tile_size = tile_size
+        self._pyramid_levels = levels
+
+    def set_perceptual_hash(self, perceptual_hash: str):
+        """
+        :param perceptual_hash: 64-bit perceptual hash of the image, as 16 hex digits.
+        """
+        self._perceptual_hash = perceptual_hash
+
     # Getters
     def get_date_taken(self) -> str:
         return self._date_taken
@@ -41,19 +76,45 @@ class Image:
     def get_s3_bucket_name(self) -> str:
         return self._s3_bucket_name
 
+    def get_pyramid_key(self) -> Optional[str]:
+        return self._pyramid_key
+
+    def get_width(self) -> int:
+        return self._width
+
+    def get_height(self) -> int:
+        return self._height
+
+    def get_tile_size(self) -> int:
+        return self._tile_size
+
+    def get_pyramid_levels(self) -> int:
+        return self._pyramid_levels
+
+    def get_perceptual_hash(self) -> Optional[str]:
+        return self._perceptual_hash
+
     # JSON Serialization
     def to_json(self) -> dict:
         """
-        Converts the Image instance to a JSON-compatible dictionary.
+        Converts the Image instance to a JSON-compatible dictionary. The pyramid fields
+        are only present once the image has a tile pyramid, and perceptualHash once it
+        has been hashed.
         
         :return: Dictionary with image details.
         """
-        return {
+        data = {
             "dateTaken": self._date_taken,
             "imageURL": self._image_url,
             "s3_key": self._s3_key,
             "s3_bucket_name": self._s3_bucket_name
         }
+        if self._pyramid_key:
+            data.update(pyramidKey=self._pyramid_key, width=self._width, height=self._height,
+                        tileSize=self._tile_size, pyramidLevels=self._pyramid_levels)
+        if self._perceptual_hash:
+            data["perceptualHash"] = self._perceptual_hash
+        return data
 
     @classmethod
     def from_json(cls, data: dict) -> 'Image':
@@ -63,12 +124,46 @@ class Image:
         :param data: Dictionary with image details.
         :return: A new Image instance.
         """
-        return cls(
-            date_taken=data.get("dateTaken", ""),
-            image_url=data.get("imageURL", ""),
-            s3_key=data.get("s3_key", ""),
-            s3_bucket_name=data.get("s3_bucket_name", "")
-        )
+        # Markers carry hundreds of these, so the slots are filled directly instead of going through __init__
+        get = data.get
+        instance = cls.__new__(cls)
+        instance._date_taken = get("dateTaken", "")
+        instance._image_url = get("imageURL", "")
+        instance._s3_key = get("s3_key", "")
+        instance._s3_bucket_name = get("s3_bucket_name", "")
+        instance._pyramid_key = get("pyramidKey")
+        if instance._pyramid_key:
+            # DynamoDB returns numbers as Decimal
+            instance._width = int(data["width"])
+            instance._height = int(data["height"])
+            instance._tile_size = int(data["tileSize"])
+            instance._pyramid_levels = int(data["pyramidLevels"])
+        else:
+            instance._width = instance._height = instance._tile_size = instance._pyramid_levels = 0
+        instance._perceptual_hash = get("perceptualHash")
+        return instance
+
+    @staticmethod
+    def normalize_json(data: dict) -> dict:
+        """
+        Returns the dictionary Image.from_json(data).to_json() would produce, without building the Image.
+        
+        :param data: Dictionary with image details.
+        :return: Dictionary with exactly the Image keys.
+        """
+        get = data.get
+        normalized = {
+            "dateTaken": get("dateTaken", ""),
+            "imageURL": get("imageURL", ""),
+            "s3_key": get("s3_key", ""),
+            "s3_bucket_name": get("s3_bucket_name", "")
+        }
+        if get("pyramidKey"):
+            normalized.update(pyramidKey=data["pyramidKey"], width=int(data["width"]), height=int(data["height"]),
+                              tileSize=int(data["tileSize"]), pyramidLevels=int(data["pyramidLevels"]))
+        if get("perceptualHash"):
+            normalized["perceptualHash"] = data["perceptualHash"]
+        return normalized
 
     def __repr__(self) -> str:
         return (f"Image(date_taken='{self._date_taken}', "
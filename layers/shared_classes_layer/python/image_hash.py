@@ -0,0 +1,66 @@
+import numpy as np
+
+# Perceptual hashes of grayscale images (as returned by change_detection.load_image), 64 bits
+# written as 16 hex digits. Captures of the same scene hash to nearby values, so the number
+# of differing bits (hamming_distance) measures how different two images look.
+
+# Smallest side an image must have to be hashed
+MIN_SIDE = 32
+
+
+def _resize(image: np.ndarray, height: int, width: int) -> np.ndarray:
+    """
+    Shrink an image to height x width by averaging the pixels of each output cell.
+    """
+    rows = (np.arange(height) * image.shape[0]) // height
+    columns = (np.arange(width) * image.shape[1]) // width
+    sums = np.add.reduceat(np.add.reduceat(image, rows, axis=0), columns, axis=1)
+    counts = np.outer(np.diff(np.append(rows, image.shape[0])), np.diff(np.append(columns, image.shape[1])))
+    return sums / counts
+
+
+def _to_hex(bits: np.ndarray) -> str:
+    return np.packbits(bits.ravel()).tobytes().hex()
+
+
+def _check_size(image: np.ndarray):
+    if min(image.shape[:2]) < MIN_SIDE:
+        raise ValueError(f"Images smaller than {MIN_SIDE} pixels per side cannot be hashed")
+
+
+def dhash(image: np.ndarray) -> str:
+    """
+    Difference hash: whether each cell of a 9x8 reduction is brighter than its left neighbour.
+    Cheap, and insensitive to changes of brightness and contrast.
+
+    :param image: Grayscale float image.
+    :return: The hash, as 16 hex digits.
+    :raises ValueError: If the image is too small.
+    """
+    _check_size(image)
+    small = _resize(image, 8, 9)
+    return _to_hex(small[:, 1:] > small[:, :-1])
+
+
+def phash(image: np.ndarray) -> str:
+    """
+    DCT hash: whether each of the 8x8 lowest frequencies of a 32x32 reduction is above their
+    median. Slower than dhash, and more tolerant of small shifts and noise.
+
+    :param image: Grayscale float image.
+    :return: The hash, as 16 hex digits.
+    :raises ValueError: If the image is too small.
+    """
+    _check_size(image)
+    small = _resize(image, 32, 32)
+    frequencies, samples = np.meshgrid(np.arange(32), np.arange(32), indexing='ij')
+    dct = np.cos(np.pi * (2 * samples + 1) * frequencies / 64)  # DCT-II basis, one frequency per row
+    low = (dct @ small @ dct.T)[:8, :8]
+    return _to_hex(low > np.median(low.ravel()[1:]))  # The DC term would dominate the median
+
+
+def hamming_distance(first: str, second: str) -> int:
+    """
+    Number of bits that differ between two hashes.
+    """
+    return bin(int(first, 16) ^ int(second, 16)).count('1')
@@ -0,0 +1,172 @@
+import math
+import struct
+import tempfile
+import zlib
+from typing import BinaryIO, Callable, List, Optional
+
+import numpy as np
+
+import aws_clients
+import change_detection
+import tile_pack
+from image import Image
+
+# Side of the square tiles, in pixels; tiles on the right and bottom edges may be smaller
+DEFAULT_TILE_SIZE = 256
+
+# Longest side of the thumbnail stored in each tile pack
+THUMBNAIL_MAX_SIDE = 256
+
+# zlib level of the PNG tiles; tiles are encoded once and served many times
+PNG_COMPRESSION_LEVEL = 6
+
+
+def load_pixels(data: bytes) -> np.ndarray:
+    """
+    Decode an image into 8-bit pixels for display.
+
+    :param data: The encoded image. Netpbm images are decoded with NumPy alone; other
+                 formats (JPEG, PNG) need Pillow.
+    :return: uint8 array of shape (height, width) for grayscale images, (height, width, 3) otherwise.
+    :raises ValueError: If the image cannot be decoded.
+    """
+    if change_detection.is_netpbm(data):
+        pixels = np.rint(change_detection.read_netpbm(data) * 255).astype(np.uint8)
+        return pixels[:, :, 0] if pixels.shape[2] == 1 else pixels
+    try:
+        from PIL import Image as PILImage  # Optional; only needed for compressed formats
+    except ImportError as e:
+        raise ValueError("Only PGM/PPM images can be decoded without Pillow") from e
+    import io
+    try:
+        with PILImage.open(io.BytesIO(data)) as picture:
+            return np.asarray(picture.convert('L' if picture.mode in ('1', 'L', 'I', 'I;16') else 'RGB'))
+    except OSError as e:
+        raise ValueError("Image cannot be decoded") from e
+
+
+def encode_png(pixels: np.ndarray) -> bytes:
+    """
+    Encode 8-bit grayscale or RGB pixels as a PNG, without filtering.
+
+    :param pixels: uint8 array of shape (height, width) or (height, width, 3).
+    :return: The PNG file.
+    """
+    height, width = pixels.shape[:2]
+    colour_type = 2 if pixels.ndim == 3 else 0
+    # Each scanline starts with its filter type, 0 (None)
+    scanlines = np.zeros((height, width * (3 if colour_type == 2 else 1) + 1), dtype=np.uint8)
+    scanlines[:, 1:] = pixels.reshape(height, -1)
+
+    def chunk(kind: bytes, body: bytes) -> bytes:
+        return struct.pack('>I', len(body)) + kind + body + struct.pack('>I', zlib.crc32(kind + body) & 0xFFFFFFFF)
+
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, colour_type, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(scanlines.tobytes(), PNG_COMPRESSION_LEVEL))
+            + chunk(b'IEND', b''))
+
+
+def _halve(pixels: np.ndarray) -> np.ndarray:
+    """
+    Halve an image by averaging 2x2 blocks; an odd last row or column is averaged with itself.
+    """
+    padding = [(0, pixels.shape[0] % 2), (0, pixels.shape[1] % 2)] + [(0, 0)] * (pixels.ndim - 2)
+    padded = np.pad(pixels, padding, mode='edge').astype(np.float32)
+    halved = (padded[0::2, 0::2] + padded[1::2, 0::2] + padded[0::2, 1::2] + padded[1::2, 1::2]) / 4
+    return np.rint(halved).astype(np.uint8)
+
+
+def build_levels(pixels: np.ndarray, tile_size: int = DEFAULT_TILE_SIZE) -> List[np.ndarray]:
+    """
+    Build the levels of an image pyramid.
+
+    :param pixels: The full-resolution image, as returned by load_pixels.
+    :param tile_size: Side of the tiles, in pixels.
+    :return: The levels from the full resolution down to the first one that fits in one tile.
+    """
+    levels = [pixels]
+    while max(levels[-1].shape[:2]) > tile_size:
+        levels.append(_halve(levels[-1]))
+    return levels
+
+
+def write_pyramid(pixels: np.ndarray, output: BinaryIO, tile_size: int = DEFAULT_TILE_SIZE) -> dict:
+    """
+    Build the pyramid and thumbnail of an image and write them to a tile pack.
+
+    :param pixels: The full-resolution image, as returned by load_pixels.
+    :param output: Binary file object the pack is written to.
+    :param tile_size: Side of the tiles, in pixels.
+    :return: The pack header; see tile_pack for the layout.
+    """
+    levels = build_levels(pixels, tile_size)
+    thumbnail = next((level for level in levels if max(level.shape[:2]) <= THUMBNAIL_MAX_SIDE), levels[-1])
+    while max(thumbnail.shape[:2]) > THUMBNAIL_MAX_SIDE:
+        thumbnail = _halve(thumbnail)
+
+    tiles = [encode_png(thumbnail)]
+    descriptions = []
+    for level in levels:
+        height, width = level.shape[:2]
+        columns, rows = math.ceil(width / tile_size), math.ceil(height / tile_size)
+        descriptions.append({'width': width, 'height': height, 'columns': columns, 'rows': rows, 'first': len(tiles)})
+        for row in range(rows):
+            for column in range(columns):
+                tiles.append(encode_png(level[row * tile_size:(row + 1) * tile_size,
+                                              column * tile_size:(column + 1) * tile_size]))
+
+    header = {
+        'tileSize': tile_size,
+        'width': pixels.shape[1],
+        'height': pixels.shape[0],
+        'format': 'png',
+        'thumbnail': {'width': thumbnail.shape[1], 'height': thumbnail.shape[0]},
+        'levels': descriptions,
+    }
+    tile_pack.write_tile_pack(output, header, tiles)
+    return header
+
+
+def upload_s3_pack(bucket: str, key: str, path: str):
+    """
+    Upload a tile pack file to S3.
+    """
+    aws_clients.get_s3_client().upload_file(path, bucket, key, ExtraArgs={'ContentType': 'application/octet-stream'})
+
+
+def build_marker_pyramid(data_service, marker, bucket: str,
+                         read_image: Callable[[Image], bytes] = change_detection.read_s3_image,
+                         store_pack: Callable[[str, str, str], None] = upload_s3_pack,
+                         tile_size: int = DEFAULT_TILE_SIZE) -> Optional[Image]:
+    """
+    Turn a marker's current image into a tile pack, store it and point the image at it.
+
+    :param data_service: DataService of the marker table.
+    :param marker: The LocationMarker, e.g. built from a stream record's NewImage.
+    :param bucket: Name of the bucket the packs are stored in.
+    :param read_image: Returns the encoded bytes of an Image; defaults to reading from S3.
+    :param store_pack: Called with (bucket, key, path) to store the pack file; defaults to uploading to S3.
+    :param tile_size: Side of the tiles, in pixels.
+    :return: The updated Image, or None if the marker has no current image or it already has a pyramid.
+    :raises ValueError: If the image cannot be read or decoded.
+    :raises MarkerNotFoundError: If the marker was deleted in the meantime.
+    """
+    image = marker.get_current_image()
+    if image is None or image.get_pyramid_key():
+        return None
+
+    pixels = load_pixels(read_image(image))
+    key = tile_pack.pack_key(marker.get_marker_id(), image.get_date_taken())
+    with tempfile.NamedTemporaryFile(suffix='.tiles') as file:
+        header = write_pyramid(pixels, file, tile_size)
+        file.flush()
+        store_pack(bucket, key, file.name)
+
+    image.set_pyramid(key, header['width'], header['height'], tile_size, len(header['levels']))
+    history_index = None
+    if not data_service.history_table:
+        dates = [entry.get_date_taken() for entry in marker.get_historical_images()]
+        history_index = dates.index(image.get_date_taken()) if image.get_date_taken() in dates else None
+    data_service.set_image_pyramid(marker.get_marker_id(), image, history_index)
+    return image
@@ -0,0 +1,363 @@
+import hashlib
+import logging
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from data_service import MarkerNotFoundError
+from detected_objects import DetectedObjects
+from image import Image
+
+logger = logging.getLogger()
+
+# A batch is dispatched once it holds this many images...
+DEFAULT_MAX_BATCH_SIZE = 16
+
+# ...or once its first image has waited this long, whichever comes first
+DEFAULT_MAX_WAIT_SECONDS = 0.05
+
+# Detector processes; 0 runs detection on a thread of the worker's own process instead, for
+# environments without the shared-memory semaphores a process pool needs, such as Lambda
+DEFAULT_PROCESSES = 2
+
+# Threads reading the images of a batch from S3 concurrently, for jobs submitted without data
+DEFAULT_READERS = 8
+
+# Threads storing detections; the executor's own result thread only hands batches to them
+DEFAULT_WRITERS = 4
+
+# Latencies kept for the percentiles of InferenceStats
+LATENCY_SAMPLES = 10000
+
+
+class Detector(ABC):
+    """
+    An object detector run by InferenceWorker. Implementations are pickled into each pool
+    process once, so models should be loaded lazily on the first detect() call rather than
+    in the constructor.
+    """
+
+    @abstractmethod
+    def detect(self, images: Sequence[bytes]) -> List[List[str]]:
+        """
+        Detect the objects in a batch of images.
+
+        :param images: The encoded images.
+        :return: The labels detected in each image, in the order of the images.
+        """
+
+
+class StubDetector(Detector):
+    """
+    Detector for tests and benchmarks. It returns labels derived from a hash of each image,
+    so the same image always gets the same labels. It sleeps to imitate the fixed cost of a
+    model call plus a cost per image.
+    """
+
+    def __init__(self, labels: Sequence[str] = ("car", "person", "tree", "building", "dog"),
+                 call_seconds: float = 0.0, image_seconds: float = 0.0):
+        """
+        :param labels: Labels to choose from.
+        :param call_seconds: Time each detect() call takes whatever the batch size.
+        :param image_seconds: Additional time per image.
+        """
+        self.labels = list(labels)
+        self.call_seconds = call_seconds
+        self.image_seconds = image_seconds
+
+    def detect(self, images: Sequence[bytes]) -> List[List[str]]:
+        time.sleep(self.call_seconds + self.image_seconds * len(images))
+        results = []
+        for data in images:
+            digest = hashlib.md5(data).digest()
+            results.append([label for label, byte in zip(self.labels, digest) if byte % 2])
+        return results
+
+
+class InferenceJob(NamedTuple):
+    """A pending image: detection results are appended to the marker it belongs to."""
+    marker_id: str
+    image: Image
+    data: Optional[bytes] = None  # The encoded image, if the producer has it; read with read_image otherwise
+    enqueued_at: float = 0.0  # time.monotonic() when submitted, for the latency metrics
+
+
+class LocalJobQueue:
+    """
+    In-process job queue. A queue service client offering the same get_batch and put
+    methods can replace it.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+
+    def put(self, job: InferenceJob):
+        self._queue.put(job)
+
+    def get_batch(self, max_size: int, max_wait_seconds: float, timeout: Optional[float] = None) -> List[InferenceJob]:
+        """
+        Wait for a job, then keep collecting until the batch is full or the first job has
+        waited max_wait_seconds.
+
+        :param max_size: Maximum number of jobs to return.
+        :param max_wait_seconds: How long the first job may wait for others.
+        :param timeout: How long to wait for the first job; None waits indefinitely.
+        :return: The jobs, or an empty list if none arrived within timeout.
+        """
+        try:
+            batch = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + max_wait_seconds
+        while len(batch) < max_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+
+class InferenceStats:
+    """
+    Running counts of the images a worker has processed, like the dedup statistics of
+    capture_dedup. Latency runs from submission to the detection being stored.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(("images", "batches", "failed", "skipped", "detect_seconds"), 0)
+        self._latencies = []
+        self._started = time.monotonic()
+
+    def record_batch(self, detect_seconds: float):
+        with self._lock:
+            self._counters["batches"] += 1
+            self._counters["detect_seconds"] += detect_seconds
+
+    def record_image(self, latency: float, outcome: str = "images"):
+        """
+        :param latency: Seconds from submission to completion.
+        :param outcome: "images" if the detection was stored, "skipped" if the marker no longer
+                        exists, "failed" if detection or the write failed.
+        """
+        with self._lock:
+            self._counters[outcome] += 1
+            if outcome == "images":
+                self._latencies.append(latency)
+                if len(self._latencies) > LATENCY_SAMPLES:
+                    del self._latencies[:len(self._latencies) - LATENCY_SAMPLES]
+
+    def stats(self) -> Dict[str, float]:
+        """
+        :return: The counters, plus images_per_second since the stats were created, the mean
+                 batch size, and the p50, p95 and max latency in seconds of the latest images.
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            latencies = sorted(self._latencies)
+            elapsed = time.monotonic() - self._started
+        processed = stats["images"] + stats["skipped"] + stats["failed"]
+        stats["images_per_second"] = stats["images"] / elapsed if elapsed else 0.0
+        stats["mean_batch_size"] = processed / stats["batches"] if stats["batches"] else 0.0
+        for name, fraction in (("p50_latency", 0.5), ("p95_latency", 0.95)):
+            stats[name] = latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] if latencies else 0.0
+        stats["max_latency"] = latencies[-1] if latencies else 0.0
+        return stats
+
+
+# Detector of a pool process, set once by _initialize_process
+_process_detector = None
+
+
+def _initialize_process(detector: Detector):
+    global _process_detector
+    _process_detector = detector
+
+
+def _detect_in_process(images: List[bytes]) -> Tuple[List[List[str]], float]:
+    start = time.perf_counter()
+    labels = _process_detector.detect(images)
+    return labels, time.perf_counter() - start
+
+
+class InferenceWorker:
+    """
+    Runs object detection over pending images in micro-batches. A batching thread takes
+    jobs off the queue, reads the images it was not given concurrently, and sends each batch
+    to a pool of detector processes. As each batch completes, a pool of writer threads
+    appends every image's labels to its marker as a new DetectedObjects entry, like
+    LocationMarker.add_detected_objects, with DataService.append_detection. At most two
+    batches per process are in flight, detection or storage, so a slow detector or table
+    holds work in the queue rather than in memory.
+    """
+
+    def __init__(self, data_service, detector: Detector, job_queue: Optional[LocalJobQueue] = None,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_wait_seconds: float = DEFAULT_MAX_WAIT_SECONDS,
+                 processes: int = DEFAULT_PROCESSES, read_image: Optional[Callable[[Image], bytes]] = None,
+                 inference_stats: Optional[InferenceStats] = None, readers: int = DEFAULT_READERS,
+                 writers: int = DEFAULT_WRITERS):
+        """
+        :param data_service: DataService of the marker table the detections are stored in.
+        :param detector: The Detector; it must be picklable unless processes is 0.
+        :param job_queue: Queue the jobs are taken from; defaults to a new LocalJobQueue.
+        :param max_batch_size: Maximum number of images per detect() call.
+        :param max_wait_seconds: How long the first image of a batch may wait for others.
+        :param processes: Number of detector processes, or 0 to detect in this process.
+        :param read_image: Returns the encoded bytes of an Image, for jobs submitted without
+                           data; defaults to change_detection.read_s3_image.
+        :param inference_stats: Where to record metrics; defaults to a new InferenceStats.
+        :param readers: Number of threads reading images.
+        :param writers: Number of threads storing detections.
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.data_service = data_service
+        self.detector = detector
+        self.job_queue = job_queue or LocalJobQueue()
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.processes = processes
+        self.read_image = read_image
+        self.stats = inference_stats or InferenceStats()
+        self.readers = readers
+        self.writers = writers
+        self._executor: Optional[Executor] = None
+        self._reader_pool: Optional[ThreadPoolExecutor] = None
+        self._writer_pool: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._in_flight = threading.BoundedSemaphore(max(processes, 1) * 2)
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+
+    def submit(self, marker_id: str, image: Image, data: Optional[bytes] = None):
+        """
+        Queue an image for detection.
+
+        :param marker_id: Unique identifier for the marker the image belongs to.
+        :param image: The Image.
+        :param data: The encoded image, if already at hand.
+        """
+        self.job_queue.put(InferenceJob(str(marker_id), image, data, time.monotonic()))
+
+    def start(self) -> 'InferenceWorker':
+        """
+        Start the detector processes, the reader and writer threads and the batching thread.
+        """
+        self._reader_pool = ThreadPoolExecutor(max_workers=max(self.readers, 1), thread_name_prefix='inference-read')
+        self._writer_pool = ThreadPoolExecutor(max_workers=max(self.writers, 1), thread_name_prefix='inference-write')
+        if self.processes:
+            self._executor = ProcessPoolExecutor(max_workers=self.processes, initializer=_initialize_process,
+                                                 initargs=(self.detector,))
+        else:
+            _initialize_process(self.detector)
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='inference-batching', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, drain: bool = True):
+        """
+        Stop the worker.
+
+        :param drain: If True, process the jobs already queued first.
+        """
+        if drain:
+            while self.job_queue.qsize():
+                time.sleep(self.max_wait_seconds)
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._executor.shutdown(wait=True)  # Every completed batch has been handed to the writers
+        self._writer_pool.shutdown(wait=True)
+        self._reader_pool.shutdown(wait=True)
+        logger.info(f"Inference worker stopped: {self.stats.stats()}")
+
+    def __enter__(self) -> 'InferenceWorker':
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self.job_queue.get_batch(self.max_batch_size, self.max_wait_seconds, timeout=0.1)
+            if batch:
+                self._dispatch(batch)
+        with self._pending_lock:
+            pending = list(self._pending)
+        for future in pending:
+            future.exception()  # Wait; failures were recorded by _complete
+
+    def _dispatch(self, batch: List[InferenceJob]):
+        reads = [None if job.data is not None else self._reader_pool.submit(self._read, job.image) for job in batch]
+        images, jobs = [], []
+        for job, read in zip(batch, reads):
+            try:
+                images.append(job.data if read is None else read.result())
+                jobs.append(job)
+            except Exception as e:
+                logger.warning(f"Skipping image {job.image.get_s3_key()} of marker {job.marker_id}: {e}")
+                self.stats.record_image(time.monotonic() - job.enqueued_at, "failed")
+        if not jobs:
+            return
+        self._in_flight.acquire()
+        try:
+            future = self._executor.submit(_detect_in_process, images)
+        except Exception as e:
+            # E.g. BrokenProcessPool after a detector process died
+            self._in_flight.release()
+            self._fail(jobs, e)
+            return
+        with self._pending_lock:
+            self._pending.add(future)
+        future.add_done_callback(lambda done: self._writer_pool.submit(self._complete, done, jobs))
+
+    def _read(self, image: Image) -> bytes:
+        if self.read_image is None:
+            import change_detection  # NumPy is only needed when images are read from S3 here
+            self.read_image = change_detection.read_s3_image
+        return self.read_image(image)
+
+    def _complete(self, future: Future, jobs: List[InferenceJob]):
+        try:
+            labels, detect_seconds = future.result()
+            if len(labels) != len(jobs):
+                raise ValueError(f"Detector returned {len(labels)} results for {len(jobs)} images")
+            self.stats.record_batch(detect_seconds)
+            for job, job_labels in zip(jobs, labels):
+                # Stamped one by one: dateDetected keys a marker's detection index and events
+                self._store(job, DetectedObjects(datetime.now(timezone.utc).isoformat(), list(job_labels)))
+        except Exception as e:
+            self._fail(jobs, e)
+        finally:
+            with self._pending_lock:
+                self._pending.discard(future)
+            self._in_flight.release()
+
+    def _fail(self, jobs: List[InferenceJob], error: Exception):
+        logger.error(f"Detection of a batch of {len(jobs)} images failed: {error}")
+        self.stats.record_batch(0.0)
+        for job in jobs:
+            self.stats.record_image(time.monotonic() - job.enqueued_at, "failed")
+
+    def _store(self, job: InferenceJob, detection: DetectedObjects):
+        try:
+            self.data_service.append_detection(job.marker_id, detection)
+            outcome = "images"
+        except MarkerNotFoundError:
+            logger.warning(f"Marker {job.marker_id} was deleted before its detection was stored")
+            outcome = "skipped"
+        except Exception as e:
+            logger.error(f"Failed to store the detection of marker {job.marker_id}: {e}")
+            outcome = "failed"
+        self.stats.record_image(time.monotonic() - job.enqueued_at, outcome)
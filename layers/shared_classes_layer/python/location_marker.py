@@ -1,11 +1,32 @@
 from typing import List, Dict, Optional
 from datetime import datetime
+import hashlib
 
 from coordinate import Coordinate
 from image import Image
 from detected_objects import DetectedObjects
+from change_record import ChangeRecord
 
 class LocationMarker:
+    # dateCreated and historicalImages are kept as read from DynamoDB until first accessed;
+    # listing markers rarely touches either, and a marker can carry hundreds of images
+    __slots__ = ("_marker_id", "_coordinate", "_name", "_status", "_date_created", "_date_created_raw",
+                 "_subscribed_emails", "_current_image", "_historical_images", "_historical_images_raw",
+                 "_detected_objects", "_last_change", "_version", "_updated_at", "_recent_hashes",
+                 "_unchanged_captures", "_last_capture_date")
+
+    # Attributes needed to render a marker on the map, used by the summary view
+    SUMMARY_ATTRIBUTES = ("markerId", "name", "coordinate", "status", "currentImage")
+
+    # Geohash precision stored on the marker, and the prefix length used as the
+    # partition key of the geohash index (the full geohash is its sort key)
+    GEOHASH_PRECISION = 9
+    GEOHASH_PREFIX_LENGTH = 2
+
+    # Number of partitions of the sync index (partition key syncPartition, sort key updatedAt);
+    # markers are spread over them by a hash of markerId so writes do not all hit one partition
+    SYNC_PARTITIONS = 4
+
     def __init__(self, coordinate: Coordinate, name: str = "name me", status: str = "created",
                  subscribed_emails: List[str] = None, current_image: Image = None,
                  historical_images: List[Image] = None, detected_objects: List[DetectedObjects] = None):
@@ -24,10 +45,20 @@ class LocationMarker:
         self._name = name
         self._status = status
         self._date_created = datetime.now()  # Set to current date and time
+        self._date_created_raw = None
         self._subscribed_emails = subscribed_emails or []
         self._current_image = current_image
         self._historical_images = historical_images or []
+        self._historical_images_raw = None
         self._detected_objects = detected_objects or []
+        self._last_change = None  # Set by change detection when a new image is compared
+        self._version = 0  # Incremented by Data Service on every write; 0 means never stored
+        self._updated_at = None  # Set by Data Service on every write
+        # Maintained by capture dedup: perceptual hashes of the latest stored images, and the
+        # captures skipped as unchanged since the current image
+        self._recent_hashes = []
+        self._unchanged_captures = 0
+        self._last_capture_date = None
 
     # Getters and Setters
     def get_name(self):
@@ -61,10 +92,13 @@ class LocationMarker:
         return self._current_image
 
     def get_historical_images(self) -> List[Image]:
+        if self._historical_images is None:
+            self._historical_images = [Image.from_json(img) for img in self._historical_images_raw]
+            self._historical_images_raw = None
         return self._historical_images
 
     def add_image_to_history(self, image: Image):
-        self._historical_images.append(image)
+        self.get_historical_images().append(image)
 
     def add_detected_objects(self, detected_objects: DetectedObjects):
         self._detected_objects.append(detected_objects)
@@ -72,11 +106,53 @@ class LocationMarker:
     def get_detected_objects(self) -> List[DetectedObjects]:
         return self._detected_objects
 
+    def get_last_change(self) -> Optional[ChangeRecord]:
+        return self._last_change
+
+    def set_last_change(self, last_change: Optional[ChangeRecord]):
+        self._last_change = last_change
+
+    def get_version(self) -> int:
+        return self._version
+
+    def set_version(self, version: int):
+        self._version = version
+
+    def get_updated_at(self) -> Optional[str]:
+        return self._updated_at
+
+    def set_updated_at(self, updated_at: str):
+        self._updated_at = updated_at
+
+    def get_recent_hashes(self) -> List[str]:
+        return self._recent_hashes
+
+    def set_recent_hashes(self, recent_hashes: List[str]):
+        self._recent_hashes = recent_hashes
+
+    def get_unchanged_captures(self) -> int:
+        return self._unchanged_captures
+
+    def set_unchanged_captures(self, unchanged_captures: int):
+        self._unchanged_captures = unchanged_captures
+
+    def get_last_capture_date(self) -> Optional[str]:
+        return self._last_capture_date
+
+    def set_last_capture_date(self, last_capture_date: Optional[str]):
+        self._last_capture_date = last_capture_date
+
+    def get_coordinate(self) -> Coordinate:
+        return self._coordinate
+
     def get_date_created(self) -> datetime:
+        if self._date_created is None:
+            self._date_created = datetime.fromisoformat(self._date_created_raw)
         return self._date_created
     
     def set_date_created(self,date_created:datetime):
         self._date_created = date_created
+        self._date_created_raw = None
 
     # JSON Serialization
     def to_json(self) -> Dict[str, any]:
@@ -85,16 +161,50 @@ class LocationMarker:
         
         :return: Dictionary with LocationMarker details.
         """
-        return {
+        data = {
             "markerId": self._marker_id,
             "name": self._name,
             "subscribedEmails": self._subscribed_emails,
             "coordinate": self._coordinate.to_json(),
             "status": self._status,
-            "dateCreated": self._date_created.isoformat(),
+            "dateCreated": self._date_created_raw or self._date_created.isoformat(),
             "currentImage": self._current_image.to_json() if self._current_image else None,
-            "historicalImages": [image.to_json() for image in self._historical_images],
-            "detectedObjects": [obj.to_json() for obj in self._detected_objects]
+            "historicalImages": ([image.to_json() for image in self._historical_images]
+                                 if self._historical_images is not None
+                                 else [Image.normalize_json(img) for img in self._historical_images_raw]),
+            "detectedObjects": [obj.to_json() for obj in self._detected_objects],
+            "lastChange": self._last_change.to_json() if self._last_change else None,
+            "recentHashes": self._recent_hashes,
+            "unchangedCaptures": self._unchanged_captures,
+            "lastCaptureDate": self._last_capture_date,
+            "version": self._version
+        }
+        # Index keys are omitted rather than null so markers without a valid
+        # coordinate are simply left out of the geohash index
+        location_hash = self._coordinate.get_geohash(self.GEOHASH_PRECISION)
+        if location_hash:
+            data["geohash"] = location_hash
+            data["geohashPrefix"] = location_hash[:self.GEOHASH_PREFIX_LENGTH]
+        # Likewise the sync index keys, which markers get once they have been written
+        if self._updated_at:
+            data["updatedAt"] = self._updated_at
+        if self._marker_id:
+            data["syncPartition"] = self.sync_partition(self._marker_id)
+        return data
+
+    def to_summary_json(self) -> Dict[str, any]:
+        """
+        Converts the LocationMarker instance to a slim JSON-compatible dictionary
+        containing only the SUMMARY_ATTRIBUTES.
+        
+        :return: Dictionary with the LocationMarker summary.
+        """
+        return {
+            "markerId": self._marker_id,
+            "name": self._name,
+            "coordinate": self._coordinate.to_json(),
+            "status": self._status,
+            "currentImage": self._current_image.to_json() if self._current_image else None
         }
 
     @classmethod
@@ -105,21 +215,92 @@ class LocationMarker:
         :param data: Dictionary with LocationMarker details.
         :return: A new LocationMarker instance.
         """
-        # Initialize the instance with data converted from JSON
-        instance = cls(
-            name=data.get("name", None),
-            coordinate=Coordinate.from_json(data.get("coordinate", {})),
-            status=data.get("status", "created"),
-            subscribed_emails=data.get("subscribedEmails", []),
-            current_image=Image.from_json(data.get("currentImage")) if data.get("currentImage") else None,
-            historical_images=[Image.from_json(img) for img in data.get("historicalImages", [])],
-            detected_objects=[DetectedObjects.from_json(obj) for obj in data.get("detectedObjects", [])]
-        )
-        # Set the marker ID and creation date
-        instance.set_marker_id(data.get("markerId"))
-        instance._date_created = datetime.fromisoformat(data["dateCreated"]) if "dateCreated" in data else datetime.now()
+        # Fill the slots in a single pass over the item, bypassing __init__
+        get = data.get
+        current_image = get("currentImage")
+        date_created = get("dateCreated")
+        instance = cls.__new__(cls)
+        instance._marker_id = get("markerId")
+        instance._name = get("name", None)
+        instance._coordinate = Coordinate.from_json(get("coordinate", {}))
+        instance._status = get("status", "created")
+        instance._subscribed_emails = get("subscribedEmails", [])
+        instance._current_image = Image.from_json(current_image) if current_image else None
+        # Parsed on first access, see __slots__
+        instance._historical_images = None
+        instance._historical_images_raw = get("historicalImages") or []
+        instance._date_created = None if date_created else datetime.now()
+        instance._date_created_raw = date_created or None
+        instance._detected_objects = [DetectedObjects.from_json(obj) for obj in get("detectedObjects", [])]
+        instance._last_change = ChangeRecord.from_json(get("lastChange")) if get("lastChange") else None
+        instance._version = int(get("version", 0))  # DynamoDB returns numbers as Decimal
+        instance._updated_at = get("updatedAt")
+        instance._recent_hashes = list(get("recentHashes") or [])
+        instance._unchanged_captures = int(get("unchangedCaptures", 0))
+        instance._last_capture_date = get("lastCaptureDate")
         return instance
 
+    @classmethod
+    def normalize_json(cls, data: Dict[str, any], summary: bool = False) -> Dict[str, any]:
+        """
+        Returns the dictionary from_json(data).to_json() (or to_summary_json() when summary is True)
+        would produce, in a single pass over the item and without building the marker, its
+        coordinate or its images. Used by read paths that only serialize the marker.
+        
+        :param data: Dictionary with LocationMarker details, e.g. a DynamoDB item.
+        :param summary: If True, only the SUMMARY_ATTRIBUTES are returned.
+        :return: JSON-compatible dictionary with LocationMarker details.
+        """
+        get = data.get
+        current_image = get("currentImage")
+        coordinate = Coordinate.normalize_json(get("coordinate", {}))
+        current_image = Image.normalize_json(current_image) if current_image else None
+        if summary:
+            return {
+                "markerId": get("markerId"),
+                "name": get("name", None),
+                "coordinate": coordinate,
+                "status": get("status", "created"),
+                "currentImage": current_image
+            }
+
+        normalized = {
+            "markerId": get("markerId"),
+            "name": get("name", None),
+            "subscribedEmails": list(get("subscribedEmails", [])),
+            "coordinate": coordinate,
+            "status": get("status", "created"),
+            "dateCreated": get("dateCreated") or datetime.now().isoformat(),
+            "currentImage": current_image,
+            "historicalImages": [Image.normalize_json(img) for img in get("historicalImages") or []],
+            "detectedObjects": [DetectedObjects.normalize_json(obj) for obj in get("detectedObjects", [])],
+            "lastChange": ChangeRecord.normalize_json(get("lastChange")) if get("lastChange") else None,
+            "recentHashes": list(get("recentHashes") or []),
+            "unchangedCaptures": int(get("unchangedCaptures", 0)),
+            "lastCaptureDate": get("lastCaptureDate"),
+            "version": int(get("version", 0))  # DynamoDB returns numbers as Decimal
+        }
+        # Stored index keys are passed through; older items without them get them computed
+        location_hash = get("geohash") or Coordinate.from_json(coordinate).get_geohash(cls.GEOHASH_PRECISION)
+        if location_hash:
+            normalized["geohash"] = location_hash
+            normalized["geohashPrefix"] = location_hash[:cls.GEOHASH_PREFIX_LENGTH]
+        if get("updatedAt"):
+            normalized["updatedAt"] = get("updatedAt")
+        if normalized["markerId"]:
+            normalized["syncPartition"] = get("syncPartition") or cls.sync_partition(normalized["markerId"])
+        return normalized
+
+    @classmethod
+    def sync_partition(cls, marker_id: str) -> str:
+        """
+        Returns the sync index partition of a marker.
+
+        :param marker_id: Unique identifier for the marker.
+        :return: Partition number between 0 and SYNC_PARTITIONS - 1, as a string.
+        """
+        return str(int(hashlib.md5(marker_id.encode('utf-8')).hexdigest(), 16) % cls.SYNC_PARTITIONS)
+
     def __repr__(self) -> str:
         """
         Returns a string representation of the LocationMarker instance.
@@ -129,8 +310,12 @@ class LocationMarker:
         return (f"LocationMarker(marker_id='{self._marker_id}', "
                 f"coordinate={self._coordinate}, "
                 f"status='{self._status}', "
-                f"date_created={self._date_created}, "
+                f"date_created={self.get_date_created()}, "
+                f"version={self._version}, "
+                f"updated_at={self._updated_at}, "
                 f"subscribed_emails={self._subscribed_emails}, "
                 f"current_image={self._current_image}, "
-                f"historical_images={self._historical_images}, "
-                f"detected_objects={self._detected_objects})")
+                f"historical_images={self.get_historical_images()}, "
+                f"detected_objects={self._detected_objects}, "
+                f"last_change={self._last_change}, "
+                f"unchanged_captures={self._unchanged_captures})")
@@ -0,0 +1,161 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# Default bounds of a marker cache; see MarkerCache
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL_SECONDS = 300.0
+# Checking a version is a GetItem like any other: the projection trims the response, but the read
+# is billed on the size of the whole item. Within this window hits are free, at the price of
+# serving a marker written by another container up to this late.
+DEFAULT_STALE_SECONDS = 5.0
+
+
+class MarkerCache:
+    """
+    Bounded LRU cache of marker items, kept for the lifetime of a warm Lambda container.
+
+    An entry younger than `stale_seconds` (since it was fetched or last validated) is served
+    as is, so a write made by another container may take that long to show. An older one is
+    only served after its version has been checked against the table, which saves the
+    transfer of the item but not the read capacity, and an entry older than `ttl_seconds` is
+    dropped and fetched again. Writes made through this container invalidate their entries
+    at once. DataService performs
+    the fetching and validation; this class only stores entries and counts what happens.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 stale_seconds: float = DEFAULT_STALE_SECONDS, clock=time.monotonic):
+        """
+        :param max_entries: Maximum number of markers kept; the least recently used is evicted first.
+        :param ttl_seconds: Maximum age of an entry before it is fetched again.
+        :param stale_seconds: Window after a fetch or validation in which the entry is served
+                              without checking its version (0 always checks).
+        :param clock: Monotonic time source, in seconds.
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._clock = clock
+        self._entries = OrderedDict()  # markerId -> [item, version, fetched_at, validated_at]
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(("hits", "stale_hits", "misses", "validations", "evictions",
+                                        "expirations", "invalidations"), 0)
+
+    def _count(self, counter: str):
+        self._counters[counter] += 1
+
+    def lookup(self, marker_id: str) -> Optional[tuple]:
+        """
+        Look up a marker.
+
+        :param marker_id: Unique identifier for the marker.
+        :return: None on a miss, otherwise a tuple of (item, version, needs_validation).
+                 When needs_validation is True the caller must read the marker's current
+                 version and pass it to validated() before serving the item.
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(marker_id)
+            if entry is None:
+                self._count("misses")
+                return None
+            item, version, fetched_at, validated_at = entry
+            if now - fetched_at >= self.ttl_seconds:
+                del self._entries[marker_id]
+                self._count("expirations")
+                self._count("misses")
+                return None
+            self._entries.move_to_end(marker_id)
+            if now - validated_at < self.stale_seconds:
+                self._count("stale_hits")
+                return item, version, False
+            return item, version, True
+
+    def validated(self, marker_id: str, current_version: Optional[int]) -> bool:
+        """
+        Record the result of checking an entry's version against the table.
+
+        :param marker_id: Unique identifier for the marker.
+        :param current_version: Version currently stored in the table, or None if the marker is gone.
+        :return: True if the entry is still current and may be served (a hit); False if it
+                 was outdated and has been dropped (a miss).
+        """
+        now = self._clock()
+        with self._lock:
+            self._count("validations")
+            entry = self._entries.get(marker_id)
+            if entry is not None and entry[1] == current_version:
+                entry[3] = now
+                self._count("hits")
+                return True
+            if entry is not None:
+                del self._entries[marker_id]
+            self._count("misses")
+            return False
+
+    def store(self, marker_id: str, item: dict, version: int):
+        """
+        Cache a freshly read item, evicting the least recently used entries beyond max_entries.
+        """
+        now = self._clock()
+        with self._lock:
+            self._entries[marker_id] = [item, version, now, now]
+            self._entries.move_to_end(marker_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._count("evictions")
+
+    def invalidate(self, marker_id: str):
+        """
+        Drop a marker after it has been written or deleted.
+        """
+        with self._lock:
+            if self._entries.pop(marker_id, None) is not None:
+                self._count("invalidations")
+
+    def clear(self):
+        """
+        Drop every entry; counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the cache counters and current size.
+
+        :return: Dictionary of hits, stale_hits, misses, validations, evictions, expirations,
+                 invalidations and size.
+        """
+        with self._lock:
+            return dict(self._counters, size=len(self._entries))
+
+
+# Caches shared by every DataService of the container, one per table
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(table_name: str, **cache_kwargs) -> MarkerCache:
+    """
+    Returns the container-wide cache of a table, creating it with `cache_kwargs` on first call.
+
+    :param table_name: Name of the marker table.
+    :return: The table's MarkerCache.
+    """
+    with _caches_lock:
+        if table_name not in _caches:
+            _caches[table_name] = MarkerCache(**cache_kwargs)
+        return _caches[table_name]
+
+
+def existing_cache(table_name: str) -> Optional[MarkerCache]:
+    """
+    Returns the container-wide cache of a table if one has been created, without creating it.
+    Writers use this to invalidate entries cached by readers in the same container.
+    """
+    return _caches.get(table_name)
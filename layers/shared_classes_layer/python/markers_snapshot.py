@@ -0,0 +1,131 @@
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional
+
+from attribute_decoder import decode_item
+from data_service import sync_token
+from location_marker import LocationMarker
+from snapshot_store import SnapshotConflictError, SnapshotStore
+
+# Attempts at applying a batch before giving up on concurrent writers
+MAX_WRITE_ATTEMPTS = 5
+
+# The snapshot's sync token is this far behind the time it was written, to cover stream
+# records of other shards still waiting to be applied; keep the stream consumer's
+# IteratorAge below it
+SYNC_TOKEN_MARGIN_SECONDS = 300
+
+
+def snapshot_entry(item: dict) -> dict:
+    """
+    Returns the snapshot entry of a marker item: its summary, plus the version used to
+    discard stream records that arrive out of order.
+
+    :param item: A marker item (decoded, not in wire format).
+    :return: JSON-compatible dictionary.
+    """
+    entry = LocationMarker.normalize_json(item, summary=True)
+    entry["version"] = int(item.get("version", 0))
+    return entry
+
+
+def _summary(entry: dict) -> dict:
+    return {name: value for name, value in entry.items() if name != "version"}
+
+
+def encode(markers: Dict[str, dict]) -> bytes:
+    """
+    Serializes snapshot entries into the body served by GET /markers?view=summary
+    ({"markers": [...], "nextToken": null, "syncToken"}), gzip-compressed. Clients load the
+    markers, then call GET /markers/changes with syncToken to catch up from there; changes
+    already in the snapshot are returned again, which is harmless.
+
+    :param markers: Snapshot entries keyed by markerId.
+    :return: The compressed body.
+    """
+    now = datetime.now(timezone.utc)
+    body = {
+        "markers": [markers[marker_id] for marker_id in sorted(markers)],
+        "nextToken": None,
+        "generatedAt": now.isoformat(),
+        "syncToken": sync_token(now - timedelta(seconds=SYNC_TOKEN_MARGIN_SECONDS)),
+    }
+    return gzip.compress(json.dumps(body, separators=(',', ':')).encode('utf-8'), mtime=0)
+
+
+def decode(body: bytes) -> Dict[str, dict]:
+    """
+    Parses a snapshot body produced by encode().
+
+    :return: Snapshot entries keyed by markerId.
+    """
+    return {entry["markerId"]: entry for entry in json.loads(gzip.decompress(body))["markers"]}
+
+
+def apply_records(markers: Dict[str, dict], records: Iterable[dict]) -> bool:
+    """
+    Applies DynamoDB stream records of the marker table to snapshot entries in place.
+    INSERT and MODIFY records need the NEW_IMAGE (or NEW_AND_OLD_IMAGES) stream view.
+    A record older than the entry it would replace (by version) is ignored, so records
+    already reflected by a rebuild of the snapshot are harmless. Tombstones and REMOVE
+    records (tombstones expiring, or items deleted outright) drop the entry. Only the
+    summary attributes count as a change: a write that leaves them as they were (a change
+    record, a pyramid, a detection) moves the entry's version in memory but does not by
+    itself cause the snapshot to be rewritten.
+
+    :param markers: Snapshot entries keyed by markerId.
+    :param records: Records of a stream event (event["Records"]).
+    :return: True if any entry changed.
+    """
+    changed = False
+    for record in records:
+        stream_record = record["dynamodb"]
+        marker_id = decode_item(stream_record["Keys"])["markerId"]
+        new_image = decode_item(stream_record["NewImage"]) if record["eventName"] != "REMOVE" else None
+        # Deleted markers are overwritten with a tombstone (see DataService.delete_marker)
+        if new_image is None or new_image.get("deleted"):
+            changed = markers.pop(marker_id, None) is not None or changed
+            continue
+
+        entry = snapshot_entry(new_image)
+        current = markers.get(marker_id)
+        if current is not None and current.get("version", 0) > entry["version"]:
+            continue
+        if current is not None and _summary(current) == _summary(entry):
+            current["version"] = entry["version"]
+            continue
+        markers[marker_id] = entry
+        changed = True
+    return changed
+
+
+def update(store: SnapshotStore, records: List[dict],
+           rebuild: Optional[Callable[[], Iterable[dict]]] = None) -> bool:
+    """
+    Applies a batch of stream records to the stored snapshot, retrying on concurrent writes.
+
+    :param store: Where the snapshot lives.
+    :param records: Records of a stream event.
+    :param rebuild: Returns every marker item; called to seed the snapshot when none exists yet.
+                    Without it a missing snapshot is started empty.
+    :return: True if the snapshot was written.
+    :raises SnapshotConflictError: If every attempt lost to a concurrent writer.
+    """
+    for _ in range(MAX_WRITE_ATTEMPTS):
+        body, etag = store.read()
+        if body is not None:
+            markers = decode(body)
+        else:
+            markers = {}
+            for item in (rebuild() if rebuild else []):
+                markers[item["markerId"]] = snapshot_entry(item)
+
+        if not apply_records(markers, records) and body is not None:
+            return False
+        try:
+            store.write(encode(markers), if_match=etag)
+            return True
+        except SnapshotConflictError:
+            continue
+    raise SnapshotConflictError(f"Snapshot not written after {MAX_WRITE_ATTEMPTS} attempts")
@@ -0,0 +1,168 @@
+import hashlib
+import os
+import threading
+from typing import Optional, Tuple
+
+import aws_clients
+
+
+class SnapshotConflictError(Exception):
+    """Raised when a conditional snapshot write loses to a concurrent writer."""
+
+
+class SnapshotStore:
+    """
+    Storage for one pre-serialized snapshot object, read and written whole with
+    ETag-conditional operations so that concurrent writers cannot overwrite each other.
+    """
+
+    def read(self, if_none_match: Optional[str] = None) -> Tuple[Optional[bytes], Optional[str]]:
+        """
+        Read the snapshot.
+
+        :param if_none_match: ETag of a copy the caller already holds.
+        :return: A tuple of (body, etag). body is None if there is no snapshot (etag is then
+                 None too) or if it still matches if_none_match.
+        """
+        raise NotImplementedError
+
+    def write(self, body: bytes, if_match: Optional[str]) -> str:
+        """
+        Replace the snapshot.
+
+        :param body: The new snapshot, gzip-compressed JSON.
+        :param if_match: ETag the snapshot must still have, or None if it must not exist yet.
+        :return: The ETag of the new snapshot.
+        :raises SnapshotConflictError: If the snapshot changed (or was created) in the meantime.
+        """
+        raise NotImplementedError
+
+    def presigned_url(self, expires_in: int) -> Optional[str]:
+        """
+        Returns a time-limited URL clients can download the snapshot from, or None if the
+        store cannot serve it directly.
+        """
+        return None
+
+
+class S3SnapshotStore(SnapshotStore):
+    """
+    Snapshot stored as a single S3 object, using S3 conditional reads and writes. Conditional
+    writes (IfMatch/IfNoneMatch on PutObject) need botocore 1.35 or later, newer than the one
+    bundled with the Lambda Python 3.8 runtime. With an older client the ETag is checked
+    with a HeadObject just before an unconditional put instead, which is only safe with a
+    single writer: the snapshot stream function runs with a reserved concurrency of 1.
+    """
+
+    def __init__(self, bucket: str, key: str, s3_client=None):
+        """
+        :param bucket: Name of the bucket holding the snapshot.
+        :param key: Object key of the snapshot.
+        :param s3_client: Optional S3 client for dependency injection; defaults to the container-wide one.
+        """
+        self.bucket = bucket
+        self.key = key
+        self._s3_client = s3_client
+
+    @property
+    def s3(self):
+        if self._s3_client is None:
+            self._s3_client = aws_clients.get_s3_client()
+        return self._s3_client
+
+    def read(self, if_none_match: Optional[str] = None) -> Tuple[Optional[bytes], Optional[str]]:
+        get_kwargs = {'Bucket': self.bucket, 'Key': self.key}
+        if if_none_match:
+            get_kwargs['IfNoneMatch'] = if_none_match
+        try:
+            response = self.s3.get_object(**get_kwargs)
+        except Exception as e:
+            code = aws_clients.error_code(e)
+            if code in ('304', 'NotModified'):
+                return None, if_none_match
+            if code in ('NoSuchKey', '404'):
+                return None, None
+            raise
+        return response['Body'].read(), response['ETag']
+
+    @property
+    def conditional_writes(self) -> bool:
+        """Whether the S3 client supports conditional PutObject."""
+        members = self.s3.meta.service_model.operation_model('PutObject').input_shape.members
+        return 'IfMatch' in members and 'IfNoneMatch' in members
+
+    def _current_etag(self) -> Optional[str]:
+        try:
+            return self.s3.head_object(Bucket=self.bucket, Key=self.key)['ETag']
+        except Exception as e:
+            if aws_clients.error_code(e) in ('NoSuchKey', '404'):
+                return None
+            raise
+
+    def write(self, body: bytes, if_match: Optional[str]) -> str:
+        put_kwargs = {
+            'Bucket': self.bucket,
+            'Key': self.key,
+            'Body': body,
+            'ContentType': 'application/json',
+            'ContentEncoding': 'gzip',
+        }
+        if not self.conditional_writes:
+            if self._current_etag() != if_match:
+                raise SnapshotConflictError(f"Snapshot s3://{self.bucket}/{self.key} changed concurrently")
+            return self.s3.put_object(**put_kwargs)['ETag']
+        if if_match:
+            put_kwargs['IfMatch'] = if_match
+        else:
+            put_kwargs['IfNoneMatch'] = '*'
+        try:
+            return self.s3.put_object(**put_kwargs)['ETag']
+        except Exception as e:
+            if aws_clients.error_code(e) in ('PreconditionFailed', 'ConditionalRequestConflict', '412'):
+                raise SnapshotConflictError(f"Snapshot s3://{self.bucket}/{self.key} changed concurrently") from e
+            raise
+
+    def presigned_url(self, expires_in: int) -> Optional[str]:
+        return self.s3.generate_presigned_url('get_object', Params={'Bucket': self.bucket, 'Key': self.key},
+                                              ExpiresIn=expires_in)
+
+
+class FileSnapshotStore(SnapshotStore):
+    """Snapshot stored as a local file, for tests and local runs; the ETag is the MD5 of the body."""
+
+    def __init__(self, path: str):
+        """
+        :param path: Path of the snapshot file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _etag(body: bytes) -> str:
+        return '"' + hashlib.md5(body).hexdigest() + '"'
+
+    def _read(self) -> Tuple[Optional[bytes], Optional[str]]:
+        try:
+            with open(self.path, 'rb') as file:
+                body = file.read()
+        except FileNotFoundError:
+            return None, None
+        return body, self._etag(body)
+
+    def read(self, if_none_match: Optional[str] = None) -> Tuple[Optional[bytes], Optional[str]]:
+        body, etag = self._read()
+        if etag is not None and etag == if_none_match:
+            return None, etag
+        return body, etag
+
+    def write(self, body: bytes, if_match: Optional[str]) -> str:
+        with self._lock:
+            _, etag = self._read()
+            if etag != if_match:
+                raise SnapshotConflictError(f"Snapshot {self.path} changed concurrently")
+            # Written to a temporary file and renamed, so readers never see a partial snapshot
+            temporary_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporary_path, 'wb') as file:
+                file.write(body)
+            os.replace(temporary_path, self.path)
+        return self._etag(body)
@@ -0,0 +1,69 @@
+from attribute_decoder import decode_item
+import detection_index
+import detection_events
+
+
+def markers_with_new_image(records):
+    """
+    Select the markers whose current image changed in a batch of stream records. Writes
+    that only annotate the current image (its change record or tile pyramid) keep its
+    dateTaken, so they are not selected again.
+
+    :param records: Records of a LocationMarkers stream event with the NEW_AND_OLD_IMAGES view.
+    :return: List of the latest image of each such marker item, in stream order.
+    """
+    markers = {}
+    for record in records:
+        if record["eventName"] not in ("INSERT", "MODIFY"):
+            continue
+        new_image = decode_item(record["dynamodb"].get("NewImage", {}))
+        old_image = decode_item(record["dynamodb"].get("OldImage", {}))
+        if new_image.get("deleted") or not new_image.get("currentImage"):
+            continue
+        old_date = (old_image.get("currentImage") or {}).get("dateTaken")
+        if new_image["currentImage"].get("dateTaken") != old_date:
+            markers.pop(new_image["markerId"], None)
+            markers[new_image["markerId"]] = new_image
+    return list(markers.values())
+
+
+def apply_detection_records(data_service, records) -> dict:
+    """
+    Keep the DetectionIndex and DetectionEvents tables in step with the detections of a
+    batch of stream records. Every write that changes a marker's detectedObjects (an
+    appended detection, a replaced marker, or a deletion) is applied to the index, and each
+    appended detection is diffed with the one before it into an event. Both tables are
+    written idempotently, so retried batches are harmless.
+
+    :param data_service: DataService with the detection index and events tables configured.
+    :param records: Records of a LocationMarkers stream event with the NEW_AND_OLD_IMAGES view.
+    :return: Number of index items written and deleted, and of events written.
+    """
+    puts, deletes = {}, {}
+    events, deleted_markers = {}, set()
+    for record in records:
+        old_item = decode_item(record["dynamodb"].get("OldImage", {}))
+        new_item = decode_item(record["dynamodb"].get("NewImage", {}))
+        if old_item.get("detectedObjects") and (not new_item or new_item.get("deleted")):
+            # The marker is gone; so are its events, including any earlier in this batch
+            marker_id = old_item["markerId"]
+            deleted_markers.add(marker_id)
+            events = {key: item for key, item in events.items() if key[0] != marker_id}
+        for item in detection_events.new_events(old_item, new_item):
+            events[(item['markerId'], item['dateDetected'])] = item
+        record_puts, record_deletes = detection_index.index_changes(old_item, new_item)
+        # Later records of the batch win over earlier ones for the same key
+        for key in record_deletes:
+            index_key = (key['labelShard'], key['detectionKey'])
+            puts.pop(index_key, None)
+            deletes[index_key] = key
+        for item in record_puts:
+            index_key = (item['labelShard'], item['detectionKey'])
+            deletes.pop(index_key, None)
+            puts[index_key] = item
+
+    data_service.update_detection_index(list(puts.values()), list(deletes.values()))
+    for marker_id in deleted_markers:
+        data_service.delete_detection_events(marker_id)
+    data_service.store_detection_events(list(events.values()))
+    return {'written': len(puts), 'deleted': len(deletes), 'events': len(events)}
@@ -0,0 +1,255 @@
+import json
+import mmap
+import struct
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, Dict, Iterable, List, Optional
+from urllib.parse import quote
+
+import aws_clients
+
+# A tile pack holds every tile of an image pyramid, already encoded, in one file:
+#
+#   magic (8 bytes) | header length (uint32 LE) | JSON header | index | tile data
+#
+# The JSON header describes the pyramid: {"tileSize", "width", "height", "format", "levels":
+# [{"width", "height", "columns", "rows", "first"}, ...]}. Level 0 is the full resolution and
+# each following level halves it, down to the first level that fits in one tile. The index
+# has one (offset, length) entry per tile, entry 0 being the thumbnail and the tiles of each
+# level following from its "first" entry in row-major order. Offsets are from the start of
+# the file, so serving a tile is a single slice of the mapped file, with no decoding.
+PACK_MAGIC = b'TILEPACK'
+PACK_FORMAT_VERSION = 1
+_PREAMBLE = struct.Struct('<8sI')
+_INDEX_ENTRY = struct.Struct('<QI')
+
+# Index entry of the thumbnail
+THUMBNAIL_ENTRY = 0
+
+# Bytes read from the start of a pack when it is opened remotely: the preamble, the header, the
+# index and, for most images, the thumbnail that follows it, in a single request
+DEFAULT_PREFETCH_BYTES = 64 * 1024
+
+# Pack prefixes and tiles kept in memory by a warm container, see TilePackCache
+DEFAULT_CACHE_BYTES = 32 * 1024 * 1024
+
+
+class TileNotFoundError(Exception):
+    """Raised when a tile outside the pyramid is requested."""
+
+
+def pack_key(marker_id: str, date_taken: str) -> str:
+    """
+    Object key of the tile pack of one image of a marker.
+
+    :param marker_id: Unique identifier for the marker.
+    :param date_taken: dateTaken of the image.
+    :return: The S3 key.
+    """
+    return f"pyramids/{quote(str(marker_id), safe='')}/{quote(date_taken, safe='')}.tiles"
+
+
+def write_tile_pack(output: BinaryIO, header: dict, tiles: Iterable[bytes]) -> int:
+    """
+    Write a tile pack.
+
+    :param output: Binary file object to write to.
+    :param header: The pyramid description, without the index.
+    :param tiles: Encoded tiles in index order: the thumbnail, then each level's tiles row by row.
+    :return: Number of bytes written.
+    """
+    tiles = list(tiles)
+    header_bytes = json.dumps(dict(header, version=PACK_FORMAT_VERSION), separators=(',', ':')).encode('utf-8')
+    offset = _PREAMBLE.size + len(header_bytes) + _INDEX_ENTRY.size * len(tiles)
+    index = bytearray()
+    for tile in tiles:
+        index += _INDEX_ENTRY.pack(offset, len(tile))
+        offset += len(tile)
+
+    output.write(_PREAMBLE.pack(PACK_MAGIC, len(header_bytes)))
+    output.write(header_bytes)
+    output.write(index)
+    for tile in tiles:
+        output.write(tile)
+    return offset
+
+
+class TilePack:
+    """
+    Read-only view of a tile pack file, memory-mapped so that tiles are sliced out of the
+    page cache instead of being read and copied.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: Path of the pack file.
+        :raises ValueError: If the file is not a tile pack.
+        """
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = len(self._map)
+        try:
+            self._parse_header(path)
+        except ValueError:
+            self._map.close()
+            raise
+
+    def _parse_header(self, name: str):
+        magic, header_length = _PREAMBLE.unpack(self._read(0, _PREAMBLE.size))
+        if magic != PACK_MAGIC:
+            raise ValueError(f"{name} is not a tile pack")
+        self.header = json.loads(bytes(self._read(_PREAMBLE.size, header_length)))
+        self._index_offset = _PREAMBLE.size + header_length
+        self.levels: List[Dict[str, int]] = self.header['levels']
+
+    def _read(self, offset: int, length: int) -> memoryview:
+        return memoryview(self._map)[offset:offset + length]
+
+    def _entry(self, entry: int) -> memoryview:
+        offset, length = _INDEX_ENTRY.unpack(self._read(self._index_offset + entry * _INDEX_ENTRY.size,
+                                                        _INDEX_ENTRY.size))
+        return self._read(offset, length)
+
+    def thumbnail(self) -> memoryview:
+        """
+        :return: The encoded thumbnail.
+        """
+        return self._entry(THUMBNAIL_ENTRY)
+
+    def tile(self, level: int, column: int, row: int) -> memoryview:
+        """
+        Look up one tile.
+
+        :param level: Pyramid level, 0 being the full resolution.
+        :param column: Tile column, from the left.
+        :param row: Tile row, from the top.
+        :return: The encoded tile, as a view of the mapped file.
+        :raises TileNotFoundError: If the pyramid has no such tile.
+        """
+        if not 0 <= level < len(self.levels):
+            raise TileNotFoundError(f"Level {level} is not in the pyramid")
+        description = self.levels[level]
+        if not (0 <= column < description['columns'] and 0 <= row < description['rows']):
+            raise TileNotFoundError(f"Tile {column},{row} is not in level {level}")
+        return self._entry(description['first'] + row * description['columns'] + column)
+
+    def close(self):
+        self._map.close()
+
+
+class S3TilePack(TilePack):
+    """
+    Tile pack read from S3 with ranged GETs, so that serving a tile does not download the
+    whole pack. Opening it reads the first prefetch_bytes, which hold the header and index
+    and usually the thumbnail; each tile outside them is one more request, for its bytes
+    alone, and is kept until the pack is closed.
+    """
+
+    def __init__(self, s3_client, bucket: str, key: str, prefetch_bytes: int = DEFAULT_PREFETCH_BYTES):
+        """
+        :param s3_client: S3 client.
+        :param bucket: Name of the bucket holding the pack.
+        :param key: Object key of the pack.
+        :param prefetch_bytes: Bytes read from the start of the pack when it is opened.
+        :raises ValueError: If the object is not a tile pack.
+        """
+        self._s3 = s3_client
+        self.bucket = bucket
+        self.key = key
+        self._prefix = self._get_range(0, prefetch_bytes)
+        self._tiles: Dict[int, bytes] = {}
+        if len(self._prefix) < _PREAMBLE.size:
+            raise ValueError(f"{key} is not a tile pack")
+        header_end = _PREAMBLE.size + _PREAMBLE.unpack_from(self._prefix, 0)[1]
+        self._extend_prefix(header_end)
+        self._parse_header(key)
+        last_level = self.levels[-1]
+        entries = last_level['first'] + last_level['columns'] * last_level['rows']
+        self._extend_prefix(self._index_offset + entries * _INDEX_ENTRY.size)
+
+    @property
+    def size(self) -> int:
+        """Bytes of the pack held in memory."""
+        return len(self._prefix) + sum(len(tile) for tile in self._tiles.values())
+
+    def _get_range(self, offset: int, length: int) -> bytes:
+        response = self._s3.get_object(Bucket=self.bucket, Key=self.key, Range=f"bytes={offset}-{offset + length - 1}")
+        return response['Body'].read()
+
+    def _extend_prefix(self, end: int):
+        # Headers and indexes larger than the prefetch take one more request
+        if len(self._prefix) < end:
+            self._prefix += self._get_range(len(self._prefix), end - len(self._prefix))
+
+    def _read(self, offset: int, length: int) -> memoryview:
+        if offset + length <= len(self._prefix):
+            return memoryview(self._prefix)[offset:offset + length]
+        tile = self._tiles.get(offset)
+        if tile is None:
+            tile = self._tiles[offset] = self._get_range(offset, length)
+        return memoryview(tile)
+
+    def close(self):
+        self._tiles.clear()
+        self._prefix = b''
+
+
+class TilePackCache:
+    """
+    Tile packs opened from S3, kept for the lifetime of a warm Lambda container. Only the
+    parts of each pack that were read are held in memory, see S3TilePack. The least recently
+    used packs are closed once the bytes they hold exceed max_bytes.
+    """
+
+    def __init__(self, bucket: str, max_bytes: int = DEFAULT_CACHE_BYTES,
+                 prefetch_bytes: int = DEFAULT_PREFETCH_BYTES, s3_client=None):
+        """
+        :param bucket: Name of the bucket holding the packs.
+        :param max_bytes: Total size of the pack prefixes and tiles kept.
+        :param prefetch_bytes: Bytes read from the start of each pack when it is opened.
+        :param s3_client: Optional S3 client for dependency injection; defaults to the container-wide one.
+        """
+        self.bucket = bucket
+        self.max_bytes = max_bytes
+        self.prefetch_bytes = prefetch_bytes
+        self._s3_client = s3_client
+        self._packs = OrderedDict()  # key -> S3TilePack
+        self._lock = threading.Lock()
+
+    @property
+    def s3(self):
+        if self._s3_client is None:
+            self._s3_client = aws_clients.get_s3_client()
+        return self._s3_client
+
+    def get(self, key: str) -> Optional[TilePack]:
+        """
+        Open a pack, reading its header and index on first use.
+
+        :param key: Object key of the pack.
+        :return: The TilePack, or None if the object does not exist.
+        """
+        with self._lock:
+            pack = self._packs.get(key)
+            if pack is not None:
+                self._packs.move_to_end(key)
+                self._evict()
+                return pack
+
+        try:
+            pack = S3TilePack(self.s3, self.bucket, key, prefetch_bytes=self.prefetch_bytes)
+        except Exception as e:
+            if aws_clients.error_code(e) in ('NoSuchKey', '404', 'InvalidRange'):
+                return None
+            raise
+
+        with self._lock:
+            self._packs[key] = pack
+            self._evict()
+        return pack
+
+    def _evict(self):
+        # Tiles read since a pack was opened count too, so this runs on every get
+        while len(self._packs) > 1 and sum(entry.size for entry in self._packs.values()) > self.max_bytes:
+            _, evicted = self._packs.popitem(last=False)
+            evicted.close()
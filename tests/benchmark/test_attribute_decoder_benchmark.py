@@ -0,0 +1,56 @@
+import copy
+
+import boto3
+import pytest
+from boto3.dynamodb.transform import TransformationInjector
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+from attribute_decoder import decode_item
+from tests.benchmark.test_model_codec_benchmark import marker_item
+
+HISTORY_SIZES = (100, 1000)
+PAGE_SIZE = 10  # Items per simulated scan page
+
+
+def scan_response(history_size: int) -> dict:
+    """
+    Returns a parsed (wire format) Scan response holding PAGE_SIZE markers with
+    `history_size` historical images each.
+    """
+    serializer = TypeSerializer()
+    item = {name: serializer.serialize(value) for name, value in marker_item(history_size).items()}
+    return {'Items': [copy.deepcopy(item) for _ in range(PAGE_SIZE)], 'Count': PAGE_SIZE}
+
+
+@pytest.fixture(scope='module')
+def scan_model():
+    client = boto3.client('dynamodb', region_name='us-east-1')
+    return client.meta.service_model.operation_model('Scan')
+
+
+@pytest.mark.parametrize("history_size", HISTORY_SIZES)
+def test_resource_transform(benchmark, scan_model, history_size):
+    # What Table.scan does to a parsed response: walk the output shape and run
+    # TypeDeserializer on every attribute value
+    response = scan_response(history_size)
+    injector = TransformationInjector(deserializer=TypeDeserializer())
+    benchmark.extra_info['items'] = PAGE_SIZE
+
+    def setup():
+        return (copy.deepcopy(response),), {}
+
+    benchmark.pedantic(lambda parsed: injector.inject_attribute_value_output(parsed, scan_model),
+                       setup=setup, rounds=20)
+
+
+@pytest.mark.parametrize("history_size", HISTORY_SIZES)
+def test_attribute_decoder(benchmark, history_size):
+    response = scan_response(history_size)
+    benchmark.extra_info['items'] = PAGE_SIZE
+
+    items = benchmark(lambda: [decode_item(item) for item in response['Items']])
+
+    deserializer = TypeDeserializer()
+    expected = [{name: deserializer.deserialize(value) for name, value in item.items()}
+                for item in response['Items']]
+    assert items == expected
@@ -0,0 +1,81 @@
+import io
+import time
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import capture_dedup
+import change_detection
+import image_pyramid
+from image import Image
+
+from tests.local_dynamodb import make_data_service
+
+FIXTURES = Path(__file__).resolve().parent.parent / "fixtures" / "images"
+FRAME_SIDE = 1024
+FRAME_COUNT = 24
+CHANGE_EVERY = 8  # A static scene with a real change every CHANGE_EVERY frames
+REQUEST_LATENCY = 0.005  # seconds per DynamoDB call
+
+
+def frames() -> dict:
+    """Returns FRAME_COUNT binary PGM captures of a static scene with sensor noise and occasional changes."""
+    scene = change_detection.load_image((FIXTURES / "scene.pgm").read_bytes())
+    scene = np.kron(scene, np.ones((FRAME_SIDE // scene.shape[0],) * 2, dtype=np.float32))
+    rng = np.random.default_rng(0)
+    captures = {}
+    for index in range(FRAME_COUNT):
+        if index and index % CHANGE_EVERY == 0:
+            top = rng.integers(0, FRAME_SIDE * 3 // 4)
+            scene = scene.copy()
+            patch = (slice(top, top + FRAME_SIDE // 4),) * 2
+            scene[patch] = 1 - scene[patch]
+        noisy = np.clip(scene + rng.normal(0, 0.02, scene.shape), 0, 1)
+        captures[f"2024-01-01T00:{index:02d}:00Z"] = (f"P5 {FRAME_SIDE} {FRAME_SIDE} 255\n".encode('ascii')
+                                                     + np.rint(noisy * 255).astype(np.uint8).tobytes())
+    return captures
+
+
+def downstream(previous: bytes, current: bytes):
+    """The stream work each stored capture triggers: change detection and the tile pyramid."""
+    if previous is not None:
+        change_detection.compare(change_detection.load_image(previous), change_detection.load_image(current))
+    image_pyramid.write_pyramid(image_pyramid.load_pixels(current), io.BytesIO())
+
+
+def ingest(captures: dict, dedup: bool) -> tuple:
+    data_service = make_data_service(1, latency=REQUEST_LATENCY)
+    stats = capture_dedup.DedupStats()
+    previous = None
+    start = time.perf_counter()
+    for date_taken, data in captures.items():
+        image = Image(date_taken, "", date_taken, "bucket")
+        if dedup:
+            stored = capture_dedup.record_capture(data_service, "marker-0", image, read_image=lambda _: data,
+                                                  dedup_stats=stats).stored
+        else:
+            data_service.append_image("marker-0", image)
+            stored = True
+        if stored:
+            downstream(previous, data)
+            previous = data
+    return time.perf_counter() - start, stats.stats(), len(data_service.get_marker("marker-0").get_historical_images())
+
+
+def test_dedup_rate_and_time_saved_on_static_scene():
+    captures = frames()
+    plain_seconds, _, plain_history = ingest(captures, dedup=False)
+    dedup_seconds, stats, dedup_history = ingest(captures, dedup=True)
+
+    print()
+    print(f"{'':>8} {'seconds':>8} {'history':>8}")
+    print(f"{'plain':>8} {plain_seconds:>8.2f} {plain_history:>8}")
+    print(f"{'dedup':>8} {dedup_seconds:>8.2f} {dedup_history:>8}")
+    print(f"dedup rate {stats['dedup_rate']:.0%}, hashing {stats['hash_seconds']:.2f} s, "
+          f"writes saved {stats['write_seconds_saved']:.3f} s, total saved {plain_seconds - dedup_seconds:.2f} s")
+
+    # Only the first frame and the real changes are stored
+    assert dedup_history == FRAME_COUNT // CHANGE_EVERY
+    assert dedup_seconds < plain_seconds
@@ -0,0 +1,68 @@
+import base64
+import json
+
+import pytest
+
+import http_response
+from location_marker import LocationMarker
+
+from tests.benchmark.test_model_codec_benchmark import marker_item
+
+CODINGS = [
+    'gzip',
+    pytest.param('br', marks=pytest.mark.skipif(http_response.brotli is None, reason="brotli is not installed")),
+]
+
+
+def full_page(marker_count: int, history_size: int) -> str:
+    """
+    Returns a GET /markers body of `marker_count` full markers with `history_size` images each.
+    """
+    markers = []
+    for i in range(marker_count):
+        item = marker_item(history_size)
+        item['markerId'] = f"marker-{i:04d}"
+        markers.append(LocationMarker.normalize_json(item))
+    return json.dumps({'markers': markers, 'nextToken': None})
+
+
+def summary_page(marker_count: int) -> str:
+    """
+    Returns a GET /markers?view=summary body of `marker_count` markers.
+    """
+    markers = []
+    for i in range(marker_count):
+        item = marker_item(1)
+        item['markerId'] = f"marker-{i:04d}"
+        markers.append(LocationMarker.normalize_json(item, summary=True))
+    return json.dumps({'markers': markers, 'nextToken': None})
+
+
+PAYLOADS = {
+    'summary_1000': lambda: summary_page(1000),
+    'full_100x10': lambda: full_page(100, 10),
+    'marker_history_1000': lambda: full_page(1, 1000),
+}
+
+
+@pytest.mark.parametrize("coding", CODINGS)
+@pytest.mark.parametrize("payload", sorted(PAYLOADS))
+def test_compression(benchmark, payload, coding):
+    body = PAYLOADS[payload]().encode('utf-8')
+    encoded = http_response.encode_body(body, coding)
+    transferred = len(base64.b64encode(encoded))  # API Gateway decodes it before sending
+    benchmark.extra_info.update(raw_bytes=len(body), encoded_bytes=len(encoded), lambda_response_bytes=transferred,
+                                ratio=round(len(body) / len(encoded), 1))
+
+    benchmark(http_response.encode_body, body, coding)
+
+    # Repeated keys and URLs compress well; even base64-encoded the response is much smaller
+    assert transferred < len(body) / 3
+
+
+def test_small_bodies_are_sent_uncompressed():
+    event = {'headers': {'Accept-Encoding': 'gzip, deflate, br', 'Accept': 'application/octet-stream'}}
+    response = http_response.compress({'statusCode': 200, 'body': summary_page(1)}, event)
+
+    assert 'isBase64Encoded' not in response
+    assert 'Content-Encoding' not in response['headers']
@@ -0,0 +1,37 @@
+import time
+
+import inference_worker
+from image import Image
+
+from tests.local_dynamodb import make_data_service
+
+IMAGE_COUNT = 96
+MARKER_COUNT = 8
+CALL_SECONDS = 0.02  # Fixed cost of a model call: transfers, kernel launches, Python overhead
+IMAGE_SECONDS = 0.002
+REQUEST_LATENCY = 0.002  # seconds per DynamoDB call
+
+
+def run(max_batch_size: int) -> tuple:
+    data_service = make_data_service(MARKER_COUNT, latency=REQUEST_LATENCY)
+    detector = inference_worker.StubDetector(call_seconds=CALL_SECONDS, image_seconds=IMAGE_SECONDS)
+    start = time.perf_counter()
+    with inference_worker.InferenceWorker(data_service, detector, max_batch_size=max_batch_size,
+                                          max_wait_seconds=0.02, processes=2) as worker:
+        for index in range(IMAGE_COUNT):
+            worker.submit(f"marker-{index % MARKER_COUNT}", Image(str(index), "", str(index), "b"),
+                          f"capture {index}".encode('ascii'))
+    return time.perf_counter() - start, worker.stats.stats()
+
+
+def test_micro_batches_raise_throughput():
+    results = {size: run(size) for size in (1, 4, 16)}
+
+    print()
+    print(f"{'batch':>6} {'seconds':>8} {'img/s':>8} {'batches':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for size, (seconds, stats) in results.items():
+        print(f"{size:>6} {seconds:>8.2f} {IMAGE_COUNT / seconds:>8.1f} {stats['batches']:>8} "
+              f"{stats['p50_latency'] * 1000:>8.0f} {stats['p95_latency'] * 1000:>8.0f}")
+
+    assert all(stats["images"] == IMAGE_COUNT for _, stats in results.values())
+    assert results[16][0] < results[1][0]
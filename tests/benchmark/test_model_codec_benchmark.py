@@ -0,0 +1,83 @@
+import tracemalloc
+
+import pytest
+
+from coordinate import Coordinate
+from image import Image
+from location_marker import LocationMarker
+
+HISTORY_SIZES = (10, 100, 1000)
+
+
+def marker_item(history_size: int) -> dict:
+    """
+    Returns a marker item as stored in DynamoDB, with `history_size` historical images.
+    """
+    marker = LocationMarker(coordinate=Coordinate(longitude="144.9631", latitude="-37.8136"), name="Flinders St")
+    marker.set_marker_id("7d1c6bac-06a2-4af2-9fb9-a8308c464f1b")
+    for i in range(history_size):
+        marker.add_image_to_history(Image(date_taken=f"2024-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}",
+                                          image_url=f"https://example.com/{i}.jpg",
+                                          s3_key=f"images/{i}.jpg", s3_bucket_name="marker-images"))
+    marker.set_current_image(marker.get_historical_images()[-1] if history_size else None)
+    return marker.to_json()
+
+
+def allocated_bytes(function, *args) -> int:
+    """
+    Returns the peak number of bytes allocated by one call of `function`.
+    """
+    tracemalloc.start()
+    try:
+        result = function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak
+
+
+def decode(item):
+    return LocationMarker.from_json(item)
+
+
+def decode_with_history(item):
+    marker = LocationMarker.from_json(item)
+    marker.get_historical_images()
+    marker.get_date_created()
+    return marker
+
+
+def round_trip(item):
+    return LocationMarker.from_json(item).to_json()
+
+
+def normalize(item):
+    return LocationMarker.normalize_json(item)
+
+
+@pytest.mark.parametrize("history_size", HISTORY_SIZES)
+@pytest.mark.parametrize("operation", [decode, decode_with_history, round_trip, normalize],
+                         ids=lambda op: op.__name__)
+def test_marker_codec(benchmark, operation, history_size):
+    item = marker_item(history_size)
+    benchmark.extra_info['objects_per_call'] = history_size + 2  # images, the marker and its coordinate
+    benchmark.extra_info['peak_bytes'] = allocated_bytes(operation, item)
+
+    benchmark(operation, item)
+
+
+@pytest.mark.parametrize("history_size", HISTORY_SIZES)
+def test_marker_encode(benchmark, history_size):
+    marker = decode_with_history(marker_item(history_size))
+    benchmark.extra_info['objects_per_call'] = history_size + 2
+    benchmark.extra_info['peak_bytes'] = allocated_bytes(marker.to_json)
+
+    benchmark(marker.to_json)
+
+
+def test_slots_models_have_no_instance_dict():
+    marker = decode_with_history(marker_item(1))
+
+    for obj in (marker, marker.get_coordinate(), marker.get_current_image()):
+        assert not hasattr(obj, '__dict__')
@@ -0,0 +1,41 @@
+import time
+
+from data_service import DataService
+from coordinate import Coordinate
+from location_marker import LocationMarker
+
+from tests.local_dynamodb import LocalDynamoDBResource
+
+MARKER_COUNT = 2000
+PAGE_SIZE = 50
+REQUEST_LATENCY = 0.01  # seconds per scan call, roughly a DynamoDB round trip
+
+
+def scan_throughput(total_segments: int) -> float:
+    resource = LocalDynamoDBResource(page_size=PAGE_SIZE, latency=0)
+    data_service = DataService(table_name='LocationMarkers', dynamodb_resource=resource)
+    for i in range(MARKER_COUNT):
+        marker = LocationMarker(coordinate=Coordinate(longitude="0", latitude="0"))
+        marker.set_marker_id(f"marker-{i}")
+        data_service.table.put_item(Item=marker.to_json())
+    data_service.table.latency = REQUEST_LATENCY
+
+    start = time.perf_counter()
+    count = sum(1 for _ in data_service.get_markers(total_segments=total_segments))
+    elapsed = time.perf_counter() - start
+
+    assert count == MARKER_COUNT
+    return count / elapsed
+
+
+def test_parallel_scan_throughput_scales_with_segments(request):
+    results = {segments: scan_throughput(segments) for segments in (1, 2, 4, 8, 16)}
+
+    print()
+    print(f"{'segments':>8} {'markers/s':>12} {'speedup':>8}")
+    for segments, throughput in results.items():
+        print(f"{segments:>8} {throughput:>12.0f} {throughput / results[1]:>7.1f}x")
+
+    # Scans are latency bound, so extra segments should overlap round trips
+    if request.config.getoption('--timing-asserts'):
+        assert results[8] > 3 * results[1]
@@ -0,0 +1,202 @@
+"""
+Local cold-start profiler for the Lambda handlers.
+
+Each handler is imported in a fresh interpreter started with `-X importtime`, the way a
+new Lambda container imports it during the init phase. For every handler the harness
+reports the init duration (module import), the cost of the first DynamoDB use (building
+the DataService table, which is where boto3 is now paid for) and the packages that
+dominate import time, then checks the numbers against budgets.json.
+
+Usage:
+    python -m tests.cold_start.harness [--budgets PATH] [--handler NAME] [--top N]
+
+Exits with status 1 if any handler exceeds its budget.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+LAMBDAS_PATH = os.path.join(REPO_ROOT, 'lambdas')
+LAYER_PATH = os.path.join(REPO_ROOT, 'layers', 'shared_classes_layer', 'python')
+DEFAULT_BUDGETS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'budgets.json')
+
+# Written to stderr between the handler import and the first DynamoDB use, so that the
+# importtime lines of the two phases can be told apart.
+_FIRST_USE_MARKER = '-- first use --'
+
+# Runs inside the child interpreter; prints its measurements as one JSON line on stdout
+# (importtime output goes to stderr).
+_PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import {module}
+init_ms = (time.perf_counter() - start) * 1000
+loaded = sorted(name for name in sys.modules)
+print({marker!r}, file=sys.stderr, flush=True)
+first_use_ms = None
+if 'data_service' in sys.modules:
+    start = time.perf_counter()
+    from data_service import DataService
+    DataService(table_name='LocationMarkers').table
+    first_use_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({{'init_ms': init_ms, 'first_use_ms': first_use_ms, 'modules': loaded}}))
+'''
+
+
+def discover_handlers() -> Dict[str, str]:
+    """
+    Returns the handler modules under lambdas/, one per function directory.
+
+    :return: Dictionary of handler directory name to its module name.
+    """
+    handlers = {}
+    for name in sorted(os.listdir(LAMBDAS_PATH)):
+        directory = os.path.join(LAMBDAS_PATH, name)
+        if not os.path.isdir(directory):
+            continue
+        modules = [file[:-3] for file in os.listdir(directory) if file.endswith('.py')]
+        if len(modules) == 1:
+            handlers[name] = modules[0]
+    return handlers
+
+
+def parse_importtime(output: str) -> List[Tuple[str, int, int]]:
+    """
+    Parses `-X importtime` output.
+
+    :param output: stderr of an interpreter started with -X importtime.
+    :return: List of (module name, self microseconds, cumulative microseconds).
+    """
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # Column header
+        entries.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return entries
+
+
+def top_packages(entries: List[Tuple[str, int, int]], count: int) -> List[Tuple[str, float]]:
+    """
+    Sums self import time by top-level package.
+
+    :return: The `count` most expensive packages as (package, milliseconds), most expensive first.
+    """
+    totals = defaultdict(int)
+    for module, self_us, _ in entries:
+        totals[module.split('.')[0]] += self_us
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+    return [(package, micros / 1000) for package, micros in ranked[:count]]
+
+
+def profile_handler(directory: str, module: str) -> dict:
+    """
+    Imports a handler in a fresh interpreter and measures it.
+
+    :param directory: Handler directory under lambdas/.
+    :param module: Handler module name.
+    :return: Dictionary with init_ms, first_use_ms, modules (loaded after init), and the parsed
+             importtime entries of each phase as imports and first_use_imports.
+    :raises RuntimeError: If the handler fails to import.
+    """
+    env = dict(os.environ)
+    env.update({
+        'PYTHONPATH': os.pathsep.join([os.path.join(LAMBDAS_PATH, directory), LAMBDAS_PATH, LAYER_PATH]),
+        'TABLE_NAME': 'LocationMarkers',
+        'HISTORY_TABLE_NAME': 'MarkerHistory',
+        'AWS_DEFAULT_REGION': env.get('AWS_DEFAULT_REGION', 'us-east-1'),
+        'PYTHONDONTWRITEBYTECODE': '1',
+    })
+    probe = _PROBE.format(module=module, marker=_FIRST_USE_MARKER)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', probe],
+                            env=env, cwd=REPO_ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Failed to import {module}: {result.stderr.strip().splitlines()[-1:]}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    init_output, _, first_use_output = result.stderr.partition(_FIRST_USE_MARKER)
+    report['imports'] = parse_importtime(init_output)
+    report['first_use_imports'] = parse_importtime(first_use_output)
+    return report
+
+
+def load_budgets(path: str = DEFAULT_BUDGETS_PATH) -> dict:
+    """
+    Loads budgets.json: a "default" budget plus optional per-handler overrides under "handlers".
+    """
+    with open(path) as file:
+        return json.load(file)
+
+
+def budget_for(budgets: dict, handler: str) -> dict:
+    """
+    Returns the effective budget of a handler, its overrides applied over the default.
+    """
+    budget = dict(budgets.get('default', {}))
+    budget.update(budgets.get('handlers', {}).get(handler, {}))
+    return budget
+
+
+def check_budget(report: dict, budget: dict) -> List[str]:
+    """
+    Compares a handler report with its budget.
+
+    :return: List of violation messages; empty if the handler is within budget.
+    """
+    violations = []
+    max_init_ms = budget.get('max_init_ms')
+    if max_init_ms is not None and report['init_ms'] > max_init_ms:
+        violations.append(f"init {report['init_ms']:.1f} ms exceeds {max_init_ms} ms")
+    max_first_use_ms = budget.get('max_first_use_ms')
+    if max_first_use_ms is not None and (report['first_use_ms'] or 0) > max_first_use_ms:
+        violations.append(f"first use {report['first_use_ms']:.1f} ms exceeds {max_first_use_ms} ms")
+    # Building the clients lazily only moves their cost to the first request, so the
+    # first request after a cold start pays init and first use together
+    max_cold_start_ms = budget.get('max_cold_start_ms')
+    cold_start_ms = report['init_ms'] + (report['first_use_ms'] or 0)
+    if max_cold_start_ms is not None and cold_start_ms > max_cold_start_ms:
+        violations.append(f"init + first use {cold_start_ms:.1f} ms exceeds {max_cold_start_ms} ms")
+    loaded = set(report['modules'])
+    for module in budget.get('forbidden_modules', []):
+        if module in loaded:
+            violations.append(f"{module} is imported during init")
+    return violations
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure Lambda handler cold starts against budgets.json")
+    parser.add_argument('--budgets', default=DEFAULT_BUDGETS_PATH, help="Path to the budgets file")
+    parser.add_argument('--handler', action='append', help="Only profile this handler (repeatable)")
+    parser.add_argument('--top', type=int, default=5, help="Number of packages to list per handler")
+    args = parser.parse_args(argv)
+
+    budgets = load_budgets(args.budgets)
+    handlers = discover_handlers()
+    if args.handler:
+        handlers = {name: handlers[name] for name in args.handler}
+
+    failed = False
+    for name, module in handlers.items():
+        report = profile_handler(name, module)
+        violations = check_budget(report, budget_for(budgets, name))
+        first_use = '-' if report['first_use_ms'] is None else f"{report['first_use_ms']:.1f} ms"
+        print(f"{name}: init {report['init_ms']:.1f} ms, first use {first_use}"
+              f"{'  FAIL' if violations else ''}")
+        for package, millis in top_packages(report['imports'], args.top):
+            print(f"    init       {package:<32} {millis:>8.1f} ms")
+        for package, millis in top_packages(report['first_use_imports'], args.top):
+            print(f"    first use  {package:<32} {millis:>8.1f} ms")
+        for violation in violations:
+            print(f"    ! {violation}")
+        failed = failed or bool(violations)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
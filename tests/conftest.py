@@ -0,0 +1,24 @@
+import os
+import sys
+
+# Lambda layers are mounted at /opt/python, so the shared classes are imported as
+# top-level modules (e.g. `from location_marker import LocationMarker`).
+LAYER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          'layers', 'shared_classes_layer', 'python')
+
+if LAYER_PATH not in sys.path:
+    sys.path.insert(0, LAYER_PATH)
+
+# Each function's handler is imported from its directory under lambdas/, as the router does
+# (e.g. `from get_marker_request import get_marker_request_lambda_function`).
+LAMBDAS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lambdas')
+
+if LAMBDAS_PATH not in sys.path:
+    sys.path.insert(1, LAMBDAS_PATH)
+
+
+def pytest_addoption(parser):
+    # Wall-clock comparisons depend on the machine and its load, so they only fail a run
+    # when asked for; otherwise the benchmarks just report their numbers
+    parser.addoption('--timing-asserts', action='store_true', default=False,
+                     help="Fail benchmarks whose measured speedups fall short of their targets")
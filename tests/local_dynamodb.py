@@ -0,0 +1,513 @@
+import copy
+import hashlib
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+_KEY_CONDITION = re.compile(r'^\s*(\S+)\s*=\s*(\S+)\s*(?:AND\s+(.+))?$', re.IGNORECASE)
+_BEGINS_WITH = re.compile(r'^begins_with\(\s*(\S+)\s*,\s*(\S+)\s*\)$', re.IGNORECASE)
+_BETWEEN = re.compile(r'^(\S+)\s+BETWEEN\s+(\S+)\s+AND\s+(\S+)$', re.IGNORECASE)
+_COMPARISON = re.compile(r'^(\S+)\s*(<=|>=|<|>|=)\s*(\S+)$')
+_IF_NOT_EXISTS = re.compile(r'^if_not_exists\(\s*(\S+)\s*,\s*(\S+)\s*\)$', re.IGNORECASE)
+_LIST_APPEND = re.compile(r'^list_append\(\s*(.+)\s*,\s*(\S+)\s*\)$', re.IGNORECASE)
+_ATTRIBUTE_FUNCTION = re.compile(r'^(attribute_exists|attribute_not_exists)\(\s*(\S+)\s*\)$', re.IGNORECASE)
+
+_OPERATORS = {
+    '=': lambda a, b: a == b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+}
+
+
+class LocalTable:
+    """
+    In-memory stand-in for a boto3 DynamoDB Table resource.
+
+    It implements the subset of the Table API used by DataService and simulates
+    the behaviour that matters for read performance: a fixed per-request latency
+    and a bounded page size, with items assigned to scan segments by key hash.
+    """
+
+    def __init__(self, partition_key: str = 'markerId', sort_key: str = None, indexes: dict = None,
+                 page_size: int = 100, latency: float = 0.0):
+        """
+        :param partition_key: Name of the partition key attribute.
+        :param sort_key: Name of the sort key attribute, if the table has one.
+        :param indexes: Global secondary indexes as {index_name: (partition_key, sort_key)}.
+        :param page_size: Maximum number of items returned by one call (stands in for the 1 MB limit).
+        :param latency: Simulated round-trip latency of every request, in seconds.
+        """
+        self.name = None
+        self.partition_key = partition_key
+        self.sort_key = sort_key
+        self.indexes = indexes or {}
+        self.page_size = page_size
+        self.latency = latency
+        self.request_count = 0
+        self._items = {}
+        self._segments = {}
+        self._lock = threading.Lock()
+
+    def _request(self):
+        with self._lock:
+            self.request_count += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    @staticmethod
+    def _hash(key) -> int:
+        return int(hashlib.md5(str(key).encode('utf-8')).hexdigest(), 16)
+
+    def _key_names(self) -> tuple:
+        return (self.partition_key, self.sort_key) if self.sort_key else (self.partition_key,)
+
+    def _key(self, item: dict) -> tuple:
+        return tuple(item[name] for name in self._key_names())
+
+    def _key_dict(self, key: tuple) -> dict:
+        return dict(zip(self._key_names(), key))
+
+    @staticmethod
+    def _project(item: dict, projection_expression: str, attribute_names: dict) -> dict:
+        names = [attribute_names.get(token.strip(), token.strip()) for token in projection_expression.split(',')]
+        return {name: item[name] for name in names if name in item}
+
+    def _page(self, keys: list, limit: int, projection: str, attribute_names: dict,
+              last_key) -> dict:
+        page_size = min(limit, self.page_size) if limit else self.page_size
+        page = keys[:page_size]
+        items = [copy.deepcopy(self._items[entry[-1]]) for entry in page]
+        if projection:
+            items = [self._project(item, projection, attribute_names or {}) for item in items]
+        response = {'Items': items, 'Count': len(items)}
+        if len(keys) > page_size:
+            response['LastEvaluatedKey'] = last_key(self._items[page[-1][-1]])
+        return response
+
+    def put_item(self, Item: dict, ConditionExpression: str = None, ExpressionAttributeNames: dict = None,
+                 ExpressionAttributeValues: dict = None, ReturnValuesOnConditionCheckFailure: str = 'NONE', **kwargs):
+        self._request()
+        if ConditionExpression:
+            _check_condition(self._items.get(self._key(Item)), ConditionExpression, ExpressionAttributeNames or {},
+                             ExpressionAttributeValues or {}, ReturnValuesOnConditionCheckFailure)
+        self._items[self._key(Item)] = copy.deepcopy(Item)
+        self._segments.clear()
+        return {}
+
+    def get_item(self, Key: dict, ProjectionExpression: str = None, ExpressionAttributeNames: dict = None, **kwargs):
+        self._request()
+        item = self._items.get(self._key(Key))
+        if item is None:
+            return {}
+        item = copy.deepcopy(item)
+        if ProjectionExpression:
+            item = self._project(item, ProjectionExpression, ExpressionAttributeNames or {})
+        return {'Item': item}
+
+    def update_item(self, **kwargs):
+        return _update_item(self, **kwargs)
+
+    def delete_item(self, Key: dict, **kwargs):
+        self._request()
+        self._items.pop(self._key(Key), None)
+        self._segments.clear()
+        return {}
+
+    def batch_writer(self, overwrite_by_pkeys: list = None):
+        return _LocalBatchWriter(self)
+
+    def scan(self, Segment: int = 0, TotalSegments: int = 1, Limit: int = None,
+             ExclusiveStartKey: dict = None, ProjectionExpression: str = None,
+             ExpressionAttributeNames: dict = None, **kwargs):
+        self._request()
+        segment_key = (Segment, TotalSegments)
+        if segment_key not in self._segments:
+            self._segments[segment_key] = sorted(
+                (self._hash(key[0]), key) for key in self._items
+                if self._hash(key[0]) % TotalSegments == Segment
+            )
+        keys = self._segments[segment_key]
+        if ExclusiveStartKey:
+            start_key = self._key(ExclusiveStartKey)
+            start = (self._hash(start_key[0]), start_key)
+            keys = [entry for entry in keys if entry > start]
+
+        return self._page(keys, Limit, ProjectionExpression, ExpressionAttributeNames,
+                          lambda item: self._key_dict(self._key(item)))
+
+    def query(self, KeyConditionExpression: str, ExpressionAttributeValues: dict,
+              ExpressionAttributeNames: dict = None, IndexName: str = None, ScanIndexForward: bool = True,
+              Limit: int = None, ExclusiveStartKey: dict = None, ProjectionExpression: str = None, **kwargs):
+        self._request()
+        names = ExpressionAttributeNames or {}
+        partition_key, sort_key = self.indexes[IndexName] if IndexName else (self.partition_key, self.sort_key)
+
+        def name(token):
+            return names.get(token, token)
+
+        def value(token):
+            return ExpressionAttributeValues[token]
+
+        match = _KEY_CONDITION.match(KeyConditionExpression)
+        if not match or name(match.group(1)) != partition_key:
+            raise ValueError(f"Unsupported KeyConditionExpression: {KeyConditionExpression}")
+        partition_value = value(match.group(2))
+        sort_condition = lambda item: True
+        if match.group(3):
+            condition = match.group(3).strip()
+            if _BEGINS_WITH.match(condition):
+                _, prefix = _BEGINS_WITH.match(condition).groups()
+                sort_condition = lambda item: str(item[sort_key]).startswith(value(prefix))
+            elif _BETWEEN.match(condition):
+                _, low, high = _BETWEEN.match(condition).groups()
+                sort_condition = lambda item: value(low) <= item[sort_key] <= value(high)
+            elif _COMPARISON.match(condition):
+                _, operator, operand = _COMPARISON.match(condition).groups()
+                sort_condition = lambda item: _OPERATORS[operator](item[sort_key], value(operand))
+            else:
+                raise ValueError(f"Unsupported KeyConditionExpression: {KeyConditionExpression}")
+
+        def order(item):
+            return (item[sort_key] if sort_key else 0, self._key(item))
+
+        matches = [item for item in self._items.values()
+                   if item.get(partition_key) == partition_value
+                   and (not sort_key or sort_key in item) and sort_condition(item)]
+        keys = sorted(((order(item), self._key(item)) for item in matches), reverse=not ScanIndexForward)
+        if ExclusiveStartKey:
+            start = (order(self._items[self._key(ExclusiveStartKey)]), self._key(ExclusiveStartKey))
+            keys = [entry for entry in keys if (entry > start if ScanIndexForward else entry < start)]
+
+        def last_key(item):
+            key = self._key_dict(self._key(item))
+            key[partition_key] = item[partition_key]
+            if sort_key:
+                key[sort_key] = item[sort_key]
+            return key
+
+        return self._page(keys, Limit, ProjectionExpression, names, last_key)
+
+
+class LocalConditionalCheckFailed(Exception):
+    """Stand-in for botocore's ClientError with a ConditionalCheckFailedException code."""
+
+    def __init__(self, item: dict = None):
+        super().__init__("The conditional request failed")
+        self.response = {'Error': {'Code': 'ConditionalCheckFailedException'}}
+        if item is not None:
+            self.response['Item'] = item
+
+
+class LocalTransactionCanceled(Exception):
+    """Stand-in for botocore's ClientError with a TransactionCanceledException code."""
+
+    def __init__(self, reasons: list):
+        super().__init__("Transaction cancelled")
+        self.response = {'Error': {'Code': 'TransactionCanceledException'}, 'CancellationReasons': reasons}
+
+
+def _split_top_level(expression: str) -> list:
+    """Split an update expression action list on the commas outside parentheses."""
+    parts, depth, start = [], 0, 0
+    for index, character in enumerate(expression):
+        depth += {'(': 1, ')': -1}.get(character, 0)
+        if character == ',' and depth == 0:
+            parts.append(expression[start:index].strip())
+            start = index + 1
+    parts.append(expression[start:].strip())
+    return [part for part in parts if part]
+
+
+def _path(token: str, names: dict) -> list:
+    """Document path such as #a.#b or #a[2] as a list of map keys and list indexes."""
+    steps = []
+    for part in token.strip().split('.'):
+        match = re.match(r'^([^\[]+)((?:\[\d+\])*)$', part)
+        steps.append(names.get(match.group(1), match.group(1)))
+        steps.extend(int(index) for index in re.findall(r'\[(\d+)\]', match.group(2)))
+    return steps
+
+
+def _resolve(item, token: str, names: dict) -> tuple:
+    value = item
+    for step in _path(token, names):
+        try:
+            value = value[step]
+        except (KeyError, IndexError, TypeError):
+            return None, False
+    return value, True
+
+
+def _check_condition(current, ConditionExpression: str, names: dict, values: dict,
+                     ReturnValuesOnConditionCheckFailure: str = 'NONE'):
+    """
+    Evaluate a condition made of attribute_exists, attribute_not_exists and = joined by AND,
+    each possibly a parenthesized group of alternatives joined by OR, against the stored item.
+    """
+    def holds(condition):
+        match = _ATTRIBUTE_FUNCTION.match(condition)
+        if match:
+            present = current is not None and _resolve(current, match.group(2), names)[1]
+            return present if match.group(1).lower() == 'attribute_exists' else not present
+        left, right = (token.strip() for token in condition.split('=', 1))
+        return current is not None and _resolve(current, left, names)[0] == values[right]
+
+    for condition in re.split(r'\s+AND\s+(?![^(]*\))', ConditionExpression.strip(), flags=re.IGNORECASE):
+        condition = condition.strip()
+        if condition.startswith('(') and condition.endswith(')') and not _ATTRIBUTE_FUNCTION.match(condition):
+            alternatives = re.split(r'\s+OR\s+', condition[1:-1], flags=re.IGNORECASE)
+            passed = any(holds(alternative.strip()) for alternative in alternatives)
+        else:
+            passed = holds(condition)
+        if not passed:
+            on_failure = copy.deepcopy(current) if ReturnValuesOnConditionCheckFailure == 'ALL_OLD' else None
+            raise LocalConditionalCheckFailed(on_failure)
+
+
+def _update_item(table: LocalTable, Key: dict, UpdateExpression: str, ConditionExpression: str = None,
+                 ExpressionAttributeNames: dict = None, ExpressionAttributeValues: dict = None,
+                 ReturnValues: str = 'NONE', ReturnValuesOnConditionCheckFailure: str = 'NONE', **kwargs):
+    """
+    UpdateItem supporting SET with plain values, if_not_exists(...) + :n and list_append(...),
+    REMOVE, and the conditions _check_condition evaluates.
+    """
+    table._request()
+    names = ExpressionAttributeNames or {}
+    values = ExpressionAttributeValues or {}
+    key = table._key(Key)
+    current = table._items.get(key)
+
+    def path(token):
+        return _path(token, names)
+
+    def resolve(item, token):
+        return _resolve(item, token, names)
+
+    def assign(item, token, value):
+        steps = path(token)
+        target = item
+        for step in steps[:-1]:
+            target = target[step]
+        target[steps[-1]] = value
+        return steps[0]
+
+    def operand(token, item):
+        token = token.strip()
+        match = _IF_NOT_EXISTS.match(token)
+        if match:
+            value, found = resolve(item, match.group(1))
+            return copy.deepcopy(value if found else values[match.group(2)])
+        if token.startswith(':'):
+            return copy.deepcopy(values[token])
+        return copy.deepcopy(resolve(item, token)[0])
+
+    if ConditionExpression:
+        _check_condition(current, ConditionExpression, names, values, ReturnValuesOnConditionCheckFailure)
+
+    item = copy.deepcopy(current) if current is not None else dict(Key)
+    updated = set()
+    sections = re.split(r'\b(SET|REMOVE)\b', UpdateExpression, flags=re.IGNORECASE)
+    for action, body in zip(sections[1::2], sections[2::2]):
+        for part in _split_top_level(body):
+            if action.upper() == 'REMOVE':
+                item.pop(path(part)[0], None)
+                continue
+            target, expression = (token.strip() for token in part.split('=', 1))
+            match = _LIST_APPEND.match(expression)
+            if match:
+                result = operand(match.group(1), item) + operand(match.group(2), item)
+            elif '+' in expression:
+                left, right = expression.rsplit('+', 1)
+                result = operand(left, item) + operand(right, item)
+            else:
+                result = operand(expression, item)
+            updated.add(assign(item, target, result))
+
+    table._items[key] = item
+    table._segments.clear()
+    if ReturnValues == 'UPDATED_NEW':
+        return {'Attributes': {attribute: copy.deepcopy(item[attribute]) for attribute in updated}}
+    if ReturnValues == 'ALL_NEW':
+        return {'Attributes': copy.deepcopy(item)}
+    return {}
+
+
+class _LocalBatchWriter:
+    """Stand-in for the boto3 Table.batch_writer() context manager."""
+
+    def __init__(self, table: LocalTable):
+        self._table = table
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def put_item(self, Item: dict):
+        self._table.put_item(Item=Item)
+
+    def delete_item(self, Key: dict):
+        self._table.delete_item(Key=Key)
+
+
+class LocalDynamoDBClient:
+    """
+    Stand-in for the low-level client behind a LocalDynamoDBResource (resource.meta.client).
+    It serves the same tables, with requests and responses in wire format.
+    """
+
+    def __init__(self, resource: 'LocalDynamoDBResource'):
+        self._resource = resource
+        self._serializer = TypeSerializer()
+        self._deserializer = TypeDeserializer()
+
+    def _encode(self, item: dict) -> dict:
+        return {name: self._serializer.serialize(value) for name, value in item.items()}
+
+    def _decode(self, item: dict) -> dict:
+        return {name: self._deserializer.deserialize(value) for name, value in item.items()}
+
+    def scan(self, TableName: str, ExclusiveStartKey: dict = None, **kwargs):
+        if ExclusiveStartKey:
+            kwargs['ExclusiveStartKey'] = self._decode(ExclusiveStartKey)
+        response = self._resource.Table(TableName).scan(**kwargs)
+        response['Items'] = [self._encode(item) for item in response['Items']]
+        if 'LastEvaluatedKey' in response:
+            response['LastEvaluatedKey'] = self._encode(response['LastEvaluatedKey'])
+        return response
+
+    def get_item(self, TableName: str, Key: dict, **kwargs):
+        response = self._resource.Table(TableName).get_item(Key=self._decode(Key), **kwargs)
+        if 'Item' in response:
+            response['Item'] = self._encode(response['Item'])
+        return response
+
+    def transact_write_items(self, TransactItems: list):
+        """
+        TransactWriteItems with Put and Update actions: every condition is checked before
+        anything is written, and a failed one cancels the whole transaction.
+        """
+        actions = []
+        for transact_item in TransactItems:
+            (kind, action), = transact_item.items()
+            action = dict(action)
+            table = self._resource.Table(action.pop('TableName'))
+            if action.get('ExpressionAttributeValues'):
+                action['ExpressionAttributeValues'] = self._decode(action['ExpressionAttributeValues'])
+            if kind == 'Put':
+                action['Item'] = self._decode(action['Item'])
+                key = table._key(action['Item'])
+            else:
+                action['Key'] = self._decode(action['Key'])
+                key = table._key(action['Key'])
+            actions.append((kind, table, key, action))
+
+        reasons, cancelled = [], False
+        for kind, table, key, action in actions:
+            reason = {'Code': 'None'}
+            if action.get('ConditionExpression'):
+                try:
+                    _check_condition(table._items.get(key), action['ConditionExpression'],
+                                     action.get('ExpressionAttributeNames') or {},
+                                     action.get('ExpressionAttributeValues') or {},
+                                     action.get('ReturnValuesOnConditionCheckFailure', 'NONE'))
+                except LocalConditionalCheckFailed as e:
+                    reason = {'Code': 'ConditionalCheckFailed'}
+                    if 'Item' in e.response:
+                        reason['Item'] = self._encode(e.response['Item'])
+                    cancelled = True
+            reasons.append(reason)
+        if cancelled:
+            raise LocalTransactionCanceled(reasons)
+
+        for kind, table, key, action in actions:
+            if kind == 'Put':
+                table.put_item(**action)
+            else:
+                _update_item(table, **action)
+        return {}
+
+
+class LocalDynamoDBResource:
+    """Stand-in for boto3.resource('dynamodb') that hands out LocalTable instances."""
+
+    def __init__(self, tables: dict = None, throttled_batches: int = 0, **table_kwargs):
+        """
+        :param tables: Per-table LocalTable keyword arguments, keyed by table name.
+        :param throttled_batches: Number of batch calls that only process half of their
+                                  requests and return the rest as unprocessed.
+        :param table_kwargs: LocalTable keyword arguments used for every other table.
+        """
+        self._tables_kwargs = tables or {}
+        self._table_kwargs = table_kwargs
+        self._throttled_batches = throttled_batches
+        self._lock = threading.Lock()
+        self.tables = {}
+        self.meta = SimpleNamespace(client=LocalDynamoDBClient(self))
+
+    def Table(self, name: str) -> LocalTable:
+        with self._lock:
+            if name not in self.tables:
+                self.tables[name] = LocalTable(**{**self._table_kwargs, **self._tables_kwargs.get(name, {})})
+                self.tables[name].name = name
+            return self.tables[name]
+
+    def _split_throttled(self, requests: list) -> tuple:
+        with self._lock:
+            throttled = self._throttled_batches > 0
+            self._throttled_batches -= throttled
+        if not throttled:
+            return requests, []
+        half = (len(requests) + 1) // 2
+        return requests[:half], requests[half:]
+
+    def batch_get_item(self, RequestItems: dict):
+        responses, unprocessed = {}, {}
+        for name, request in RequestItems.items():
+            keys, remaining = self._split_throttled(request['Keys'])
+            table = self.Table(name)
+            responses[name] = [item for item in (table.get_item(Key=key).get('Item') for key in keys) if item]
+            if remaining:
+                unprocessed[name] = {'Keys': remaining}
+        return {'Responses': responses, 'UnprocessedKeys': unprocessed}
+
+    def batch_write_item(self, RequestItems: dict):
+        unprocessed = {}
+        for name, requests in RequestItems.items():
+            requests, remaining = self._split_throttled(requests)
+            table = self.Table(name)
+            for request in requests:
+                if 'PutRequest' in request:
+                    table.put_item(Item=request['PutRequest']['Item'])
+                else:
+                    table.delete_item(Key=request['DeleteRequest']['Key'])
+            if remaining:
+                unprocessed[name] = remaining
+        return {'UnprocessedItems': unprocessed}
+
+
+def make_data_service(marker_count: int, **resource_kwargs):
+    """
+    Build a DataService of a LocationMarkers table held by a new LocalDynamoDBResource, with
+    markers marker-0 to marker-{marker_count - 1} already in it.
+
+    :param marker_count: Number of markers to put.
+    :param resource_kwargs: Arguments of LocalDynamoDBResource, e.g. latency or page_size.
+    :return: The DataService.
+    """
+    from coordinate import Coordinate
+    from data_service import DataService
+    from location_marker import LocationMarker
+
+    data_service = DataService(table_name='LocationMarkers', dynamodb_resource=LocalDynamoDBResource(**resource_kwargs))
+    for i in range(marker_count):
+        marker = LocationMarker(coordinate=Coordinate(longitude=str(i), latitude=str(i)), name=f"marker {i}")
+        marker.set_marker_id(f"marker-{i}")
+        data_service.table.put_item(Item=marker.to_json())
+    return data_service
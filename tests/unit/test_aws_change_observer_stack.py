@@ -1,3 +1,5 @@
+import json
+
 import aws_cdk as core
 import aws_cdk.assertions as assertions
 
@@ -10,4 +12,68 @@ def test_lambda_function_created():
     template = assertions.Template.from_stack(stack)
 
     # Check if there is a Lambda function resource in the stack
-    template.resource_count_is("AWS::Lambda::Function", 1)
+    template.resource_count_is("AWS::Lambda::Function", 17)
+
+
+def test_markers_snapshot_is_fed_from_table_stream():
+    app = core.App()
+    stack = AwsChangeObserverStack(app, "aws-change-observer")
+    template = assertions.Template.from_stack(stack)
+
+    template.has_resource_properties("AWS::DynamoDB::Table", {
+        "TableName": "LocationMarkers",
+        "StreamSpecification": {"StreamViewType": "NEW_AND_OLD_IMAGES"},
+    })
+    # Each consumer of a DynamoDB stream shares its read throughput; keep to two
+    template.resource_count_is("AWS::Lambda::EventSourceMapping", 2)
+    template.resource_count_is("AWS::S3::Bucket", 3)
+
+
+def test_router_mode_deploys_single_function_behind_proxy():
+    app = core.App()
+    stack = AwsChangeObserverStack(app, "aws-change-observer", use_router=True)
+    template = assertions.Template.from_stack(stack)
+
+    # The router serves every route; the stream functions are not behind the API
+    template.resource_count_is("AWS::Lambda::Function", 3)
+    template.has_resource_properties("AWS::ApiGateway::Resource", {"PathPart": "{proxy+}"})
+    template.has_resource_properties("AWS::ApiGateway::RestApi", {
+        "BinaryMediaTypes": ["image/png", "image/*", "application/octet-stream"],
+    })
+
+
+def test_cors_preflight_is_answered_as_text():
+    app = core.App()
+    stack = AwsChangeObserverStack(app, "aws-change-observer")
+    template = assertions.Template.from_stack(stack)
+
+    # A catch-all binary media type would turn the preflight mock integrations' JSON
+    # request templates into binary, and every OPTIONS request would fail
+    api = next(iter(template.find_resources("AWS::ApiGateway::RestApi").values()))
+    assert "*/*" not in api["Properties"]["BinaryMediaTypes"]
+    preflights = [method["Properties"] for method in template.find_resources("AWS::ApiGateway::Method").values()
+                  if method["Properties"]["HttpMethod"] == "OPTIONS"]
+    assert preflights
+    for preflight in preflights:
+        integration = preflight["Integration"]
+        assert integration["Type"] == "MOCK"
+        assert "application/json" in integration["RequestTemplates"]
+        assert integration.get("ContentHandling", "CONVERT_TO_TEXT") == "CONVERT_TO_TEXT"
+
+
+def test_only_image_readers_can_read_the_capture_bucket():
+    app = core.App()
+    stack = AwsChangeObserverStack(app, "aws-change-observer", capture_bucket_name="captures")
+    template = assertions.Template.from_stack(stack)
+
+    readers = {}
+    for policy in template.find_resources("AWS::IAM::Policy").values():
+        for statement in policy["Properties"]["PolicyDocument"]["Statement"]:
+            resources = statement["Resource"] if isinstance(statement["Resource"], list) else [statement["Resource"]]
+            assert "arn:aws:s3:::*/*" not in resources
+            if "captures" in json.dumps(resources):
+                for role in policy["Properties"]["Roles"]:
+                    readers[role["Ref"]] = True
+    roles = {function["Properties"]["FunctionName"]: function["Properties"]["Role"]["Fn::GetAtt"][0]
+             for function in template.find_resources("AWS::Lambda::Function").values()}
+    assert {name for name, role in roles.items() if role in readers} == {"changeDetectionStream", "addCaptureRequest"}
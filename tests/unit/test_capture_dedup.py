@@ -0,0 +1,72 @@
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import capture_dedup
+import change_detection
+from image import Image
+
+from tests.local_dynamodb import make_data_service
+
+FIXTURES = Path(__file__).resolve().parent.parent / "fixtures" / "images"
+
+
+def noisy_copy(name: str, seed: int) -> bytes:
+    """Returns a fixture as a binary PGM with a little sensor noise added."""
+    pixels = change_detection.load_image((FIXTURES / name).read_bytes())
+    noisy = np.clip(pixels + np.random.default_rng(seed).normal(0, 0.02, pixels.shape), 0, 1)
+    height, width = noisy.shape
+    return f"P5 {width} {height} 255\n".encode('ascii') + np.rint(noisy * 255).astype(np.uint8).tobytes()
+
+
+def test_record_capture_collapses_near_identical_frames():
+    data_service = make_data_service(1)
+    frames = {"scene-noisy-1": noisy_copy("scene.pgm", 1), "scene-noisy-2": noisy_copy("scene.pgm", 2),
+              "changed": (FIXTURES / "scene_changed.pgm").read_bytes(), "scene": (FIXTURES / "scene.pgm").read_bytes()}
+    stats = capture_dedup.DedupStats()
+
+    results = [capture_dedup.record_capture(data_service, "marker-0", Image(f"2024-01-0{day}T00:00:00Z", "", name, "b"),
+                                            read_image=lambda image: frames[image.get_s3_key()], dedup_stats=stats)
+               for day, name in enumerate(frames, start=1)]
+
+    # The second noisy frame and the return to the first scene match a recent hash
+    assert [result.stored for result in results] == [True, False, True, False]
+    assert results[1].distance <= capture_dedup.DEFAULT_MAX_DISTANCE < results[2].distance
+    marker = data_service.get_marker("marker-0")
+    assert [image.get_s3_key() for image in marker.get_historical_images()] == ["scene-noisy-1", "changed"]
+    assert marker.get_recent_hashes() == [results[2].perceptual_hash, results[0].perceptual_hash]
+    assert (marker.get_unchanged_captures(), marker.get_last_capture_date()) == (1, "2024-01-04T00:00:00Z")
+    assert stats.stats()["dedup_rate"] == 0.5
+
+    # Collapsing changes the marker body, so its version (and ETag) moves; the sync keys do not
+    before = data_service.table.get_item(Key={'markerId': "marker-0"})['Item']
+    assert data_service.collapse_capture("marker-0", "2024-01-05T00:00:00Z") == 2
+    after = data_service.table.get_item(Key={'markerId': "marker-0"})['Item']
+    assert (after['version'], after['updatedAt']) == (before['version'] + 1, before['updatedAt'])
+
+
+def test_concurrent_captures_keep_each_others_hashes():
+    data_service = make_data_service(1)
+    frames = {"scene": (FIXTURES / "scene.pgm").read_bytes(), "changed": (FIXTURES / "scene_changed.pgm").read_bytes()}
+    read_image = lambda image: frames[image.get_s3_key()]
+    get_recent_hashes = data_service.get_recent_hashes
+    racing = []
+
+    def read_then_race(marker_id):
+        # Another capture is stored between this capture's read and its write
+        hashes = get_recent_hashes(marker_id)
+        if not racing:
+            racing.append(None)
+            racing[0] = capture_dedup.record_capture(data_service, marker_id, Image("2024-01-01T00:00:00Z", "", "changed", "b"),
+                                                     read_image=read_image, dedup_stats=capture_dedup.DedupStats())
+        return hashes
+
+    data_service.get_recent_hashes = read_then_race
+    result = capture_dedup.record_capture(data_service, "marker-0", Image("2024-01-02T00:00:00Z", "", "scene", "b"),
+                                          read_image=read_image, dedup_stats=capture_dedup.DedupStats())
+
+    assert result.stored and racing[0].stored
+    hashes = data_service.get_marker("marker-0").get_recent_hashes()
+    assert hashes == [result.perceptual_hash, racing[0].perceptual_hash]
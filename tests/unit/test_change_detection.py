@@ -0,0 +1,51 @@
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import change_detection
+from change_record import ChangeRecord
+from image import Image
+from location_marker import LocationMarker
+
+from tests.local_dynamodb import make_data_service
+
+FIXTURES = Path(__file__).resolve().parent.parent / "fixtures" / "images"
+
+
+def load_fixture(name: str) -> np.ndarray:
+    return change_detection.load_image((FIXTURES / name).read_bytes())
+
+
+def test_compare_aligns_shifted_capture_and_locates_change():
+    scene, shifted, changed = (load_fixture(name) for name in ("scene.pgm", "scene_shifted.pgm", "scene_changed.pgm"))
+
+    unchanged = change_detection.compare(scene, shifted)
+    assert unchanged.shift == (3, -5)
+    assert unchanged.region is None and unchanged.changed_fraction == 0
+
+    # scene_changed is scene_shifted with lower contrast and a bright square at x 40-72, y 64-96
+    result = change_detection.compare(scene, changed)
+    assert result.shift == (3, -5)
+    assert result.changed_fraction > 0
+    # Blocks start at the shifted origin, so the region edges are within a block of the square's
+    region, square = np.array(result.region), np.array([40, 64, 72, 96])
+    assert (np.abs(region - square) < change_detection.DEFAULT_BLOCK_SIZE).all()
+
+
+def test_detect_marker_change_stores_last_change():
+    data_service = make_data_service(1)
+    images = {"2024-01-01T00:00:00Z": "scene.pgm", "2024-02-01T00:00:00Z": "scene_changed.pgm"}
+    for date_taken, name in images.items():
+        data_service.append_image("marker-0", Image(date_taken, "", name, "bucket"))
+
+    marker = LocationMarker.from_json(data_service.table.get_item(Key={'markerId': "marker-0"})['Item'])
+    record = change_detection.detect_marker_change(data_service, marker,
+                                                   read_image=lambda image: (FIXTURES / image.get_s3_key()).read_bytes())
+
+    stored = data_service.get_marker("marker-0").get_last_change()
+    assert stored.to_json() == record.to_json()
+    assert stored.get_previous_date_taken() == "2024-01-01T00:00:00Z"
+    assert stored.get_changed_blocks() > 0 and stored.get_shift() == [3, -5]
+    assert ChangeRecord.normalize_json(record.to_json()) == record.to_json()
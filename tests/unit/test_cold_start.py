@@ -0,0 +1,46 @@
+from tests.cold_start import harness
+
+
+def test_parse_importtime_skips_header_and_other_output():
+    output = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       120 |        120 |   botocore.compat",
+        "import time:      2000 |       2120 | botocore",
+        "some other stderr line",
+    ])
+
+    entries = harness.parse_importtime(output)
+
+    assert entries == [("botocore.compat", 120, 120), ("botocore", 2000, 2120)]
+    assert harness.top_packages(entries, 1) == [("botocore", 2.12)]
+
+
+def test_check_budget_reports_slow_init_and_forbidden_modules():
+    report = {'init_ms': 200.0, 'first_use_ms': None, 'modules': ['json', 'boto3']}
+    budget = {'max_init_ms': 150, 'forbidden_modules': ['boto3', 'botocore']}
+
+    assert harness.check_budget(report, budget) == [
+        "init 200.0 ms exceeds 150 ms",
+        "boto3 is imported during init",
+    ]
+
+
+def test_check_budget_reports_slow_first_use_and_cold_start():
+    report = {'init_ms': 100.0, 'first_use_ms': 450.0, 'modules': ['json']}
+    budget = {'max_init_ms': 150, 'max_first_use_ms': 400, 'max_cold_start_ms': 500}
+
+    assert harness.check_budget(report, budget) == [
+        "first use 450.0 ms exceeds 400 ms",
+        "init + first use 550.0 ms exceeds 500 ms",
+    ]
+    assert 'max_cold_start_ms' in harness.budget_for(harness.load_budgets(), 'get_marker_request')
+
+
+def test_handlers_do_not_import_boto3_during_init():
+    # Timings are too noisy for a unit test; the budget check runs with the import budget only
+    budget = {'forbidden_modules': ['boto3', 'botocore']}
+
+    report = harness.profile_handler('get_marker_request', 'get_marker_request_lambda_function')
+
+    assert harness.check_budget(report, budget) == []
+    assert 'data_service' in report['modules']
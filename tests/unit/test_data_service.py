@@ -0,0 +1,300 @@
+import json
+from decimal import Decimal
+
+import pytest
+
+from data_service import (DataService, MarkerNotFoundError, SyncTokenExpiredError, VersionConflictError,
+                          _encode_cursor)
+from coordinate import Coordinate
+from detected_objects import DetectedObjects
+from image import Image
+from location_marker import LocationMarker
+
+from tests.local_dynamodb import LocalDynamoDBResource, make_data_service
+
+
+def test_get_markers_follows_last_evaluated_key():
+    data_service = make_data_service(250, page_size=100)
+
+    marker_ids = [marker.get_marker_id() for marker in data_service.get_markers()]
+
+    assert sorted(marker_ids) == sorted(f"marker-{i}" for i in range(250))
+
+
+def test_get_markers_page_returns_cursor_until_exhausted():
+    data_service = make_data_service(25)
+
+    seen = []
+    next_token = None
+    while True:
+        markers, next_token = data_service.get_markers_page(limit=10, next_token=next_token)
+        seen.extend(marker.get_marker_id() for marker in markers)
+        if next_token is None:
+            break
+
+    assert sorted(seen) == sorted(f"marker-{i}" for i in range(25))
+
+    # Well-formed cursors whose key is not a marker key are rejected up front, not by the scan
+    low_level = DataService(table_name='LocationMarkers', dynamodb_resource=data_service.dynamodb, low_level=True)
+    for key in ({'markerId': 7}, {'markerId': "marker-1", 'name': "x"}, {'other': "marker-1"}):
+        with pytest.raises(ValueError):
+            low_level.get_markers_page(limit=10, next_token=_encode_cursor(key))
+
+
+def test_parallel_scan_yields_every_marker_once():
+    data_service = make_data_service(500, page_size=20)
+
+    marker_ids = [marker.get_marker_id() for marker in data_service.parallel_scan(total_segments=8, workers=4)]
+
+    assert sorted(marker_ids) == sorted(f"marker-{i}" for i in range(500))
+
+
+def test_get_markers_page_summary_reads_only_summary_attributes():
+    data_service = make_data_service(0)
+    marker = LocationMarker(coordinate=Coordinate(longitude="1", latitude="2"), subscribed_emails=["a@example.com"])
+    marker.set_marker_id("marker-0")
+    data_service.table.put_item(Item=marker.to_json())
+
+    markers, _ = data_service.get_markers_page(limit=10, summary=True)
+
+    assert markers[0].to_summary_json()["coordinate"] == {"longitude": "1", "latitude": "2"}
+    assert markers[0].get_subscription_emails() == []
+
+
+def test_query_bbox_returns_only_markers_inside_the_box():
+    resource = LocalDynamoDBResource(indexes={'GeohashIndex': ('geohashPrefix', 'geohash')})
+    data_service = DataService(table_name='LocationMarkers', dynamodb_resource=resource)
+    for marker_id, (latitude, longitude) in {"inside": (48.85, 2.35), "outside": (48.85, 2.60),
+                                             "far": (-33.87, 151.21)}.items():
+        marker = LocationMarker(coordinate=Coordinate(longitude=str(longitude), latitude=str(latitude)))
+        marker.set_marker_id(marker_id)
+        data_service.table.put_item(Item=marker.to_json())
+
+    markers = data_service.query_bbox(48.80, 2.30, 48.90, 2.40)
+
+    assert [marker.get_marker_id() for marker in markers] == ["inside"]
+
+
+def test_nearest_returns_k_closest_markers_in_distance_order():
+    resource = LocalDynamoDBResource(indexes={'GeohashIndex': ('geohashPrefix', 'geohash')})
+    data_service = DataService(table_name='LocationMarkers', dynamodb_resource=resource)
+    for i, offset in enumerate([0.001, 0.003, 0.002, 0.02, 0.5]):
+        marker = LocationMarker(coordinate=Coordinate(longitude=str(2.35 + offset), latitude="48.85"))
+        marker.set_marker_id(f"marker-{i}")
+        data_service.table.put_item(Item=marker.to_json())
+
+    results = data_service.nearest(48.85, 2.35, k=3, max_radius=10000)
+
+    assert [marker.get_marker_id() for marker, _ in results] == ["marker-0", "marker-2", "marker-1"]
+    assert all(a <= b for (_, a), (_, b) in zip(results, results[1:]))
+
+
+def test_nearest_starts_with_small_cells_and_coarsens_until_k_are_found():
+    resource = LocalDynamoDBResource(indexes={'GeohashIndex': ('geohashPrefix', 'geohash')})
+    data_service = DataService(table_name='LocationMarkers', dynamodb_resource=resource)
+    for i, offset in enumerate([0.0001, 0.0002, 0.2]):  # Two within 20 m, one about 15 km away
+        marker = LocationMarker(coordinate=Coordinate(longitude=str(2.35 + offset), latitude="48.85"))
+        marker.set_marker_id(f"marker-{i}")
+        data_service.table.put_item(Item=marker.to_json())
+    queried = []
+    query_cell = data_service._query_geohash_cell
+    data_service._query_geohash_cell = lambda cell: queried.append(cell) or query_cell(cell)
+
+    results = data_service.nearest(48.85, 2.35, k=2, max_radius=50000)
+    assert [marker.get_marker_id() for marker, _ in results] == ["marker-0", "marker-1"]
+    assert {len(cell) for cell in queried} == {7}
+
+    queried.clear()
+    results = data_service.nearest(48.85, 2.35, k=3, max_radius=50000)
+    assert [marker.get_marker_id() for marker, _ in results] == ["marker-0", "marker-1", "marker-2"]
+    assert max(len(cell) for cell in queried) == 7 and min(len(cell) for cell in queried) < 7
+
+
+def test_historical_images_are_stored_and_queried_as_separate_items():
+    resource = LocalDynamoDBResource(tables={'MarkerHistory': {'sort_key': 'dateTaken'}})
+    data_service = DataService(table_name='LocationMarkers', dynamodb_resource=resource,
+                               history_table_name='MarkerHistory')
+    dates = ["2024-10-01T00:00:00", "2024-10-02T00:00:00", "2024-10-03T00:00:00"]
+    marker = LocationMarker(coordinate=Coordinate(longitude="0", latitude="0"),
+                            historical_images=[Image(date, f"https://img/{date}", date, "bucket") for date in dates])
+    marker_id = data_service.add_marker(marker)
+
+    assert "historicalImages" not in data_service.table.get_item(Key={'markerId': marker_id})['Item']
+
+    images, next_token = data_service.get_historical_images(marker_id, date_from=dates[1], newest_first=True)
+    assert [image.get_date_taken() for image in images] == [dates[2], dates[1]]
+    assert next_token is None
+
+    images, next_token = data_service.get_historical_images(marker_id, limit=1)
+    assert data_service.get_historical_images(marker_id, next_token=next_token)[0][0].get_date_taken() == dates[1]
+    # A cursor must be a history key of the marker it is used with
+    for cursor in [_encode_cursor({'markerId': "other", 'dateTaken': dates[0]}),
+                   _encode_cursor({'markerId': marker_id}),
+                   _encode_cursor({'markerId': marker_id, 'dateTaken': dates[0], 'extra': 1})]:
+        with pytest.raises(ValueError):
+            data_service.get_historical_images(marker_id, next_token=cursor)
+
+    data_service.delete_marker(marker_id)
+    assert data_service.get_historical_images(marker_id)[0] == []
+
+
+def test_batch_operations_chunk_and_retry_unprocessed_items():
+    resource = LocalDynamoDBResource(throttled_batches=3)
+    data_service = DataService(table_name='LocationMarkers', dynamodb_resource=resource)
+    markers = [LocationMarker(coordinate=Coordinate(longitude="0", latitude=str(i))) for i in range(120)]
+
+    marker_ids = data_service.batch_put(markers)
+    fetched = data_service.batch_get(marker_ids[:110] + ["missing"])
+    missing = data_service.batch_delete(marker_ids[:60] + ["missing"])
+
+    assert sorted(marker.get_marker_id() for marker in fetched) == sorted(marker_ids[:110])
+    assert sorted(marker.get_marker_id() for marker in data_service.get_markers()) == sorted(marker_ids[60:])
+    # Ids that did not exist get no tombstone, and deleting again finds nothing
+    assert missing == ["missing"]
+    assert "Item" not in data_service.table.get_item(Key={'markerId': "missing"})
+    assert data_service.batch_delete(marker_ids[:2]) == marker_ids[:2]
+
+
+def test_raw_reads_match_serialized_markers():
+    data_service = make_data_service(3)
+    marker = data_service.get_marker("marker-1")
+    marker.add_image_to_history(Image(date_taken="2024-01-01T00:00:00", image_url="url", s3_key="key",
+                                      s3_bucket_name="bucket"))
+    marker.add_detected_objects(DetectedObjects(date_detected="2024-01-01T00:00:00", detected_objects=["car"]))
+    item = marker.to_json()
+    item["version"] = Decimal(3)  # As returned by the resource API
+    data_service.table.put_item(Item=item)
+
+    raw = data_service.get_marker("marker-1", raw=True)
+    assert raw == data_service.get_marker("marker-1").to_json()
+    assert json.loads(json.dumps(raw)) == raw
+
+    markers, _ = data_service.get_markers_page(limit=10, summary=True)
+    raw_markers, _ = data_service.get_markers_page(limit=10, summary=True, raw=True)
+    assert raw_markers == [marker.to_summary_json() for marker in markers]
+
+
+def test_low_level_reads_match_resource_reads():
+    data_service = make_data_service(25, page_size=10)
+    marker = data_service.get_marker("marker-3")
+    marker.add_image_to_history(Image(date_taken="2024-01-01T00:00:00", image_url="url", s3_key="key",
+                                      s3_bucket_name="bucket"))
+    data_service.update_marker(marker)
+    low_level = DataService(table_name='LocationMarkers', dynamodb_resource=data_service.dynamodb, low_level=True)
+
+    assert low_level.get_marker("marker-3", raw=True) == data_service.get_marker("marker-3", raw=True)
+    assert (sorted(marker.get_marker_id() for marker in low_level.get_markers())
+            == sorted(f"marker-{i}" for i in range(25)))
+
+
+def test_get_changes_pages_through_writes_and_reports_deletions():
+    resource = LocalDynamoDBResource(indexes={'SyncIndex': ('syncPartition', 'updatedAt')})
+    data_service = DataService(table_name='LocationMarkers', dynamodb_resource=resource)
+    marker_ids = [data_service.add_marker(LocationMarker(coordinate=Coordinate(longitude="0", latitude=str(i))))
+                  for i in range(5)]
+
+    first, token, complete = data_service.get_changes(limit=3)
+    assert len(first) == 3 and not complete
+    rest, token, complete = data_service.get_changes(since=token, limit=3)
+    assert complete
+    changes = first + rest
+    assert sorted(change["markerId"] for change in changes) == sorted(marker_ids)
+    assert [change["updatedAt"] for change in changes] == sorted(change["updatedAt"] for change in changes)
+
+    data_service.delete_marker(marker_ids[0])
+    changes, _, _ = data_service.get_changes(since=token)
+    assert changes[-1] == {"markerId": marker_ids[0], "deleted": True, "updatedAt": changes[-1]["updatedAt"]}
+    assert not data_service.marker_exists(marker_ids[0])
+    assert marker_ids[0] not in [marker.get_marker_id() for marker in data_service.get_markers()]
+
+    with pytest.raises(SyncTokenExpiredError):
+        data_service.get_changes(since=_encode_cursor({"updatedAt": "2000-01-01T00:00:00.000000Z", "markerId": ""}))
+
+
+def test_update_marker_is_conditional_on_the_version_it_was_read_at():
+    data_service = make_data_service(2)
+    marker = data_service.get_marker("marker-0")
+    stale = data_service.get_marker("marker-0")
+    assert data_service.update_marker(marker) == stale.get_version() + 1
+
+    with pytest.raises(VersionConflictError):
+        data_service.update_marker(stale)
+    assert stale.get_version() == marker.get_version() - 1
+
+    # A marker built without a version never overwrites a stored one
+    unversioned = data_service.get_marker("marker-0")
+    unversioned.set_version(0)
+    with pytest.raises(VersionConflictError):
+        data_service.update_marker(unversioned)
+    assert data_service.get_marker("marker-0").get_version() == marker.get_version()
+
+
+def test_update_marker_fields_checks_the_version_and_the_fields():
+    data_service = make_data_service(2)
+
+    assert data_service.update_marker_fields("marker-0", {"name": "renamed"}, expected_version=0) == 1
+    with pytest.raises(VersionConflictError) as conflict:
+        data_service.update_marker_fields("marker-0", {"name": "stale"}, expected_version=0)
+    assert conflict.value.current_version == 1
+    assert data_service.update_marker_fields("marker-0", {"status": "paused"}, expected_version=1) == 2
+    marker = data_service.get_marker("marker-0")
+    assert (marker.get_name(), marker.get_version()) == ("renamed", 2)
+
+    with pytest.raises(ValueError):
+        data_service.update_marker_fields("marker-0", {"version": 7})
+    with pytest.raises(MarkerNotFoundError):
+        data_service.update_marker_fields("marker-9", {"name": "missing"})
+
+
+def test_update_marker_fields_moves_the_geohash_keys_with_the_coordinate():
+    data_service = make_data_service(1)
+    coordinate = Coordinate(longitude="-122.4194", latitude="37.7749")
+
+    data_service.update_marker_fields("marker-0", {"coordinate": coordinate.to_json()})
+
+    item = data_service.table.get_item(Key={'markerId': "marker-0"})['Item']
+    geohash = coordinate.get_geohash(LocationMarker.GEOHASH_PRECISION)
+    assert item['geohash'] == geohash
+    assert item['geohashPrefix'] == geohash[:LocationMarker.GEOHASH_PREFIX_LENGTH]
+
+
+def test_append_detection_grows_the_list_and_bumps_the_version():
+    data_service = make_data_service(2)
+    for day in (1, 2):
+        data_service.append_detection("marker-0", DetectedObjects(f"2024-01-0{day}T00:00:00Z", ["car"] * day))
+
+    item = data_service.table.get_item(Key={'markerId': "marker-0"})['Item']
+    assert [len(entry['detectedObjects']) for entry in item['detectedObjects']] == [1, 2]
+    assert item['version'] == 2
+
+    data_service.delete_marker("marker-1")
+    for marker_id in ("marker-1", "marker-9"):  # Tombstoned, missing
+        with pytest.raises(MarkerNotFoundError):
+            data_service.append_detection(marker_id, DetectedObjects("2024-01-01T00:00:00Z", ["car"]))
+
+
+def test_append_image_writes_history_and_marker_in_one_transaction():
+    resource = make_data_service(2, tables={'MarkerHistory': {'sort_key': 'dateTaken'}}).dynamodb
+    data_service = DataService(table_name='LocationMarkers', dynamodb_resource=resource,
+                               history_table_name='MarkerHistory')
+
+    def image(day):
+        return Image(f"2024-01-0{day}T00:00:00Z", "url", f"key-{day}", "bucket")
+
+    data_service.append_image("marker-0", image(1), expected_version=0)
+    data_service.append_image("marker-0", image(2), expected_version=1)
+    item = data_service.table.get_item(Key={'markerId': "marker-0"})['Item']
+    assert (item['version'], item['currentImage']['s3_key']) == (2, "key-2")
+    images, _ = data_service.get_historical_images("marker-0")
+    assert [i.get_s3_key() for i in images] == ["key-1", "key-2"]
+
+    # A cancelled transaction writes neither item
+    with pytest.raises(VersionConflictError) as conflict:
+        data_service.append_image("marker-0", image(3), expected_version=1)
+    assert conflict.value.current_version == 2
+    data_service.delete_marker("marker-1")
+    for marker_id in ("marker-1", "marker-9"):  # Tombstoned, missing
+        with pytest.raises(MarkerNotFoundError):
+            data_service.append_image(marker_id, image(3))
+    assert len(data_service.get_historical_images("marker-0")[0]) == 2
+    assert data_service.get_historical_images("marker-9")[0] == []
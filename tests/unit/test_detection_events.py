@@ -0,0 +1,53 @@
+import pytest
+
+import detection_events
+from data_service import DataService
+
+from tests.local_dynamodb import LocalDynamoDBResource
+
+
+def make_data_service() -> DataService:
+    resource = LocalDynamoDBResource(tables={'DetectionEvents': {'partition_key': 'markerId',
+                                                                 'sort_key': 'dateDetected'}})
+    return DataService(table_name='LocationMarkers', dynamodb_resource=resource,
+                       detection_events_table_name='DetectionEvents')
+
+
+def marker_item(*detections) -> dict:
+    return {'markerId': "marker-0", 'detectedObjects': [
+        {'dateDetected': f"2024-01-0{day}T00:00:00Z", 'detectedObjects': labels} for day, labels in detections]}
+
+
+def test_diff_compares_labels_as_multisets():
+    assert detection_events.diff(["car", "tree"], ["Car", "car", "tree"]) == ({"car": 1}, {})
+    assert detection_events.diff(["car", "car", "dog"], ["car"]) == ({}, {"car": 1, "dog": 1})
+
+
+def test_appended_detections_become_paged_events():
+    data_service = make_data_service()
+    history = [(1, ["car"]), (2, ["car"]), (3, ["car", "car", "dog"]), (4, ["dog"])]
+    item = None
+    for count in range(1, len(history) + 1):
+        new_item = marker_item(*history[:count])
+        data_service.store_detection_events(detection_events.new_events(item, new_item))
+        item = new_item
+
+    # The unchanged second detection produced no event
+    first_page, token = data_service.get_detection_events("marker-0", limit=2)
+    second_page, last_token = data_service.get_detection_events("marker-0", limit=2, next_token=token)
+    assert [event['dateDetected'][:10] for event in first_page + second_page] == ["2024-01-04", "2024-01-03", "2024-01-01"]
+    assert first_page[0] == {'markerId': "marker-0", 'dateDetected': "2024-01-04T00:00:00Z",
+                             'previousDateDetected': "2024-01-03T00:00:00Z",
+                             'appeared': {}, 'disappeared': {"car": 2}}
+    assert first_page[1]['appeared'] == {"car": 1, "dog": 1}
+    assert last_token is None
+    assert second_page[0]['previousDateDetected'] is None and second_page[0]['appeared'] == {"car": 1}
+    with pytest.raises(ValueError):
+        data_service.get_detection_events("marker-1", next_token=token)  # Issued for marker-0
+
+    # A write that replaces the latest detection is not an append and produces no event
+    rewritten = marker_item(*history[:3], (4, ["cat"]), (5, ["tree"]))
+    assert detection_events.new_events(item, rewritten) == []
+
+    data_service.delete_detection_events("marker-0")
+    assert data_service.get_detection_events("marker-0") == ([], None)
@@ -0,0 +1,69 @@
+import pytest
+
+import detection_index
+from data_service import DataService
+
+from tests.local_dynamodb import LocalDynamoDBResource
+
+
+def make_data_service() -> DataService:
+    resource = LocalDynamoDBResource(tables={'DetectionIndex': {'partition_key': 'labelShard',
+                                                                'sort_key': 'detectionKey'}})
+    return DataService(table_name='LocationMarkers', dynamodb_resource=resource,
+                       detection_index_table_name='DetectionIndex')
+
+
+def marker_item(marker_id: str, *detections) -> dict:
+    return {'markerId': marker_id, 'detectedObjects': [
+        {'dateDetected': date, 'detectedObjects': labels} for date, labels in detections]}
+
+
+def apply(data_service: DataService, old_item, new_item):
+    data_service.update_detection_index(*detection_index.index_changes(old_item, new_item))
+
+
+def test_appended_detections_are_found_newest_first_across_shards():
+    data_service = make_data_service()
+    markers = {}
+    for day in range(1, 10):
+        marker_id = f"marker-{day % 5}"
+        old_item = markers.get(marker_id)
+        detections = [(entry['dateDetected'], entry['detectedObjects']) for entry in (old_item or {}).get('detectedObjects', [])]
+        markers[marker_id] = marker_item(marker_id, *detections, (f"2024-01-0{day}T00:00:00Z", ["Car", "car", "tree"]))
+        apply(data_service, old_item, markers[marker_id])
+
+    # The marker ids spread over several shards, which the pages merge
+    assert len({detection_index.shard(marker_id) for marker_id in markers}) > 1
+    pages, token = [], None
+    while True:
+        page, token = data_service.find_detections(" CAR ", limit=4, next_token=token)
+        pages.append(page)
+        if token is None:
+            break
+    dates = [detection['dateDetected'] for page in pages for detection in page]
+    assert [len(page) for page in pages] == [4, 4, 1]
+    assert dates == sorted(dates, reverse=True) and len(set(dates)) == 9
+    assert pages[0][0] == {'markerId': 'marker-4', 'dateDetected': '2024-01-09T00:00:00Z', 'label': 'car', 'count': 2}
+
+    recent, _ = data_service.find_detections("tree", since="2024-01-07")
+    assert [detection['dateDetected'][:10] for detection in recent] == ["2024-01-09", "2024-01-08", "2024-01-07"]
+    # Cursors are bound to their label
+    _, car_token = data_service.find_detections("car", limit=1)
+    with pytest.raises(ValueError):
+        data_service.find_detections("tree", next_token=car_token)
+
+
+def test_replaced_and_deleted_markers_leave_the_index():
+    data_service = make_data_service()
+    original = marker_item("marker-0", ("2024-01-01T00:00:00Z", ["car"]), ("2024-01-02T00:00:00Z", ["car", "dog"]))
+    apply(data_service, None, original)
+
+    # A replacing write drops the dog from the second detection
+    replaced = marker_item("marker-0", ("2024-01-01T00:00:00Z", ["car"]), ("2024-01-02T00:00:00Z", ["car"]))
+    apply(data_service, original, replaced)
+    assert data_service.find_detections("dog")[0] == []
+    assert len(data_service.find_detections("car")[0]) == 2
+
+    # Tombstones carry no detections
+    apply(data_service, replaced, {'markerId': "marker-0", 'deleted': True})
+    assert data_service.find_detections("car") == ([], None)
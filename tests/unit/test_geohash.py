@@ -0,0 +1,26 @@
+import geohash
+
+
+def test_encode_matches_reference_geohash():
+    assert geohash.encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+
+
+def test_bounds_contain_encoded_point():
+    min_lat, min_lon, max_lat, max_lon = geohash.bounds(geohash.encode(-33.8688, 151.2093, 7))
+
+    assert min_lat <= -33.8688 <= max_lat
+    assert min_lon <= 151.2093 <= max_lon
+
+
+def test_cover_splits_boxes_crossing_the_antimeridian():
+    cells = geohash.cover(-1.0, 179.0, 1.0, -179.0, 2)
+
+    assert set(cells) == {geohash.encode(lat, lon, 2) for lat in (-1.0, 1.0) for lon in (179.0, -179.0)}
+
+
+def test_minimal_cover_uses_finest_precision_within_cell_budget():
+    cells = geohash.minimal_cover(57.6, 10.3, 57.7, 10.5, max_cells=16, min_precision=2, max_precision=9)
+
+    assert len(cells) <= 16
+    assert len({len(cell) for cell in cells}) == 1
+    assert len(geohash.cover(57.6, 10.3, 57.7, 10.5, len(cells[0]) + 1)) > 16
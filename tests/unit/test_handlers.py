@@ -0,0 +1,122 @@
+import json
+
+import pytest
+
+import aws_clients
+from batch_add_markers_request import batch_add_markers_request_lambda_function as batch_add_markers_request
+from batch_delete_markers_request import batch_delete_markers_request_lambda_function as batch_delete_markers_request
+from batch_get_markers_request import batch_get_markers_request_lambda_function as batch_get_markers_request
+from coordinate import Coordinate
+from data_service import _encode_cursor
+from get_detection_events_request import get_detection_events_request_lambda_function as get_detection_events_request
+from get_historical_images_of_marker import get_historical_images_of_marker
+from get_markers_request import get_markers_request_lambda_function as get_markers_request
+from location_marker import LocationMarker
+from update_marker_request import update_marker_request_lambda_function as update_marker_request
+
+from tests.local_dynamodb import LocalDynamoDBResource
+
+
+@pytest.fixture
+def dynamodb(monkeypatch):
+    """A LocalDynamoDBResource served as the container-wide resource, with marker-0 in LocationMarkers."""
+    resource = LocalDynamoDBResource(tables={'MarkerHistory': {'sort_key': 'dateTaken'},
+                                             'DetectionEvents': {'sort_key': 'dateDetected'}},
+                                     indexes={'SyncIndex': ('syncPartition', 'updatedAt')})
+    monkeypatch.setattr(aws_clients, '_dynamodb_resource', resource)
+    monkeypatch.setenv('TABLE_NAME', 'LocationMarkers')
+    monkeypatch.setenv('HISTORY_TABLE_NAME', 'MarkerHistory')
+    monkeypatch.setenv('DETECTION_EVENTS_TABLE_NAME', 'DetectionEvents')
+    marker = LocationMarker(coordinate=Coordinate(longitude="0", latitude="0"), name="marker 0")
+    marker.set_marker_id("marker-0")
+    resource.Table('LocationMarkers').put_item(Item=marker.to_json())
+    return resource
+
+
+def _call(handler, body: dict) -> tuple:
+    response = handler.lambda_handler({'body': json.dumps(body)}, None)
+    return response['statusCode'], json.loads(response['body'])
+
+
+def _get(handler, params: dict) -> tuple:
+    response = handler.lambda_handler({'queryStringParameters': params}, None)
+    return response['statusCode'], json.loads(response['body'])
+
+
+def test_update_marker_request_maps_errors_to_statuses(dynamodb):
+    assert _call(update_marker_request, {'markerId': "marker-0", 'name': "renamed", 'version': 0}) == \
+        (200, {'message': 'Marker updated successfully', 'markerId': "marker-0", 'version': 1})
+
+    status, body = _call(update_marker_request, {'markerId': "marker-0", 'name': "stale", 'version': 0})
+    assert (status, body) == (409, {'error': 'Marker was modified by another request.', 'currentVersion': 1})
+
+    assert _call(update_marker_request, {'markerId': "marker-9", 'name': "missing"})[0] == 404
+    assert _call(update_marker_request, {'markerId': "marker-0"})[0] == 400  # No updatable fields
+    assert _call(update_marker_request, {'name': "no id"})[0] == 400
+    assert _call(update_marker_request, {'markerId': "marker-0", 'name': "x", 'version': "two"})[0] == 400
+
+
+def test_marker_pages_reject_cursors_of_other_markers(dynamodb):
+    for handler, sort_key in [(get_historical_images_of_marker, 'dateTaken'),
+                              (get_detection_events_request, 'dateDetected')]:
+        assert _get(handler, {'markerId': "marker-0"})[0] == 200
+        assert _get(handler, {'markerId': "marker-9"})[0] == 404
+        foreign = _encode_cursor({'markerId': "marker-9", sort_key: "2024-01-01T00:00:00Z"})
+        assert _get(handler, {'markerId': "marker-0", 'nextToken': foreign}) == (400, {'error': 'Invalid nextToken.'})
+        assert _get(handler, {'markerId': "marker-0", 'nextToken': "not a cursor"})[0] == 400
+
+
+def test_markers_page_etag_follows_marker_versions(dynamodb):
+    def get(view, if_none_match=None):
+        event = {'queryStringParameters': {'view': view}, 'headers': {'If-None-Match': if_none_match}}
+        return get_markers_request.lambda_handler(event, None)
+
+    full, summary = get('full'), get('summary')
+    assert full['statusCode'] == 200 and full['headers']['ETag'] != summary['headers']['ETag']
+    assert get('full', full['headers']['ETag'])['statusCode'] == 304
+
+    _call(update_marker_request, {'markerId': "marker-0", 'status': "paused"})
+    assert get('full', full['headers']['ETag'])['statusCode'] == 200
+    assert get('summary', summary['headers']['ETag'])['statusCode'] == 200
+
+
+def test_markers_pages_are_bounded_and_follow_cursors(dynamodb):
+    for marker_id in ("marker-1", "marker-2"):
+        marker = LocationMarker(coordinate=Coordinate(longitude="0", latitude="0"))
+        marker.set_marker_id(marker_id)
+        dynamodb.Table('LocationMarkers').put_item(Item=marker.to_json())
+
+    seen, params = [], {'limit': "2"}
+    while True:
+        status, body = _get(get_markers_request, params)
+        assert status == 200
+        seen += [marker['markerId'] for marker in body['markers']]
+        if not body['nextToken']:
+            break
+        params = {'limit': "2", 'nextToken': body['nextToken']}
+    assert sorted(seen) == ["marker-0", "marker-1", "marker-2"]
+
+    for limit in ("0", "1001", "ten"):
+        assert _get(get_markers_request, {'limit': limit})[0] == 400
+    for cursor in ("not a cursor", _encode_cursor({'markerId': 1}), _encode_cursor({'markerId': "a", 'x': "b"})):
+        assert _get(get_markers_request, {'nextToken': cursor}) == (400, {'error': 'Invalid nextToken.'})
+
+
+def test_batch_handlers_take_between_1_and_1000_markers(dynamodb):
+    ids = [f"marker-{i}" for i in range(1001)]
+    assert _get(batch_get_markers_request, {'ids': ""})[0] == 400
+    assert _get(batch_get_markers_request, {'ids': ",".join(ids)})[0] == 400
+    status, body = _get(batch_get_markers_request, {'ids': ",".join(ids[:1000])})
+    assert status == 200 and [marker['markerId'] for marker in body['markers']] == ["marker-0"]
+
+    marker = LocationMarker(coordinate=Coordinate(longitude="0", latitude="0")).to_json()
+    assert _call(batch_add_markers_request, {'markers': []})[0] == 400
+    assert _call(batch_add_markers_request, {'markers': [marker] * 1001})[0] == 400
+    assert _call(batch_add_markers_request, {})[0] == 400
+    status, body = _call(batch_add_markers_request, {'markers': [marker] * 2})
+    assert status == 201 and len(body['markerIds']) == 2
+
+    assert _call(batch_delete_markers_request, {'markerIds': []})[0] == 400
+    assert _call(batch_delete_markers_request, {'markerIds': ids})[0] == 400
+    status, body = _call(batch_delete_markers_request, {'markerIds': ["marker-0", "marker-9"]})
+    assert (status, body['deleted'], body['notFound']) == (200, 1, ["marker-9"])
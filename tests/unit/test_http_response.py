@@ -0,0 +1,51 @@
+import base64
+import gzip
+import json
+
+import http_response
+
+from tests.local_dynamodb import make_data_service
+
+
+def test_etag_matching_follows_if_none_match_rules():
+    etag = http_response.version_etag("marker-1", 3)
+
+    assert http_response.header({'headers': {'if-none-match': etag}}, 'If-None-Match') == etag
+    assert http_response.etag_matches(etag, etag)
+    assert http_response.etag_matches(f'"other", W/{etag}', etag)  # Weak comparison
+    assert http_response.etag_matches('*', etag)
+    assert not http_response.etag_matches(http_response.version_etag("marker-1", 2), etag)
+    assert not http_response.etag_matches('*', None)  # The resource does not exist
+    assert http_response.content_etag('{"markers":[]}') == http_response.content_etag(b'{"markers":[]}')
+
+
+def test_marker_version_tracks_writes_and_deletion():
+    data_service = make_data_service(1)
+    marker = data_service.get_marker("marker-0")
+
+    assert data_service.get_marker_version("marker-0") == 0
+    data_service.update_marker(marker)
+    assert data_service.get_marker_version("marker-0") == 1
+    data_service.delete_marker("marker-0")
+    assert data_service.get_marker_version("marker-0") is None
+
+
+def test_compress_honours_accept_encoding_and_weakens_etag():
+    body = json.dumps({'markers': [{'markerId': str(i), 'status': 'created'} for i in range(100)]})
+    response = {'statusCode': 200, 'headers': {'ETag': '"abc"'}, 'body': body}
+
+    assert http_response.accepted_encoding('gzip;q=0, identity') is None
+    assert http_response.accepted_encoding('*;q=0.5') in ('br', 'gzip')
+    assert 'isBase64Encoded' not in http_response.compress(dict(response, headers={}), {'headers': {}})
+
+    # Compressed bodies are only decoded by API Gateway for clients accepting a binary type
+    assert 'isBase64Encoded' not in http_response.compress(dict(response, headers={}),
+                                                           {'headers': {'accept-encoding': 'gzip'}})
+    compressed = http_response.compress(response, {'headers': {'accept-encoding': 'gzip',
+                                                               'Accept': 'application/json, application/octet-stream'}})
+    assert compressed['isBase64Encoded'] and compressed['headers']['Content-Encoding'] == 'gzip'
+    assert compressed['headers']['ETag'] == 'W/"abc"'
+    assert compressed['headers']['Vary'] == 'Accept, Accept-Encoding'
+    assert gzip.decompress(base64.b64decode(compressed['body'])).decode('utf-8') == body
+    encoded_request = {'body': base64.b64encode(body.encode('utf-8')).decode('ascii'), 'isBase64Encoded': True}
+    assert http_response.request_body(encoded_request) == body
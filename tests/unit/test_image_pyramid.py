@@ -0,0 +1,102 @@
+import io
+import shutil
+import struct
+import zlib
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import image_pyramid
+import tile_pack
+
+from tests.local_dynamodb import make_data_service
+from image import Image
+from location_marker import LocationMarker
+
+FIXTURES = Path(__file__).resolve().parent.parent / "fixtures" / "images"
+
+
+def decode_png(data: bytes) -> np.ndarray:
+    """Decodes the unfiltered 8-bit PNGs encode_png writes."""
+    width, height, _, colour_type = struct.unpack('>IIBB', data[16:26])
+    channels = 3 if colour_type == 2 else 1
+    idat_length = struct.unpack('>I', data[33:37])[0]
+    scanlines = np.frombuffer(zlib.decompress(data[41:41 + idat_length]), dtype=np.uint8)
+    pixels = scanlines.reshape(height, width * channels + 1)[:, 1:]
+    return pixels.reshape(height, width, channels).squeeze(axis=2) if channels == 1 else pixels.reshape(height, width, 3)
+
+
+def test_tile_pack_serves_tiles_of_each_level(tmp_path):
+    pixels = image_pyramid.load_pixels((FIXTURES / "scene.pgm").read_bytes())
+    with open(tmp_path / "scene.tiles", 'wb') as file:
+        header = image_pyramid.write_pyramid(pixels, file, tile_size=48)
+
+    pack = tile_pack.TilePack(str(tmp_path / "scene.tiles"))
+    # 128 px at full resolution, then 64 and 32
+    assert [(level['columns'], level['rows']) for level in pack.levels] == [(3, 3), (2, 2), (1, 1)]
+    assert header['thumbnail'] == {'width': 128, 'height': 128}
+    np.testing.assert_array_equal(decode_png(bytes(pack.tile(0, 2, 1))), pixels[48:96, 96:128])
+    assert decode_png(bytes(pack.tile(2, 0, 0))).shape == (32, 32)
+    np.testing.assert_array_equal(decode_png(bytes(pack.thumbnail())), pixels)
+    with pytest.raises(tile_pack.TileNotFoundError):
+        pack.tile(1, 2, 0)
+    pack.close()
+
+
+class RangedS3:
+    """Serves ranged GETs of in-memory objects and records the ranges asked for."""
+
+    def __init__(self, objects: dict):
+        self.objects = objects
+        self.ranges = []
+
+    def get_object(self, Bucket, Key, Range):
+        start, end = (int(bound) for bound in Range[len("bytes="):].split("-"))
+        self.ranges.append((Key, start, end))
+        return {'Body': io.BytesIO(self.objects[Key][start:end + 1])}
+
+
+def test_tile_pack_cache_reads_only_the_ranges_it_serves():
+    pixels = image_pyramid.load_pixels((FIXTURES / "scene.pgm").read_bytes())
+    packs = {}
+    for name in ("a", "b"):
+        output = io.BytesIO()
+        image_pyramid.write_pyramid(pixels, output, tile_size=48)
+        packs[name] = output.getvalue()
+    s3 = RangedS3(packs)
+    cache = tile_pack.TilePackCache("pyramids", max_bytes=len(packs["a"]) // 2, prefetch_bytes=1024, s3_client=s3)
+
+    pack = cache.get("a")
+    np.testing.assert_array_equal(decode_png(bytes(pack.thumbnail())), pixels)
+    np.testing.assert_array_equal(decode_png(bytes(pack.tile(0, 2, 1))), pixels[48:96, 96:128])
+    pack.tile(0, 2, 1)
+    # The header and index, then the thumbnail, then the one tile, read once
+    assert len(s3.ranges) == 3 and sum(end + 1 - start for _, start, end in s3.ranges) < len(packs["a"])
+
+    # Opening a second pack over the cache size closes the first
+    cache.get("b").thumbnail()
+    cache.get("b").tile(1, 1, 1)
+    assert pack.size == 0
+    assert cache.get("a") is not pack
+
+
+def test_build_marker_pyramid_points_image_at_its_pack(tmp_path):
+    data_service = make_data_service(1)
+    data_service.append_image("marker-0", Image("2024-01-01T00:00:00Z", "", "scene.pgm", "bucket"))
+    marker = LocationMarker.from_json(data_service.table.get_item(Key={'markerId': "marker-0"})['Item'])
+
+    stored = {}
+    image = image_pyramid.build_marker_pyramid(
+        data_service, marker, "pyramids",
+        read_image=lambda image: (FIXTURES / image.get_s3_key()).read_bytes(),
+        store_pack=lambda bucket, key, path: stored.update({key: shutil.copy(path, tmp_path / "stored.tiles")}),
+        tile_size=64)
+
+    marker = data_service.get_marker("marker-0")
+    assert list(stored) == [tile_pack.pack_key("marker-0", "2024-01-01T00:00:00Z")]
+    assert marker.get_current_image().to_json() == image.to_json()
+    assert marker.get_historical_images()[0].get_pyramid_levels() == 2
+    assert (image.get_width(), image.get_height(), image.get_tile_size()) == (128, 128, 64)
+    assert image_pyramid.build_marker_pyramid(data_service, marker, "pyramids") is None  # Already built
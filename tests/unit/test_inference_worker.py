@@ -0,0 +1,54 @@
+import time
+
+import inference_worker
+from image import Image
+
+from tests.local_dynamodb import make_data_service
+
+
+def test_local_queue_batches_are_bounded_by_size_and_time():
+    job_queue = inference_worker.LocalJobQueue()
+    for index in range(5):
+        job_queue.put(inference_worker.InferenceJob(f"marker-{index}", Image("", "", "", "")))
+
+    assert len(job_queue.get_batch(max_size=3, max_wait_seconds=10)) == 3
+    start = time.monotonic()
+    assert len(job_queue.get_batch(max_size=3, max_wait_seconds=0.05)) == 2
+    assert time.monotonic() - start < 1
+    assert job_queue.get_batch(max_size=3, max_wait_seconds=0.05, timeout=0.01) == []
+
+
+def test_worker_appends_detections_in_batches_on_a_process_pool():
+    data_service = make_data_service(3)
+    detector = inference_worker.StubDetector(call_seconds=0.01)
+    images = {f"marker-{index % 3}": [] for index in range(3)}
+
+    with inference_worker.InferenceWorker(data_service, detector, max_batch_size=4, processes=1) as worker:
+        for index in range(12):
+            data = f"capture {index}".encode('ascii')
+            images[f"marker-{index % 3}"].append(data)
+            worker.submit(f"marker-{index % 3}", Image(f"2024-01-01T00:{index:02d}:00Z", "", str(index), "b"), data)
+        worker.submit("missing-marker", Image("2024-01-01T00:00:00Z", "", "x", "b"), b"x")
+
+    for marker_id, captures in images.items():
+        detections = data_service.get_marker(marker_id).get_detected_objects()
+        assert [detection.get_detected_objects() for detection in detections] == detector.detect(captures)
+    stats = worker.stats.stats()
+    assert (stats["images"], stats["skipped"], stats["failed"]) == (12, 1, 0)
+    assert stats["batches"] < 13 and stats["mean_batch_size"] > 1
+    assert 0 < stats["p50_latency"] <= stats["p95_latency"] <= stats["max_latency"]
+
+
+def test_batches_that_cannot_be_submitted_are_failed_without_leaking_capacity():
+    data_service = make_data_service(1)
+    worker = inference_worker.InferenceWorker(data_service, inference_worker.StubDetector(), max_batch_size=1,
+                                              max_wait_seconds=0.01, processes=0).start()
+    worker._executor.shutdown()  # Every submit now raises, like a broken process pool
+
+    # More batches than the two permits in flight
+    for index in range(4):
+        worker.submit("marker-0", Image(str(index), "", str(index), "b"), b"x")
+    worker.stop()
+
+    stats = worker.stats.stats()
+    assert (stats["images"], stats["failed"]) == (0, 4)
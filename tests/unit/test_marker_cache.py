@@ -0,0 +1,54 @@
+from marker_cache import MarkerCache
+
+from tests.local_dynamodb import make_data_service
+from data_service import DataService
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction_ttl_and_stale_window():
+    clock = FakeClock()
+    cache = MarkerCache(max_entries=2, ttl_seconds=60, stale_seconds=5, clock=clock)
+    cache.store("a", {"markerId": "a"}, 1)
+    cache.store("b", {"markerId": "b"}, 1)
+    assert cache.lookup("a") == ({"markerId": "a"}, 1, False)  # Within the stale window
+    cache.store("c", {"markerId": "c"}, 1)  # Evicts b, the least recently used
+
+    assert cache.lookup("b") is None
+    clock.now = 10
+    assert cache.lookup("a")[2] is True  # Outside the stale window, must be validated
+    assert cache.validated("a", 2) is False  # Outdated version is dropped
+    assert cache.lookup("a") is None
+    clock.now = 61
+    assert cache.lookup("c") is None  # Past the TTL
+
+    assert cache.stats() == {"hits": 0, "stale_hits": 1, "misses": 4, "validations": 1, "evictions": 1,
+                             "expirations": 1, "invalidations": 0, "size": 0}
+
+
+def test_get_marker_reads_through_cache_and_writes_invalidate():
+    data_service = make_data_service(1)
+    cache = MarkerCache(stale_seconds=0)  # Check the version on every hit
+    cached_service = DataService(table_name='LocationMarkers', dynamodb_resource=data_service.dynamodb, cache=cache)
+
+    cached_service.get_marker("marker-0")
+    cached_service.get_marker("marker-0", raw=True)
+    assert cache.stats()["hits"] == 1  # Second read only checked the version
+
+    marker = data_service.get_marker("marker-0")
+    marker.set_name("renamed")
+    data_service.update_marker(marker)  # Invalidation needs no reference to the cache
+    assert cache.stats()["invalidations"] == 0  # Not registered as the table's container-wide cache
+    assert cached_service.get_marker("marker-0").get_name() == "renamed"  # Version check caught it
+
+    marker = cached_service.get_marker("marker-0")
+    marker.set_name("again")
+    cached_service.update_marker(marker)
+    assert cache.stats()["invalidations"] == 1
+    assert cached_service.get_marker("marker-0", raw=True)["name"] == "again"
@@ -0,0 +1,125 @@
+import gzip
+import json
+from types import SimpleNamespace
+
+import pytest
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
+
+import markers_snapshot
+from coordinate import Coordinate
+from data_service import DataService
+from location_marker import LocationMarker
+from snapshot_store import FileSnapshotStore, S3SnapshotStore, SnapshotConflictError
+
+from tests.local_dynamodb import LocalDynamoDBResource
+
+_serializer = TypeSerializer()
+
+
+def marker_item(marker_id: str, name: str, version: int) -> dict:
+    marker = LocationMarker(coordinate=Coordinate(longitude="144.96", latitude="-37.81"), name=name)
+    marker.set_marker_id(marker_id)
+    marker.set_version(version)
+    return marker.to_json()
+
+
+def stream_record(event_name: str, item: dict) -> dict:
+    wire = {name: _serializer.serialize(value) for name, value in item.items() if value is not None}
+    record = {'eventName': event_name, 'dynamodb': {'Keys': {'markerId': wire['markerId']}}}
+    if event_name != 'REMOVE':
+        record['dynamodb']['NewImage'] = wire
+    return record
+
+
+def test_stream_records_are_applied_incrementally(tmp_path):
+    store = FileSnapshotStore(str(tmp_path / 'markers.json.gz'))
+    existing = [marker_item("a", "first", 1), marker_item("b", "second", 1)]
+
+    # No snapshot yet: seeded from the table, then the batch is applied
+    assert markers_snapshot.update(store, [stream_record('INSERT', marker_item("c", "third", 1))],
+                                   rebuild=lambda: existing)
+    markers_snapshot.update(store, [
+        stream_record('MODIFY', marker_item("a", "renamed", 2)),
+        stream_record('MODIFY', marker_item("a", "stale", 1)),  # Older than the entry, ignored
+        stream_record('REMOVE', marker_item("b", "second", 1)),
+    ], rebuild=lambda: pytest.fail("snapshot exists, no rebuild expected"))
+
+    body, _ = store.read()
+    markers = markers_snapshot.decode(body)
+    assert sorted(markers) == ["a", "c"]
+    assert markers["a"]["name"] == "renamed"
+    assert set(markers["a"]) == set(LocationMarker.SUMMARY_ATTRIBUTES) | {"version"}
+
+    # A batch that changes nothing leaves the snapshot alone
+    assert not markers_snapshot.update(store, [stream_record('MODIFY', marker_item("a", "renamed", 2))])
+
+
+def test_snapshot_carries_a_token_to_sync_from():
+    resource = LocalDynamoDBResource(indexes={'SyncIndex': ('syncPartition', 'updatedAt')})
+    data_service = DataService(table_name='LocationMarkers', dynamodb_resource=resource)
+    marker_id = data_service.add_marker(LocationMarker(coordinate=Coordinate(longitude="0", latitude="0")))
+
+    body = json.loads(gzip.decompress(markers_snapshot.encode({})))
+    # Writes from before the snapshot, within its margin, come back as changes
+    changes, _, complete = data_service.get_changes(since=body["syncToken"])
+    assert [change["markerId"] for change in changes] == [marker_id] and complete
+
+
+def test_snapshot_writes_are_conditional(tmp_path):
+    store = FileSnapshotStore(str(tmp_path / 'markers.json.gz'))
+    etag = store.write(markers_snapshot.encode({}), if_match=None)
+
+    with pytest.raises(SnapshotConflictError):
+        store.write(markers_snapshot.encode({}), if_match=None)  # Already exists
+    assert store.read(if_none_match=etag) == (None, etag)
+
+    class RacingStore(FileSnapshotStore):
+        """Loses the first write to a concurrent update."""
+        raced = False
+
+        def write(self, body, if_match):
+            if not self.raced:
+                self.raced = True
+                super().write(markers_snapshot.encode({"x": {"markerId": "x", "version": 1}}), if_match)
+            return super().write(body, if_match)
+
+    racing = RacingStore(store.path)
+    markers_snapshot.update(racing, [stream_record('INSERT', marker_item("a", "first", 1))])
+
+    assert sorted(markers_snapshot.decode(store.read()[0])) == ["a", "x"]
+
+
+def test_s3_store_checks_the_etag_itself_without_conditional_puts():
+    class OldS3:
+        """S3 client whose PutObject predates IfMatch/IfNoneMatch."""
+        meta = SimpleNamespace(service_model=SimpleNamespace(operation_model=lambda name: SimpleNamespace(
+            input_shape=SimpleNamespace(members={'Bucket': None, 'Key': None, 'Body': None}))))
+        etag = None
+
+        def head_object(self, Bucket, Key):
+            if self.etag is None:
+                raise ClientError({'Error': {'Code': '404'}}, 'HeadObject')
+            return {'ETag': self.etag}
+
+        def put_object(self, **kwargs):
+            assert 'IfMatch' not in kwargs and 'IfNoneMatch' not in kwargs
+            self.etag = f'"{len(kwargs["Body"])}-{self.etag}"'
+            return {'ETag': self.etag}
+
+    store = S3SnapshotStore("bucket", "markers.json.gz", s3_client=OldS3())
+    assert not store.conditional_writes
+    etag = store.write(b"first", if_match=None)
+    with pytest.raises(SnapshotConflictError):
+        store.write(b"second", if_match=None)  # Already exists
+    assert store.write(b"second", if_match=etag) != etag
+
+
+def test_writes_outside_the_summary_leave_the_snapshot_alone(tmp_path):
+    store = FileSnapshotStore(str(tmp_path / 'markers.json.gz'))
+    markers_snapshot.update(store, [stream_record('INSERT', marker_item("a", "first", 1))])
+
+    # e.g. a change record or a detection: the version moves, the summary does not
+    assert not markers_snapshot.update(store, [stream_record('MODIFY', marker_item("a", "first", 2))])
+    assert markers_snapshot.update(store, [stream_record('MODIFY', marker_item("a", "renamed", 3))])
+    assert markers_snapshot.decode(store.read()[0])["a"]["version"] == 3
@@ -0,0 +1,41 @@
+import importlib.util
+import json
+
+import pytest
+
+from router_request import router_request_lambda_function as router
+
+
+@pytest.fixture
+def dispatched(monkeypatch):
+    """Stands a handler recording the events it is given in for every handler module."""
+    calls = []
+
+    def recorder(name):
+        return lambda event, context: calls.append((name, event)) or {'statusCode': 200}
+
+    monkeypatch.setattr(router, '_handlers', {name: recorder(name) for name in set(router.ROUTES.values())})
+    return calls
+
+
+@pytest.mark.parametrize("method, path", sorted(router.ROUTES))
+def test_every_route_dispatches_with_and_without_the_proxy_resource(dispatched, method, path):
+    module_name = router.ROUTES[(method, path)]
+    assert importlib.util.find_spec(module_name) is not None
+
+    proxy = {'httpMethod': method, 'resource': '/{proxy+}', 'path': path + '/'}
+    direct = {'httpMethod': method.lower(), 'resource': path, 'path': path}
+    for event in (proxy, direct):
+        assert router.lambda_handler(event, None) == {'statusCode': 200}
+    assert dispatched == [(module_name, proxy), (module_name, direct)]
+
+
+def test_unknown_routes_and_methods_are_rejected(dispatched):
+    response = router.lambda_handler({'httpMethod': 'GET', 'resource': '/{proxy+}', 'path': '/unknown'}, None)
+    assert (response['statusCode'], json.loads(response['body'])) == (404, {'error': 'Route not found.'})
+
+    response = router.lambda_handler({'httpMethod': 'DELETE', 'resource': '/markers', 'path': '/markers'}, None)
+    assert response['statusCode'] == 405 and response['headers']['Allow'] == 'GET'
+    response = router.lambda_handler({'httpMethod': 'POST', 'resource': '/{proxy+}', 'path': '/marker/history'}, None)
+    assert response['statusCode'] == 405
+    assert dispatched == []